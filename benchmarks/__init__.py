@@ -0,0 +1 @@
+"""Benchmarks for Money Tracker Bot"""
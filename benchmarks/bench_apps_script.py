@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Timing harness for the deployed Google Apps Script web app
+
+Sends single-transaction and bulk requests to an Apps Script deployment
+one at a time and reports the time each request took, which is dominated
+by the script's execution time. Run it against the old deployment with
+``--save before.json``, redeploy ``scripts/google-apps-script.js``, then
+run it again with ``--compare before.json`` to see the difference. The
+script also logs ``{"event": "doPost", "ms": ...}`` for every request, so
+the same numbers can be read from the Apps Script executions page.
+
+Every request writes real rows (category Other, account Cash, description
+"bench_apps_script"), so point it at a test spreadsheet. Without ``--url``
+it runs against the local stub, which only checks the harness itself.
+
+Usage:
+    python benchmarks/bench_apps_script.py [--url URL] [--requests 20] [--batch-size 10]
+                                           [--save FILE] [--compare FILE]
+"""
+
+import sys
+import os
+import argparse
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import httpx
+
+from benchmarks.stub_server import StubSheetsServer
+from codec import dumps, to_payload
+from models import Expense, Income, Transfer
+
+DESCRIPTION = "bench_apps_script"
+TRANSACTIONS = [
+    Expense(amount="1.00", category="Other", account="Cash", name=DESCRIPTION, date="2025-07-25"),
+    Income(amount="1.00", category="Other", account="Cash", name=DESCRIPTION, date="2025-07-25"),
+    Transfer(amount="1.00", from_account="Cash", to_account="BRI", description=DESCRIPTION, date="2025-07-25"),
+]
+
+
+def payload(i: int) -> dict:
+    return {**to_payload(TRANSACTIONS[i % len(TRANSACTIONS)], datetime.now().isoformat()),
+            'idempotency_key': uuid.uuid4().hex}
+
+
+def time_requests(client: httpx.Client, url: str, bodies: List[dict]) -> List[float]:
+    """POST each body in turn and return the per-request durations in milliseconds."""
+    timings = []
+    for body in bodies:
+        start = time.perf_counter()
+        response = client.post(url, content=dumps(body), headers={'Content-Type': 'application/json'})
+        response.raise_for_status()
+        if response.text.startswith('Error'):
+            raise RuntimeError(f"Apps Script rejected the request: {response.text[:200]}")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        'mean_ms': round(statistics.mean(ordered), 1),
+        'p50_ms': round(statistics.median(ordered), 1),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        'max_ms': round(ordered[-1], 1),
+    }
+
+
+def run(url: str, requests: int, batch_size: int) -> Dict[str, Dict[str, float]]:
+    singles = [payload(i) for i in range(requests)]
+    batches = [{'transactions': [payload(i * batch_size + j) for j in range(batch_size)]} for i in range(requests)]
+    with httpx.Client(timeout=60, follow_redirects=True) as client:
+        time_requests(client, url, [payload(0)])  # Warm up the deployment and the connection
+        return {
+            'single': summarize(time_requests(client, url, singles)),
+            f'batch_{batch_size}': summarize(time_requests(client, url, batches)),
+        }
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    arguments.add_argument('--url', help="Apps Script web app URL; the local stub when omitted")
+    arguments.add_argument('--requests', type=int, default=20, help="requests per kind")
+    arguments.add_argument('--batch-size', type=int, default=10, help="transactions per bulk request")
+    arguments.add_argument('--save', help="write the results to this JSON file")
+    arguments.add_argument('--compare', help="results saved earlier (e.g. before a redeploy) to compare with")
+    options = arguments.parse_args()
+
+    if options.url:
+        results = run(options.url, options.requests, options.batch_size)
+    else:
+        with StubSheetsServer() as stub:
+            results = run(stub.url, options.requests, options.batch_size)
+
+    earlier = {}
+    if options.compare:
+        with open(options.compare) as f:
+            earlier = json.load(f)
+
+    print(f"📊 Apps Script request times ({options.requests} requests per kind, {options.url or 'local stub'})\n")
+    print(f"{'request':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'before p50':>12}")
+    for kind, summary in results.items():
+        before = earlier.get(kind, {}).get('p50_ms')
+        print(f"{kind:<14}{summary['mean_ms']:>10.1f}{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}"
+              f"{summary['max_ms']:>10.1f}{before if before is not None else '-':>12}")
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nResults saved to {options.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the core library
+
+Runs ``python -X importtime`` in a clean subprocess, without BOT_TOKEN or
+SHEETS_API set, for the lightweight core (parser, models, formatters,
+importer) and for the full bot, and reports the cumulative import cost of
+each plus whether the Telegram / httpx stacks were pulled in.
+
+Usage:
+    python benchmarks/bench_import_time.py [runs]
+"""
+
+import sys
+import os
+import subprocess
+import statistics
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+CORE_MODULES = ('parser', 'models', 'formatters', 'importer')
+HEAVY_MODULES = ('telegram', 'httpx', 'dotenv')
+TARGETS = {
+    'core': CORE_MODULES,
+    'bot': ('main',),
+}
+
+
+def clean_env() -> dict:
+    """The current environment minus the bot's credentials."""
+    env = {key: value for key, value in os.environ.items() if key not in ('BOT_TOKEN', 'SHEETS_API')}
+    env['PYTHONPATH'] = SRC_DIR
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+def measure(modules: tuple) -> tuple:
+    """Import ``modules`` in a fresh interpreter; return (total µs, heavy modules loaded, top entries)."""
+    code = (
+        f"import sys, {', '.join(modules)}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=SRC_DIR, env=clean_env(), capture_output=True, text=True, check=True
+    )
+    total = 0
+    entries = []
+    startup = True
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith('  '):
+            continue  # Top-level entries already include their children
+        if startup:
+            # Everything up to and including site is interpreter startup
+            startup = name.strip() != 'site'
+            continue
+        total += int(cumulative)
+        entries.append((int(cumulative), name.strip()))
+    heavy = [name for name in result.stdout.strip().split(',') if name]
+    return total, heavy, sorted(entries, reverse=True)[:5]
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    for label, modules in TARGETS.items():
+        samples = []
+        for _ in range(runs):
+            total, heavy, top = measure(modules)
+            samples.append(total)
+        print(f"{label:<5} import {', '.join(modules)}")
+        print(f"  median  : {statistics.median(samples) / 1000:.1f} ms over {runs} runs")
+        print(f"  heavy   : {', '.join(heavy) or 'none'}")
+        print(f"  largest : {', '.join(f'{name} {us / 1000:.1f} ms' for us, name in top)}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Memory and throughput benchmark of the transaction models
+
+Builds N transactions (1M by default) with the original plain float
+dataclasses and with the slotted Decimal models, then serializes them to
+JSON: the original isinstance-chain payload builder with ``json.dumps``
+against the per-type serializers in codec.py (orjson when installed).
+Memory is the traced allocation of the list of transactions; amounts are
+parsed from a handful of strings, as the bot parses them from messages.
+
+Usage:
+    python benchmarks/bench_models.py [count]
+"""
+
+import sys
+import os
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import codec
+from models import Expense, Income, Transfer, amount_from_text
+
+TIMESTAMP = "2025-07-25T10:00:00"
+AMOUNTS = ["50.00", "1000.00", "200.00", "25.50", "13.37"]
+
+
+# The original models and payload builder
+@dataclass
+class LegacyExpense:
+    amount: float
+    category: str
+    account: str
+    name: str
+    date: str
+
+
+@dataclass
+class LegacyIncome:
+    amount: float
+    category: str
+    account: str
+    name: str
+    date: str
+
+
+@dataclass
+class LegacyTransfer:
+    amount: float
+    from_account: str
+    to_account: str
+    description: str
+    date: str
+
+
+def legacy_payload(transaction) -> dict:
+    base_payload = {'timestamp': TIMESTAMP, 'date': transaction.date, 'amount': transaction.amount}
+    if isinstance(transaction, LegacyExpense):
+        return {**base_payload, 'type': 'expense', 'category': transaction.category,
+                'account': transaction.account, 'description': transaction.name}
+    elif isinstance(transaction, LegacyIncome):
+        return {**base_payload, 'type': 'income', 'category': transaction.category,
+                'account': transaction.account, 'description': transaction.name}
+    elif isinstance(transaction, LegacyTransfer):
+        return {**base_payload, 'type': 'transfer', 'from_account': transaction.from_account,
+                'to_account': transaction.to_account, 'description': transaction.description}
+    raise ValueError(f"Unknown transaction type: {type(transaction)}")
+
+
+def build(count: int, expense, income, transfer, to_number) -> list:
+    """``count`` transactions cycling through the three types, amounts parsed from text."""
+    transactions = []
+    append = transactions.append
+    for i in range(count):
+        amount = to_number(AMOUNTS[i % len(AMOUNTS)])
+        kind = i % 3
+        if kind == 0:
+            append(expense(amount=amount, category="Transportation", account="Cash", name="Bus fare", date="2025-07-25"))
+        elif kind == 1:
+            append(income(amount=amount, category="Salary", account="BRI", name="Monthly salary", date="2025-07-25"))
+        else:
+            append(transfer(amount=amount, from_account="Cash", to_account="BRI", description="ATM", date="2025-07-25"))
+    return transactions
+
+
+def measure_build(count: int, *models) -> tuple:
+    """Return (transactions, seconds, traced bytes) for building ``count`` transactions."""
+    gc.collect()
+    start = time.perf_counter()
+    build(count, *models)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    transactions = build(count, *models)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return transactions, elapsed, used
+
+
+def measure_serialize(transactions: list, to_json) -> float:
+    start = time.perf_counter()
+    for transaction in transactions:
+        to_json(transaction)
+    return time.perf_counter() - start
+
+
+def main(count: int) -> None:
+    print(f"📊 Model benchmark ({count:,} transactions, JSON via {'orjson' if codec.orjson else 'json'})\n")
+    print(f"{'':<20}{'bytes/txn':>12}{'build/s':>14}{'serialize/s':>14}")
+
+    legacy, legacy_build, legacy_bytes = measure_build(count, LegacyExpense, LegacyIncome, LegacyTransfer, float)
+    legacy_serialize = measure_serialize(legacy, lambda t: json.dumps(legacy_payload(t)).encode())
+    print(f"{'dataclass (before)':<20}{legacy_bytes / count:>12.0f}{count / legacy_build:>14,.0f}"
+          f"{count / legacy_serialize:>14,.0f}")
+    del legacy
+
+    current, current_build, current_bytes = measure_build(count, Expense, Income, Transfer, amount_from_text)
+    current_serialize = measure_serialize(current, lambda t: codec.dumps(codec.to_payload(t, TIMESTAMP)))
+    print(f"{'slotted (after)':<20}{current_bytes / count:>12.0f}{count / current_build:>14,.0f}"
+          f"{count / current_serialize:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of bulk message parsing
+
+Compares parsing a multi-line message line by line with the original
+parser (raw pattern strings passed to re.match, repeated strip calls)
+against the single-pass FinanceParser.parse_bulk.
+
+Usage:
+    python benchmarks/bench_parser.py [lines]
+"""
+
+import sys
+import os
+import re
+import time
+from datetime import datetime
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models import Expense, Income, Transfer
+from parser import FinanceParser
+
+SAMPLE_LINES = [
+    "- 50.00 Transportation Cash Bus fare to work",
+    "+ 1000.00 Salary BRI Monthly salary @2024-01-20",
+    "t 200.00 Cash > BRI ATM deposit",
+    "- 25.50 Shopping Gopay Weekly groceries @2024-01-15",
+    "not a transaction",
+]
+
+
+# The original per-type patterns, kept as the reference for the tokenizer in parser.py
+LEGACY_EXPENSE_PATTERN = r'^-\s*(\d+(?:\.\d{2})?)\s+(\S+)\s+(\S+)\s+(.+?)(?:\s+@(\d{4}-\d{2}-\d{2}))?$'
+LEGACY_INCOME_PATTERN = r'^\+\s*(\d+(?:\.\d{2})?)\s+(\S+)\s+(\S+)\s+(.+?)(?:\s+@(\d{4}-\d{2}-\d{2}))?$'
+LEGACY_TRANSFER_PATTERN = r'^t\s*(\d+(?:\.\d{2})?)\s+(\S+)\s*>\s*(\S+)(?:\s+(.+?))?(?:\s+@(\d{4}-\d{2}-\d{2}))?$'
+
+
+class LegacyParser:
+    """The parser as it was before bulk parsing: raw patterns, repeated strips."""
+
+    def __init__(self):
+        self.expense_pattern = LEGACY_EXPENSE_PATTERN
+        self.income_pattern = LEGACY_INCOME_PATTERN
+        self.transfer_pattern = LEGACY_TRANSFER_PATTERN
+
+    def get_today_date(self) -> str:
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def parse_expense(self, text: str):
+        match = re.match(self.expense_pattern, text.strip())
+        if match:
+            amount, category, account, name, date = match.groups()
+            return Expense(amount=float(amount), category=category, account=account,
+                           name=name.strip(), date=date if date else self.get_today_date())
+        return None
+
+    def parse_income(self, text: str):
+        match = re.match(self.income_pattern, text.strip())
+        if match:
+            amount, category, account, name, date = match.groups()
+            return Income(amount=float(amount), category=category, account=account,
+                          name=name.strip(), date=date if date else self.get_today_date())
+        return None
+
+    def parse_transfer(self, text: str):
+        match = re.match(self.transfer_pattern, text.strip())
+        if match:
+            amount, from_account, to_account, description, date = match.groups()
+            return Transfer(amount=float(amount), from_account=from_account, to_account=to_account,
+                            description=description.strip() if description else "",
+                            date=date if date else self.get_today_date())
+        return None
+
+    def parse_message(self, text: str):
+        if text.strip().startswith('-'):
+            return self.parse_expense(text)
+        elif text.strip().startswith('+'):
+            return self.parse_income(text)
+        elif text.strip().startswith('t '):
+            return self.parse_transfer(text)
+        return None
+
+
+def lines_per_second(func, lines: int, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return lines / best
+
+
+def main(lines: int) -> None:
+    message = "\n".join(SAMPLE_LINES[i % len(SAMPLE_LINES)] for i in range(lines))
+    legacy = LegacyParser()
+    parser = FinanceParser()
+
+    def run_legacy():
+        for line in message.splitlines():
+            if line.strip():
+                legacy.parse_message(line)
+
+    def run_bulk():
+        parser.parse_bulk(message)
+
+    print(f"📊 Parser benchmark ({lines} lines per message)\n")
+    print(f"{'line-by-line (before)':<24} {lines_per_second(run_legacy, lines):>12,.0f} lines/s")
+    print(f"{'parse_bulk (after)':<24} {lines_per_second(run_bulk, lines):>12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
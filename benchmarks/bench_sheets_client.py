@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-send latency of the Google Sheets integration
+
+Compares the old behaviour (a fresh httpx.AsyncClient per transaction)
+with the shared, connection-pooled client owned by SheetsIntegration,
+both against a local stub of the Apps Script web app.
+
+Usage:
+    python benchmarks/bench_sheets_client.py [iterations]
+"""
+
+import sys
+import os
+import asyncio
+import statistics
+import time
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault('BOT_TOKEN', 'benchmark-token')
+os.environ.setdefault('SHEETS_API', 'http://127.0.0.1/exec')
+
+import httpx
+
+from benchmarks.stub_server import StubSheetsServer
+from models import Expense
+from sheets import SheetsIntegration
+
+TRANSACTION = Expense(
+    amount=50.00,
+    category="Transportation",
+    account="Cash",
+    name="Benchmark bus fare",
+    date="2025-07-25"
+)
+
+
+def report(label: str, timings: list) -> None:
+    """Print latency statistics in milliseconds."""
+    timings_ms = sorted(t * 1000 for t in timings)
+    p99 = timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.99))]
+    print(f"{label:<28} mean {statistics.mean(timings_ms):7.3f} ms   "
+          f"p50 {statistics.median(timings_ms):7.3f} ms   p99 {p99:7.3f} ms")
+
+
+async def bench_client_per_send(integration: SheetsIntegration, iterations: int) -> list:
+    """Old behaviour: open a new client for every transaction."""
+    payload = integration._prepare_payload(TRANSACTION)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=integration.timeout, follow_redirects=True) as client:
+            response = await client.post(integration.api_url, json=payload)
+            response.raise_for_status()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def bench_pooled_client(integration: SheetsIntegration, iterations: int) -> list:
+    """New behaviour: reuse the integration's pooled client."""
+    await integration.start()
+    timings = []
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            assert await integration.send_to_sheets(TRANSACTION)
+            timings.append(time.perf_counter() - start)
+    finally:
+        await integration.close()
+    return timings
+
+
+async def run(iterations: int) -> None:
+    with StubSheetsServer() as server:
+        integration = SheetsIntegration(api_url=server.url, rate_limit=0)  # Unthrottled: measure connections only
+        
+        print(f"📊 Sheets client benchmark ({iterations} sends against {server.url})\n")
+        report("client per send (before)", await bench_client_per_send(integration, iterations))
+        report("pooled client (after)", await bench_pooled_client(integration, iterations))
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Load test for webhook mode
+
+Starts the bot in webhook mode on localhost, wired to local stubs of the
+Telegram Bot API and the Apps Script web app, then replays synthetic
+message updates at the webhook and reports p50/p99 handler latency: the
+time from POSTing an update until the bot's reply reaches the Bot API stub.
+
+Usage:
+    python benchmarks/load_test_webhook.py [updates] [concurrency] [chats]
+"""
+
+import sys
+import os
+import asyncio
+import logging
+import socket
+import statistics
+import tempfile
+import time
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import httpx
+
+from benchmarks.stub_server import StubSheetsServer, StubTelegramServer
+
+SECRET = 'load-test-secret'
+URL_PATH = 'telegram'
+MESSAGE = "- 12.50 Transportation Cash Load test"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def synthetic_update(update_id: int, chat_id: int) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load'},
+            'text': MESSAGE,
+        },
+    }
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def replay(webhook_url: str, telegram: StubTelegramServer, updates: int, concurrency: int, chats: int) -> None:
+    sent = {}  # chat_id -> perf_counter() times at which its updates were posted
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(headers={'X-Telegram-Bot-Api-Secret-Token': SECRET}) as client:
+        # Requests without the right secret token must be rejected
+        forged = await client.post(webhook_url, json=synthetic_update(0, 1),
+                                   headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'})
+        print(f"Forged secret token     : HTTP {forged.status_code}")
+        assert forged.status_code == 403
+
+        async def post(update_id: int) -> None:
+            chat_id = 1000 + update_id % chats
+            async with semaphore:
+                sent.setdefault(chat_id, []).append(time.perf_counter())
+                response = await client.post(webhook_url, json=synthetic_update(update_id, chat_id))
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(update_id) for update_id in range(1, updates + 1)))
+        while telegram.reply_count() < updates and time.perf_counter() - started < 120:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+    # Replies to one chat come back in order, so pair them up with the posts
+    latencies = []
+    for chat_id, posted in sent.items():
+        for posted_at, replied_at in zip(posted, telegram.replies.get(chat_id, [])):
+            latencies.append((replied_at - posted_at) * 1000)
+
+    print(f"Updates answered        : {len(latencies)}/{updates} in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f} updates/s)")
+    if latencies:
+        print(f"Handler latency p50     : {percentile(latencies, 0.50):.1f} ms")
+        print(f"Handler latency p99     : {percentile(latencies, 0.99):.1f} ms")
+        print(f"Handler latency mean    : {statistics.mean(latencies):.1f} ms")
+
+
+async def run(updates: int, concurrency: int, chats: int) -> None:
+    from telegram.ext import Application
+    from main import build_application, post_init, post_shutdown, ALLOWED_UPDATES
+    logging.getLogger().setLevel(logging.WARNING)  # Per-update logging would skew the timings
+
+    port = free_port()
+    with StubTelegramServer() as telegram:
+        application = build_application(
+            Application.builder().token('123456:load-test').base_url(telegram.base_url)
+        )
+        await application.initialize()
+        await post_init(application)
+        await application.updater.start_webhook(
+            listen='127.0.0.1',
+            port=port,
+            url_path=URL_PATH,
+            webhook_url=f"http://127.0.0.1:{port}/{URL_PATH}",
+            secret_token=SECRET,
+            allowed_updates=ALLOWED_UPDATES
+        )
+        await application.start()
+        try:
+            await replay(f"http://127.0.0.1:{port}/{URL_PATH}", telegram, updates, concurrency, chats)
+        finally:
+            await application.updater.stop()
+            await application.stop()
+            await post_shutdown(application)
+            await application.shutdown()
+
+
+def main() -> None:
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    chats = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    with StubSheetsServer() as sheets, tempfile.TemporaryDirectory() as data_dir:
+        # Configure the bot before any of its modules are imported
+        os.environ.update({
+            'BOT_TOKEN': '123456:load-test',
+            'SHEETS_API': sheets.url,
+            'BOT_MODE': 'webhook',
+            'WEBHOOK_URL': 'http://127.0.0.1',
+            'WEBHOOK_SECRET': SECRET,
+            'DATA_DIR': data_dir,
+            # Every update carries the same text, which must not count as a repeat
+            'DEDUP_CONTENT_WINDOW': '0',
+        })
+        print(f"Replaying {updates} updates from {chats} chats, {concurrency} in flight\n")
+        asyncio.run(run(updates, concurrency, chats))
+
+
+if __name__ == "__main__":
+    main()
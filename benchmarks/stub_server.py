@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Local stub of the Google Apps Script web app used by the benchmarks
+
+It mimics the deployed script closely enough for latency measurements:
+a POST to /exec answers with a 302 redirect (like script.google.com does)
+and the redirected GET returns "Success", or another body given to the
+server (e.g. an "Error: ..." rejection).
+
+A minimal stub of the Telegram Bot API is included as well, so the bot can
+run end to end without network access.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """Threaded server with a listen backlog deep enough for concurrent clients."""
+    
+    daemon_threads = True
+    request_queue_size = 128  # The default of 5 drops bursts of connections into SYN retries
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler emulating the Apps Script redirect flow."""
+    
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so pooled clients can reuse connections
+    disable_nagle_algorithm = True
+    
+    def _send(self, status: int, body: bytes = b'', headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.server.requests += 1
+        self._send(302, headers={'Location': '/result'})
+    
+    def do_GET(self):
+        self._send(200, self.server.body, {'Content-Type': 'text/plain'})
+    
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+
+class StubSheetsServer:
+    """Run the stub Apps Script server in a background thread."""
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0, body: bytes = b'Success'):
+        self.httpd = StubHTTPServer((host, port), StubHandler)
+        self.httpd.delay = delay
+        self.httpd.body = body
+        self.httpd.requests = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/exec"
+    
+    @property
+    def requests(self) -> int:
+        return self.httpd.requests
+    
+    def __enter__(self) -> 'StubSheetsServer':
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StubTelegramHandler(BaseHTTPRequestHandler):
+    """Answers the Bot API methods the bot calls and records when each chat got a reply."""
+    
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    
+    def _reply(self, result) -> None:
+        body = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        received_at = time.perf_counter()
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length).decode()
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            params = json.loads(raw or '{}')
+        else:
+            params = {name: values[0] for name, values in parse_qs(raw).items()}
+        method = self.path.rsplit('/', 1)[-1]
+        
+        if method == 'getMe':
+            self._reply({'id': 1, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'})
+        elif method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            if method == 'sendMessage':
+                with self.server.lock:
+                    self.server.replies[chat_id].append(received_at)
+            self._reply({
+                'message_id': int(params.get('message_id', 0)) or 1,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            })
+        else:
+            # setWebhook, deleteWebhook and anything else simply succeed
+            self._reply(True)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class StubTelegramServer:
+    """Run the stub Bot API in a background thread.
+    
+    ``replies`` maps chat id to the perf_counter() times at which the bot
+    sent a message to that chat, in order.
+    """
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.httpd = StubHTTPServer((host, port), StubTelegramHandler)
+        self.httpd.lock = threading.Lock()
+        self.httpd.replies = defaultdict(list)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/bot"
+    
+    @property
+    def replies(self) -> dict:
+        return self.httpd.replies
+    
+    def reply_count(self) -> int:
+        with self.httpd.lock:
+            return sum(len(times) for times in self.httpd.replies.values())
+    
+    def __enter__(self) -> 'StubTelegramServer':
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite with a saved baseline
+
+Covers the parser on valid, invalid and pathological input, the reply
+formatter, Sheets payload preparation and the full ``handle_message`` path
+(fake Telegram update, real outbox, ledger and batcher, local stub of the
+Apps Script web app). Each case reports ops/sec and p99 latency.
+
+Results are compared against ``benchmarks/baseline.json``; a case is a
+regression when its throughput drops or its p99 grows by more than the
+tolerance, and the script then exits with status 1. Baselines are machine
+specific: refresh them with ``--save-baseline`` on the machine that runs
+the comparison.
+
+Usage:
+    python benchmarks/suite.py [--iterations N] [--repeat 3] [--tolerance 0.5] [--save-baseline] [--only NAME]
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmarks.stub_server import StubSheetsServer
+from models import Expense, Income, Transfer
+from parser import FinanceParser
+from formatters import format_transaction_response
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# p99 growth below this is scheduler and timer jitter, not a regression
+P99_SLACK_US = 5.0
+
+VALID_MESSAGES = [
+    "- 50.00 Transportation Cash Bus fare to work",
+    "+ 1000.00 Salary BRI Monthly salary @2024-01-20",
+    "t 200.00 Cash > BRI ATM deposit",
+    "- 25.50 Shopping Gopay Weekly groceries @2024-01-15",
+]
+INVALID_MESSAGES = [
+    "hello there",
+    "- abc Transportation Cash Bus",
+    "+ 100 Salary",
+    "t 50 Cash BRI no arrow",
+]
+# Long inputs shaped to make backtracking regexes work hard
+PATHOLOGICAL_MESSAGES = [
+    "- 1 Other Cash " + " " * 4000 + "x",
+    "- 1 Other Cash " + "@ " * 2000,
+    "- 1 Other Cash " + "x @2024-01-0 " * 300,
+    "+ 1 Other Cash" + " a" * 2000 + " @2024-13-45!",
+    "t 1 Cash > BRI " + "> " * 2000,
+    "- " + "1" * 4000,
+]
+TRANSACTIONS = [
+    Expense(amount=50.00, category="Transportation", account="Cash", name="Bus fare", date="2025-07-25"),
+    Income(amount=1000.00, category="Salary", account="BRI", name="Monthly salary", date="2025-07-25"),
+    Transfer(amount=200.00, from_account="Cash", to_account="BRI", description="ATM deposit", date="2025-07-25"),
+]
+
+
+def cycle(items: list, iterations: int) -> list:
+    return [items[i % len(items)] for i in range(iterations)]
+
+
+def time_calls(function: Callable, arguments: list) -> List[float]:
+    """Call ``function`` once per argument and return the per-call durations."""
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+# ----------------------------------------------------------------------
+# Cases: each takes an iteration count and returns per-operation timings
+# ----------------------------------------------------------------------
+
+def bench_parse_valid(iterations: int) -> List[float]:
+    return time_calls(FinanceParser().parse_message, cycle(VALID_MESSAGES, iterations))
+
+
+def bench_parse_invalid(iterations: int) -> List[float]:
+    return time_calls(FinanceParser().parse_message, cycle(INVALID_MESSAGES, iterations))
+
+
+def bench_parse_pathological(iterations: int) -> List[float]:
+    return time_calls(FinanceParser().parse_message, cycle(PATHOLOGICAL_MESSAGES, max(1, iterations // 10)))
+
+
+def bench_format_response(iterations: int) -> List[float]:
+    return time_calls(format_transaction_response, cycle(TRANSACTIONS, iterations))
+
+
+def bench_prepare_payload(iterations: int) -> List[float]:
+    from sheets import SheetsIntegration
+    return time_calls(SheetsIntegration(api_url='http://127.0.0.1/exec')._prepare_payload,
+                      cycle(TRANSACTIONS, iterations))
+
+
+class FakeMessage:
+    """Stands in for telegram.Message; replies are recorded, not sent."""
+
+    def __init__(self, text: str = ''):
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        return FakeMessage(text)
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        return self
+
+
+class FakeApplication:
+    """Collects the background tasks a handler starts."""
+
+    def __init__(self):
+        self.tasks = []
+
+    def create_task(self, coroutine, update=None, **kwargs):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.append(task)
+        return task
+
+
+async def _handle_messages(url: str, data_dir: str, iterations: int) -> List[float]:
+    import handlers
+    from sheets import SheetsIntegration
+    from batcher import SheetsBatcher
+    from outbox import Outbox
+    from ledger import Ledger
+    from dedup import DedupCache
+
+    sheets = SheetsIntegration(api_url=url, rate_limit=0)
+    batcher = SheetsBatcher(sheets, max_delay_ms=0)
+    outbox = Outbox(os.path.join(data_dir, 'outbox.sqlite3'), batcher)
+    ledger = Ledger(os.path.join(data_dir, 'ledger.sqlite3'))
+    originals = handlers.outbox, handlers.ledger, handlers.dedup_cache
+    handlers.outbox, handlers.ledger = outbox, ledger
+    # The same few messages are sent over and over, so repeats must not be dropped
+    handlers.dedup_cache = DedupCache(persist=False, content_window=0)
+    await ledger.start()
+    await sheets.start()
+    await batcher.start()
+    await outbox.start()
+    timings = []
+    try:
+        for text in cycle(VALID_MESSAGES, iterations):
+            update = SimpleNamespace(message=FakeMessage(text), effective_chat=SimpleNamespace(id=42),
+                                     effective_user=SimpleNamespace(id=7))
+            context = SimpleNamespace(application=FakeApplication())
+            # One operation: reply sent and the transaction confirmed in the spreadsheet
+            start = time.perf_counter()
+            await handlers.handle_message(update, context)
+            await asyncio.gather(*context.application.tasks)
+            timings.append(time.perf_counter() - start)
+    finally:
+        handlers.outbox, handlers.ledger, handlers.dedup_cache = originals
+        await outbox.stop()
+        await batcher.stop()
+        await sheets.close()
+        await ledger.close()
+    return timings
+
+
+def bench_handle_message(iterations: int) -> List[float]:
+    with StubSheetsServer() as stub, tempfile.TemporaryDirectory() as data_dir:
+        return asyncio.run(_handle_messages(stub.url, data_dir, max(1, iterations // 20)))
+
+
+CASES: Dict[str, Callable[[int], List[float]]] = {
+    'parse_valid': bench_parse_valid,
+    'parse_invalid': bench_parse_invalid,
+    'parse_pathological': bench_parse_pathological,
+    'format_transaction_response': bench_format_response,
+    'prepare_payload': bench_prepare_payload,
+    'handle_message_e2e': bench_handle_message,
+}
+
+
+# ----------------------------------------------------------------------
+# Reporting and baseline comparison
+# ----------------------------------------------------------------------
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return {
+        'ops_per_sec': round(len(timings) / sum(timings), 1),
+        'p99_us': round(p99 * 1e6, 2),
+    }
+
+
+def compare(name: str, result: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Describe how ``result`` regressed against ``baseline``; empty if it did not."""
+    problems = []
+    if result['ops_per_sec'] < baseline['ops_per_sec'] * (1 - tolerance):
+        problems.append(f"{name}: {result['ops_per_sec']:.0f} ops/s, baseline {baseline['ops_per_sec']:.0f} ops/s")
+    if result['p99_us'] > max(baseline['p99_us'] * (1 + tolerance), baseline['p99_us'] + P99_SLACK_US):
+        problems.append(f"{name}: p99 {result['p99_us']:.1f} µs, baseline {baseline['p99_us']:.1f} µs")
+    return problems
+
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    arguments.add_argument('--iterations', type=int, default=20000)
+    arguments.add_argument('--repeat', type=int, default=3, help="runs per case; the best one is reported")
+    arguments.add_argument('--tolerance', type=float, default=0.5,
+                           help="allowed fractional slowdown before a case counts as a regression")
+    arguments.add_argument('--save-baseline', action='store_true', help="write the results to baseline.json")
+    arguments.add_argument('--only', action='append', choices=sorted(CASES), help="run only this case")
+    options = arguments.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'case':<30}{'ops/sec':>12}{'p99 µs':>12}{'baseline ops/sec':>20}")
+    for name in options.only or CASES:
+        CASES[name](max(1, options.iterations // 10))  # Warm up caches and connections
+        runs = [summarize(CASES[name](options.iterations)) for _ in range(max(1, options.repeat))]
+        # Best of several runs, as timeit does: slower runs measure noise from elsewhere on the machine
+        results[name] = {'ops_per_sec': max(run['ops_per_sec'] for run in runs),
+                         'p99_us': min(run['p99_us'] for run in runs)}
+        expected = baseline.get(name)
+        print(f"{name:<30}{results[name]['ops_per_sec']:>12.0f}{results[name]['p99_us']:>12.1f}"
+              f"{expected['ops_per_sec'] if expected else '-':>20}")
+        if expected and not options.save_baseline:
+            regressions.extend(compare(name, results[name], expected, options.tolerance))
+
+    if options.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+    elif regressions:
+        print("\nRegressions:")
+        for problem in regressions:
+            print(f"  {problem}")
+        sys.exit(1)
+    else:
+        print("\nNo regressions" if baseline else "\nNo baseline yet; run with --save-baseline")
+
+
+if __name__ == "__main__":
+    main()
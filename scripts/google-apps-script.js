@@ -9,36 +9,58 @@
  * - Who has access: Anyone
  */
 
+// Set to true to log every request in detail; each log call adds execution time
+const DEBUG = false;
+
+/**
+ * Log only when DEBUG is on
+ */
+function debugLog() {
+  if (DEBUG) {
+    console.log.apply(console, arguments);
+  }
+}
+
 /**
  * Main function that handles POST requests from the bot
  */
 function doPost(e) {
+  const started = Date.now();
   try {
-    // Log the incoming request for debugging
-    console.log('=== doPost called ===');
-    console.log('Received POST request:', e.postData.contents);
+    debugLog('Received POST request:', e.postData.contents);
     
     // Parse the JSON payload
     const data = JSON.parse(e.postData.contents);
-    console.log('Parsed data:', JSON.stringify(data));
     
-    // Validate required fields
-    if (!data.type || !data.amount || !data.date) {
-      throw new Error('Missing required fields: type, amount, or date');
-    }
+    // Bulk payload from the bot's write-behind batcher: { transactions: [...] }
+    // A single transaction is handled as a batch of one
+    const transactions = Array.isArray(data.transactions) ? data.transactions : [data];
+    
+    // Every row is checked on its own, so one bad row does not fail the rest of the batch
+    const invalid = {};
+    const valid = transactions.filter(function(transaction, index) {
+      const problem = validateTransaction(transaction);
+      if (problem) {
+        invalid[transaction.idempotency_key || String(index)] = problem;
+        return false;
+      }
+      return true;
+    });
+    const count = saveUnseenTransactions(valid);
     
-    // Save data to spreadsheet
-    const result = saveToSpreadsheet(data);
-    console.log('saveToSpreadsheet result:', result);
+    // One line per request: rows written and execution time
+    console.log(JSON.stringify({
+      event: 'doPost', received: transactions.length, saved: count,
+      invalid: Object.keys(invalid).length, ms: Date.now() - started
+    }));
     
-    // Return success response
+    // Rows refused, by idempotency key (or position in the batch when a row has none)
     return ContentService
-      .createTextOutput('Success')
-      .setMimeType(ContentService.MimeType.TEXT);
+      .createTextOutput(JSON.stringify({ saved: count, invalid: invalid }))
+      .setMimeType(ContentService.MimeType.JSON);
       
   } catch (error) {
-    console.error('=== Error in doPost ===');
-    console.error('Error processing request:', error);
+    console.error(JSON.stringify({ event: 'doPost', error: String(error), ms: Date.now() - started }));
     
     // Return error response
     return ContentService
@@ -48,85 +70,386 @@ function doPost(e) {
 }
 
 /**
- * Save transaction data to the appropriate Google Sheets spreadsheet
+ * Save a single transaction to the sheet of its type
  */
 function saveToSpreadsheet(data) {
+  saveUnseenTransactions([data]);
+  return true;
+}
+
+// How long recently saved idempotency keys stay in the script cache (its maximum: 6 hours).
+// The Key column is the durable record; it is only searched for payloads the bot flags as retries
+const IDEMPOTENCY_TTL_SECONDS = 21600;
+
+/**
+ * Save the transactions not saved before and return how many were written
+ *
+ * The script lock is held from the duplicate check until the rows are
+ * written and their keys recorded, so two deliveries of the same payload
+ * (a retry racing a slow first attempt) cannot both pass the check.
+ */
+function saveUnseenTransactions(transactions) {
+  const lock = LockService.getScriptLock();
+  lock.waitLock(LOCK_TIMEOUT_MS);
   try {
-    console.log('=== saveToSpreadsheet called ===');
-    console.log('Data type:', data.type);
-    
-    // Get or create the appropriate sheet based on transaction type
-    const sheet = getOrCreateSheetByType(data.type);
-    console.log('Sheet obtained:', sheet.getName());
-    
-    // Prepare row data based on transaction type
-    let rowData;
-    
-    if (data.type === 'expense' || data.type === 'income') {
-      rowData = [
-        data.timestamp,           // A: Timestamp
-        data.date,               // B: Date
-        data.amount,             // C: Amount
-        data.category || '',     // D: Category
-        data.account || '',      // E: Account
-        data.description || ''   // F: Description
-      ];
-    } else if (data.type === 'transfer') {
-      rowData = [
-        data.timestamp,              // A: Timestamp
-        data.date,                   // B: Date
-        data.amount,                 // C: Amount
-        data.from_account || '',     // D: From Account
-        data.to_account || '',       // E: To Account
-        data.description || ''       // F: Description
-      ];
-    } else {
-      throw new Error('Unknown transaction type: ' + data.type);
+    const fresh = filterUnseenTransactions(transactions);
+    if (!fresh.length) {
+      return 0;
     }
-    
-    console.log('Row data prepared:', JSON.stringify(rowData));
-    
-    // Add the row to the appropriate sheet
-    sheet.appendRow(rowData);
-    console.log('Row appended to sheet');
-    
-    // Get the new row index and setup dropdowns
-    const newRowIndex = sheet.getLastRow();
-    console.log('=== DROPDOWN SETUP START ===');
-    console.log('Setting up dropdowns for new row:', newRowIndex, 'type:', data.type);
-    
-    // Call dropdown setup
-    setupDropdownsForNewRow(sheet, newRowIndex, data.type);
-    
-    console.log('=== DROPDOWN SETUP END ===');
-    console.log('Dropdown setup completed for row:', newRowIndex);
-    
-    console.log('Successfully saved transaction:', data.type, data.amount, 'to', sheet.getName());
+    const count = saveBatchToSpreadsheet(fresh);
+    // Make the new rows, and their keys, visible to the next request before it takes the lock
+    SpreadsheetApp.flush();
+    markTransactionsSeen(fresh);
+    return count;
+  } finally {
+    lock.releaseLock();
+  }
+}
+
+/**
+ * Drop transactions whose idempotency key was already saved
+ *
+ * The bot retries undelivered payloads with the same idempotency_key for as
+ * long as it takes, so a retry must never append the row a second time.
+ * Every key is looked up in the script cache. Payloads flagged ``retry``
+ * (the bot may have sent them before) are also searched for in the hidden
+ * Key column of their sheet, one key at a time, so a first delivery never
+ * reads the column and its cost does not grow with the sheet.
+ * Payloads without a key (older bot versions) are always accepted.
+ */
+function filterUnseenTransactions(transactions) {
+  const keys = transactions
+    .map(function(data) { return data.idempotency_key; })
+    .filter(function(key) { return key; })
+    .map(function(key) { return 'idem:' + key; });
+  const cached = keys.length ? CacheService.getScriptCache().getAll(keys) : {};
+  const batchKeys = {};
+  
+  return transactions.filter(function(data) {
+    const key = data.idempotency_key;
+    if (!key) {
+      return true;
+    }
+    if (batchKeys[key] || cached['idem:' + key]) {
+      debugLog('Skipping duplicate transaction:', key);
+      return false;
+    }
+    if (data.retry && isKeySaved(data.type, key)) {
+      debugLog('Skipping duplicate transaction:', key);
+      return false;
+    }
+    batchKeys[key] = true;
     return true;
-    
-  } catch (error) {
-    console.error('=== Error in saveToSpreadsheet ===');
-    console.error('Error saving to spreadsheet:', error);
-    console.error('Stack trace:', error.stack);
-    throw error;
+  });
+}
+
+/**
+ * True if the Key column of a transaction type's sheet holds the key
+ *
+ * The search runs inside Sheets, so the column is never loaded into the script.
+ */
+function isKeySaved(transactionType, key) {
+  const sheet = getOrCreateSheetByType(transactionType);
+  const lastRow = sheet.getLastRow();
+  if (lastRow < 2) {
+    return false;
   }
+  return sheet.getRange(2, KEY_COLUMN, lastRow - 1, 1)
+    .createTextFinder(key)
+    .matchEntireCell(true)
+    .findNext() !== null;
+}
+
+/**
+ * Remember the idempotency keys of saved transactions
+ */
+function markTransactionsSeen(transactions) {
+  const values = {};
+  for (const data of transactions) {
+    if (data.idempotency_key) {
+      values['idem:' + data.idempotency_key] = '1';
+    }
+  }
+  if (Object.keys(values).length) {
+    CacheService.getScriptCache().putAll(values, IDEMPOTENCY_TTL_SECONDS);
+  }
+}
+
+/**
+ * Reason a transaction cannot be saved, or '' when it is fine
+ */
+function validateTransaction(data) {
+  if (!data || !SHEET_CONFIGS[data.type]) {
+    return 'Unknown transaction type: ' + (data && data.type);
+  }
+  if (!(Number(data.amount) > 0)) {
+    return 'Amount must be a positive number';
+  }
+  if (!data.date) {
+    return 'Missing date';
+  }
+  return '';
+}
+
+/**
+ * Build the row written to the sheet for a single transaction
+ */
+function buildRowData(data) {
+  if (data.type === 'expense' || data.type === 'income') {
+    return [
+      data.timestamp,           // A: Timestamp
+      data.date,               // B: Date
+      data.amount,             // C: Amount
+      data.category || '',     // D: Category
+      data.account || '',      // E: Account
+      data.description || '',  // F: Description
+      data.idempotency_key || ''  // G: Key (hidden)
+    ];
+  } else if (data.type === 'transfer') {
+    return [
+      data.timestamp,              // A: Timestamp
+      data.date,                   // B: Date
+      data.amount,                 // C: Amount
+      data.from_account || '',     // D: From Account
+      data.to_account || '',       // E: To Account
+      data.description || '',      // F: Description
+      data.idempotency_key || ''   // G: Key (hidden)
+    ];
+  }
+  throw new Error('Unknown transaction type: ' + data.type);
+}
+
+/**
+ * Save a batch of transactions with one range write per sheet
+ *
+ * Rows are grouped by transaction type, a block of rows is reserved in each
+ * sheet and filled with a single setValues call. Dropdown validation is
+ * already in place on the whole column, so nothing else is written.
+ * Call it with the script lock held (see saveUnseenTransactions).
+ */
+function saveBatchToSpreadsheet(transactions) {
+  const rowsByType = {};
+  
+  for (const data of transactions) {
+    const problem = validateTransaction(data);
+    if (problem) {
+      throw new Error(problem);
+    }
+    if (!rowsByType[data.type]) {
+      rowsByType[data.type] = [];
+    }
+    rowsByType[data.type].push(buildRowData(data));
+  }
+  
+  const counts = {};
+  for (const transactionType in rowsByType) {
+    counts[transactionType] = rowsByType[transactionType].length;
+  }
+  const reservations = reserveRows(counts);
+  
+  let saved = 0;
+  for (const transactionType in rowsByType) {
+    const rows = rowsByType[transactionType];
+    const reservation = reservations[transactionType];
+    try {
+      reservation.sheet.getRange(reservation.startRow, 1, rows.length, rows[0].length).setValues(rows);
+    } catch (error) {
+      // The cached sheet size may be stale (rows deleted by hand); re-read it on the retry
+      resetRowPointers();
+      throw error;
+    }
+    debugLog('Saved', rows.length, transactionType, 'rows at row', reservation.startRow);
+    saved += rows.length;
+  }
+  return saved;
+}
+
+// Sheet layout per transaction type. Columns D and E get dropdowns from getDropdownOptions()
+const SHEET_CONFIGS = {
+  'expense': {
+    name: 'Expenses',
+    headers: ['Timestamp', 'Date', 'Amount', 'Category', 'Account', 'Description', 'Key'],
+    color: '#dc3545', // Red
+    widths: [180, 100, 100, 120, 120, 200, 120],
+    dropdowns: [['categories', 'Select a category from the dropdown'], ['accounts', 'Select an account from the dropdown']]
+  },
+  'income': {
+    name: 'Income',
+    headers: ['Timestamp', 'Date', 'Amount', 'Category', 'Account', 'Description', 'Key'],
+    color: '#28a745', // Green
+    widths: [180, 100, 100, 120, 120, 200, 120],
+    dropdowns: [['categories', 'Select a category from the dropdown'], ['accounts', 'Select an account from the dropdown']]
+  },
+  'transfer': {
+    name: 'Transfers',
+    headers: ['Timestamp', 'Date', 'Amount', 'From Account', 'To Account', 'Description', 'Key'],
+    color: '#17a2b8', // Blue
+    widths: [180, 100, 100, 120, 120, 200, 120],
+    dropdowns: [['accounts', 'Select the source account'], ['accounts', 'Select the destination account']]
+  }
+};
+
+// Bump when the column setup changes, so existing sheets are set up again once
+const SHEET_SETUP_VERSION = '3';
+// Hidden column holding each row's idempotency key, the durable record of saved payloads
+const KEY_COLUMN = 7;
+// Rows added when a sheet is full; they get the column validation in the same step
+const GROW_ROWS = 1000;
+// How long the next free row of a sheet is cached before the sheet is read again
+const ROW_POINTER_TTL_SECONDS = 600;
+// How long a request waits for another one to finish saving its rows
+const LOCK_TIMEOUT_MS = 20000;
+
+// Spreadsheet and sheet handles and validation rules, looked up at most once per execution
+let activeSpreadsheet = null;
+const sheetHandles = {};
+let dropdownRules = null;
+
+/**
+ * Reserve a block of empty rows in the sheet of each transaction type
+ *
+ * ``counts`` maps transaction types to the number of rows needed. The
+ * caller holds the script lock, so concurrent requests get disjoint blocks.
+ * The pointers live in the script cache; a sheet's own last row still wins,
+ * so rows typed in by hand are never overwritten. Returns
+ * ``{type: {sheet, startRow}}``.
+ */
+function reserveRows(counts) {
+  const types = Object.keys(counts);
+  const keys = types.map(function(type) { return rowPointerKey(type); });
+  const cache = CacheService.getScriptCache();
+  const cached = cache.getAll(keys);
+  const updated = {};
+  const reservations = {};
+  for (const type of types) {
+    const config = SHEET_CONFIGS[type];
+    const sheet = getOrCreateSheetByType(type);
+    const key = rowPointerKey(type);
+    let state = cached[key] ? JSON.parse(cached[key]) : null;
+    if (!state) {
+      state = { next: 2, maxRows: sheet.getMaxRows() };
+      ensureSheetSetUp(sheet, config, state.maxRows);
+    }
+    const startRow = Math.max(state.next, sheet.getLastRow() + 1);
+    const endRow = startRow + counts[type] - 1;
+    if (endRow > state.maxRows) {
+      const added = Math.max(GROW_ROWS, endRow - state.maxRows);
+      sheet.insertRowsAfter(state.maxRows, added);
+      applyColumnValidation(sheet, config, state.maxRows + 1, added);
+      state.maxRows += added;
+    }
+    state.next = endRow + 1;
+    updated[key] = JSON.stringify(state);
+    reservations[type] = { sheet: sheet, startRow: startRow };
+  }
+  cache.putAll(updated, ROW_POINTER_TTL_SECONDS);
+  return reservations;
+}
+
+/**
+ * Script cache key of the next free row of a transaction type's sheet
+ */
+function rowPointerKey(transactionType) {
+  const config = SHEET_CONFIGS[transactionType];
+  if (!config) {
+    throw new Error('Unknown transaction type: ' + transactionType);
+  }
+  return 'rows:' + config.name;
+}
+
+/**
+ * Clear every cached row pointer, e.g. after deleting or moving rows by hand
+ */
+function resetRowPointers() {
+  CacheService.getScriptCache().removeAll(Object.keys(SHEET_CONFIGS).map(rowPointerKey));
+  return 'Row pointers cleared';
+}
+
+/**
+ * Apply the column-level setup once per sheet and setup version
+ *
+ * Sheets created by older versions of this script only had dropdowns on
+ * the rows written so far and no Key column; this covers all of their
+ * rows in one call per column.
+ */
+function ensureSheetSetUp(sheet, config, maxRows) {
+  const properties = PropertiesService.getScriptProperties();
+  const propertyKey = 'setup:' + config.name;
+  if (properties.getProperty(propertyKey) === SHEET_SETUP_VERSION) {
+    return;
+  }
+  setUpKeyColumn(sheet);
+  applyColumnValidation(sheet, config, 2, maxRows - 1);
+  properties.setProperty(propertyKey, SHEET_SETUP_VERSION);
+}
+
+/**
+ * Add the header of the hidden Key column and hide it
+ */
+function setUpKeyColumn(sheet) {
+  sheet.getRange(1, KEY_COLUMN).setValue('Key');
+  sheet.hideColumns(KEY_COLUMN);
+}
+
+/**
+ * Set the dropdowns of columns D and E for a block of rows, one call per column
+ */
+function applyColumnValidation(sheet, config, startRow, numRows) {
+  if (numRows < 1) {
+    return;
+  }
+  const rules = getDropdownRules();
+  sheet.getRange(startRow, 4, numRows, 1).setDataValidation(rules[config.dropdowns[0][0]][config.dropdowns[0][1]]);
+  sheet.getRange(startRow, 5, numRows, 1).setDataValidation(rules[config.dropdowns[1][0]][config.dropdowns[1][1]]);
+}
+
+/**
+ * Validation rules by option list and help text, built once per execution
+ */
+function getDropdownRules() {
+  if (dropdownRules) {
+    return dropdownRules;
+  }
+  const dropdownOptions = getDropdownOptions();
+  dropdownRules = { categories: {}, accounts: {} };
+  for (const type in SHEET_CONFIGS) {
+    for (const dropdown of SHEET_CONFIGS[type].dropdowns) {
+      dropdownRules[dropdown[0]][dropdown[1]] = buildDropdownRule(dropdownOptions[dropdown[0]], dropdown[1]);
+    }
+  }
+  return dropdownRules;
+}
+
+/**
+ * Build a dropdown data validation rule
+ *
+ * Values outside the list are allowed and only marked: tenants configure
+ * their own accounts and categories, and the bot has already resolved every
+ * name it sends, so the dropdown is a convenience for rows typed by hand.
+ */
+function buildDropdownRule(options, helpText) {
+  return SpreadsheetApp.newDataValidation()
+    .requireValueInList(options, true)
+    .setAllowInvalid(true)
+    .setHelpText(helpText)
+    .build();
 }
 
 /**
  * Get dropdown options for categories and accounts
+ *
+ * Keep these in line with AVAILABLE_CATEGORIES and AVAILABLE_ACCOUNTS in
+ * src/config.py, and bump SHEET_SETUP_VERSION after changing them.
  */
 function getDropdownOptions() {
   return {
     categories: [
-      'Foods',
       'Transportation',
       'Shopping',
       'Entertainment',
-      'Utilities',
       'Healthcare',
       'Education',
       'Travel',
-      'Donations',
       'Investment',
       'Salary',
       'Business',
@@ -136,120 +459,41 @@ function getDropdownOptions() {
       'Cash',
       'BRI',
       'Mandiri',
-      'Jago',
       'Gopay',
       'OVO',
       'ShopeePay',
-      'PayPal',
+      'PayPal'
     ]
   };
 }
 
 /**
- * Setup dropdown data validation for a specific range
- */
-function setupDropdownValidation(range, options, helpText) {
-  console.log('setupDropdownValidation called with options count:', options.length);
-  const rule = SpreadsheetApp.newDataValidation()
-    .requireValueInList(options, true)
-    .setAllowInvalid(false)
-    .setHelpText(helpText)
-    .build();
-  range.setDataValidation(rule);
-  console.log('Dropdown validation rule applied successfully');
-}
-
-/**
- * Setup dropdowns for existing data in a sheet
+ * Setup dropdowns on every row of a sheet, including the empty ones, and the hidden Key column
  */
 function setupDropdownsForSheet(sheet, transactionType) {
-  const lastRow = sheet.getLastRow();
-  const dropdownOptions = getDropdownOptions();
-  
-  if (lastRow > 1) { // Only if there's data beyond headers
-    if (transactionType === 'expense' || transactionType === 'income') {
-      // Category dropdown (column D)
-      const categoryRange = sheet.getRange(2, 4, lastRow - 1, 1);
-      setupDropdownValidation(categoryRange, dropdownOptions.categories, 'Select a category from the dropdown');
-      
-      // Account dropdown (column E)
-      const accountRange = sheet.getRange(2, 5, lastRow - 1, 1);
-      setupDropdownValidation(accountRange, dropdownOptions.accounts, 'Select an account from the dropdown');
-    } else if (transactionType === 'transfer') {
-      // From Account dropdown (column D)
-      const fromAccountRange = sheet.getRange(2, 4, lastRow - 1, 1);
-      setupDropdownValidation(fromAccountRange, dropdownOptions.accounts, 'Select the source account');
-      
-      // To Account dropdown (column E)
-      const toAccountRange = sheet.getRange(2, 5, lastRow - 1, 1);
-      setupDropdownValidation(toAccountRange, dropdownOptions.accounts, 'Select the destination account');
-    }
-  }
-}
-
-/**
- * Setup dropdowns for a new row
- */
-function setupDropdownsForNewRow(sheet, rowIndex, transactionType) {
-  console.log('setupDropdownsForNewRow called with:', rowIndex, transactionType);
-  const dropdownOptions = getDropdownOptions();
-  
-  if (transactionType === 'expense' || transactionType === 'income') {
-    console.log('Setting up expense/income dropdowns for row:', rowIndex);
-    // Category dropdown (column D)
-    const categoryCell = sheet.getRange(rowIndex, 4);
-    setupDropdownValidation(categoryCell, dropdownOptions.categories, 'Select a category from the dropdown');
-    console.log('Category dropdown set for row:', rowIndex);
-    
-    // Account dropdown (column E)
-    const accountCell = sheet.getRange(rowIndex, 5);
-    setupDropdownValidation(accountCell, dropdownOptions.accounts, 'Select an account from the dropdown');
-    console.log('Account dropdown set for row:', rowIndex);
-  } else if (transactionType === 'transfer') {
-    console.log('Setting up transfer dropdowns for row:', rowIndex);
-    // From Account dropdown (column D)
-    const fromAccountCell = sheet.getRange(rowIndex, 4);
-    setupDropdownValidation(fromAccountCell, dropdownOptions.accounts, 'Select the source account');
-    console.log('From Account dropdown set for row:', rowIndex);
-    
-    // To Account dropdown (column E)
-    const toAccountCell = sheet.getRange(rowIndex, 5);
-    setupDropdownValidation(toAccountCell, dropdownOptions.accounts, 'Select the destination account');
-    console.log('To Account dropdown set for row:', rowIndex);
-  }
-  console.log('setupDropdownsForNewRow completed for row:', rowIndex);
+  const config = SHEET_CONFIGS[transactionType];
+  setUpKeyColumn(sheet);
+  applyColumnValidation(sheet, config, 2, sheet.getMaxRows() - 1);
+  PropertiesService.getScriptProperties().setProperty('setup:' + config.name, SHEET_SETUP_VERSION);
 }
 
 /**
  * Get existing sheet or create new one with headers based on transaction type
+ *
+ * Handles are kept for the rest of the execution. New sheets get their
+ * headers, formatting and column-level dropdowns here, once.
  */
 function getOrCreateSheetByType(transactionType) {
-  // Define sheet configurations for each transaction type
-  const sheetConfigs = {
-    'expense': {
-      name: 'Expenses',
-      headers: ['Timestamp', 'Date', 'Amount', 'Category', 'Account', 'Description'],
-      color: '#dc3545' // Red
-    },
-    'income': {
-      name: 'Income',
-      headers: ['Timestamp', 'Date', 'Amount', 'Category', 'Account', 'Description'],
-      color: '#28a745' // Green
-    },
-    'transfer': {
-      name: 'Transfers',
-      headers: ['Timestamp', 'Date', 'Amount', 'From Account', 'To Account', 'Description'],
-      color: '#17a2b8' // Blue
-    }
-  };
-  
-  const config = sheetConfigs[transactionType];
+  if (sheetHandles[transactionType]) {
+    return sheetHandles[transactionType];
+  }
+  const config = SHEET_CONFIGS[transactionType];
   if (!config) {
     throw new Error('Unknown transaction type: ' + transactionType);
   }
   
   // Get the active spreadsheet (the one bound to this script)
-  const spreadsheet = SpreadsheetApp.getActiveSpreadsheet();
+  const spreadsheet = activeSpreadsheet || (activeSpreadsheet = SpreadsheetApp.getActiveSpreadsheet());
   if (!spreadsheet) {
     throw new Error('No active spreadsheet found. Please bind this script to a Google Sheets document.');
   }
@@ -261,38 +505,28 @@ function getOrCreateSheetByType(transactionType) {
     // Create new sheet with headers
     sheet = spreadsheet.insertSheet(config.name);
     
-    // Add headers
-    sheet.getRange(1, 1, 1, config.headers.length).setValues([config.headers]);
-    
-    // Format headers
+    // Add and format headers
     const headerRange = sheet.getRange(1, 1, 1, config.headers.length);
+    headerRange.setValues([config.headers]);
     headerRange.setFontWeight('bold');
     headerRange.setBackground(config.color);
     headerRange.setFontColor('white');
     
-    // Set column widths based on transaction type
-    if (transactionType === 'expense' || transactionType === 'income') {
-      sheet.setColumnWidth(1, 180); // Timestamp
-      sheet.setColumnWidth(2, 100); // Date
-      sheet.setColumnWidth(3, 100); // Amount
-      sheet.setColumnWidth(4, 120); // Category
-      sheet.setColumnWidth(5, 120); // Account
-      sheet.setColumnWidth(6, 200); // Description
-    } else if (transactionType === 'transfer') {
-      sheet.setColumnWidth(1, 180); // Timestamp
-      sheet.setColumnWidth(2, 100); // Date
-      sheet.setColumnWidth(3, 100); // Amount
-      sheet.setColumnWidth(4, 120); // From Account
-      sheet.setColumnWidth(5, 120); // To Account
-      sheet.setColumnWidth(6, 200); // Description
-    }
+    // Set column widths
+    config.widths.forEach(function(width, index) {
+      sheet.setColumnWidth(index + 1, width);
+    });
     
     // Freeze header row
     sheet.setFrozenRows(1);
     
-    console.log('Created new sheet:', config.name, 'with headers');
+    // Dropdowns for every row the sheet has; rows added later get them when inserted
+    setupDropdownsForSheet(sheet, transactionType);
+    
+    console.log('Created new sheet:', config.name);
   }
   
+  sheetHandles[transactionType] = sheet;
   return sheet;
 }
 
@@ -425,13 +659,65 @@ function getWebAppUrl() {
  * Function to handle GET requests (optional, for testing)
  */
 function doGet(e) {
-  console.log('=== doGet called ===');
-  console.log('GET request received');
+  debugLog('GET request received');
+  
+  // Paged export used by the bot to rebuild its local ledger (/resync)
+  if (e && e.parameter && e.parameter.action === 'export') {
+    const page = exportSheetRows(
+      e.parameter.type,
+      parseInt(e.parameter.offset || '0', 10),
+      parseInt(e.parameter.limit || '1000', 10)
+    );
+    return ContentService
+      .createTextOutput(JSON.stringify(page))
+      .setMimeType(ContentService.MimeType.JSON);
+  }
+  
   return ContentService
     .createTextOutput('Money Tracker Bot Google Apps Script is running!')
     .setMimeType(ContentService.MimeType.TEXT);
 }
 
+/**
+ * Return one page of data rows from the sheet of a transaction type
+ *
+ * Dates are returned as YYYY-MM-DD strings. Each row ends with its
+ * idempotency key from the hidden Key column ('' for rows typed by hand).
+ * next_offset is null once the last page has been returned.
+ */
+function exportSheetRows(transactionType, offset, limit) {
+  const sheetNames = { expense: 'Expenses', income: 'Income', transfer: 'Transfers' };
+  if (!sheetNames[transactionType]) {
+    throw new Error('Unknown transaction type: ' + transactionType);
+  }
+  
+  const sheet = SpreadsheetApp.getActiveSpreadsheet().getSheetByName(sheetNames[transactionType]);
+  const dataRows = sheet ? sheet.getLastRow() - 1 : 0;  // Excluding the header row
+  if (dataRows <= offset) {
+    return { rows: [], next_offset: null };
+  }
+  
+  const count = Math.min(limit, dataRows - offset);
+  const timeZone = Session.getScriptTimeZone();
+  // Rows reserved by a request whose write then failed stay blank; leave them out
+  const rows = sheet.getRange(2 + offset, 1, count, KEY_COLUMN).getValues().filter(function(row) {
+    return row[1] !== '' || row[2] !== '';
+  }).map(function(row) {
+    if (row[1] instanceof Date) {
+      row[1] = Utilities.formatDate(row[1], timeZone, 'yyyy-MM-dd');
+    }
+    if (row[0] instanceof Date) {
+      row[0] = row[0].toISOString();
+    }
+    return row;
+  });
+  
+  return {
+    rows: rows,
+    next_offset: offset + count < dataRows ? offset + count : null
+  };
+}
+
 /**
  * Simple function to test if the deployment is working with logs
  */
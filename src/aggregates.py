@@ -0,0 +1,132 @@
+"""
+Incremental aggregate engine for the Money Tracker Bot
+
+Keeps per-month and per-category totals in memory for every chat and
+updates them in O(1) per recorded transaction, so /report and /top never
+scan history. Transfers are netted between their from and to accounts and
+never count as income or spending. On cold start the engine is rebuilt
+from grouped sums computed by SQLite over the local ledger.
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from models import Expense, Income, Transfer
+from ledger import to_minor
+from config import AVAILABLE_CATEGORIES
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+Transaction = Union[Expense, Income, Transfer]
+# (chat_id, month, type, category, account, from_account, to_account, amount_minor, count)
+AggregateRow = Tuple[int, str, str, Optional[str], Optional[str], Optional[str], Optional[str], int, int]
+
+
+def _counter() -> Dict[str, int]:
+    return defaultdict(int)
+
+
+@dataclass
+class PeriodTotals:
+    """Running totals for one chat over one period (a month, or all time)."""
+    income: int = 0
+    expense: int = 0
+    transfer: int = 0
+    count: int = 0
+    expense_by_category: Dict[str, int] = field(default_factory=_counter)
+    income_by_category: Dict[str, int] = field(default_factory=_counter)
+    net_by_account: Dict[str, int] = field(default_factory=_counter)
+
+    def add(self, kind: str, amount_minor: int, category: Optional[str], account: Optional[str],
+            from_account: Optional[str], to_account: Optional[str], count: int = 1) -> None:
+        """Fold an amount into the totals. O(1)."""
+        self.count += count
+        if kind == 'expense':
+            self.expense += amount_minor
+            self.expense_by_category[category] += amount_minor
+            self.net_by_account[account] -= amount_minor
+        elif kind == 'income':
+            self.income += amount_minor
+            self.income_by_category[category] += amount_minor
+            self.net_by_account[account] += amount_minor
+        elif kind == 'transfer':
+            # Netted between the two accounts: no effect on income or spending
+            self.transfer += amount_minor
+            self.net_by_account[from_account] -= amount_minor
+            self.net_by_account[to_account] += amount_minor
+
+
+ALL_TIME = '*'
+
+
+class AggregateEngine:
+    """In-memory per-chat totals by month and category, maintained incrementally."""
+
+    def __init__(self, categories: Iterable[str] = AVAILABLE_CATEGORIES):
+        self.categories = list(categories)
+        self._totals: Dict[Tuple[int, str], PeriodTotals] = defaultdict(PeriodTotals)
+
+    def apply(self, chat_id: int, transaction: Transaction) -> None:
+        """Fold one recorded transaction into its month and the all-time totals. O(1)."""
+        month = transaction.date[:7]
+        amount_minor = to_minor(transaction.amount)
+        if isinstance(transaction, Transfer):
+            fields = ('transfer', amount_minor, None, None, transaction.from_account, transaction.to_account)
+        elif isinstance(transaction, Expense):
+            fields = ('expense', amount_minor, transaction.category, transaction.account, None, None)
+        else:
+            fields = ('income', amount_minor, transaction.category, transaction.account, None, None)
+        self._totals[(chat_id, month)].add(*fields)
+        self._totals[(chat_id, ALL_TIME)].add(*fields)
+
+    def rebuild(self, rows: Iterable[AggregateRow]) -> None:
+        """Replace all totals with pre-grouped sums, e.g. from a SQL GROUP BY.
+
+        Each row already sums many transactions, so a cold start costs one
+        step per group rather than one per transaction.
+        """
+        self._totals = defaultdict(PeriodTotals)
+        groups = 0
+        for chat_id, month, kind, category, account, from_account, to_account, amount_minor, count in rows:
+            fields = (kind, amount_minor, category, account, from_account, to_account, count)
+            self._totals[(chat_id, month)].add(*fields)
+            self._totals[(chat_id, ALL_TIME)].add(*fields)
+            groups += 1
+        logger.info(f"Aggregates rebuilt from {groups} groups")
+
+    def totals(self, chat_id: int, month: Optional[str] = None) -> PeriodTotals:
+        """Totals for a YYYY-MM month, or all time when month is None."""
+        return self._totals.get((chat_id, month or ALL_TIME)) or PeriodTotals()
+
+    def report(self, chat_id: int, month: str, categories: Optional[Sequence[str]] = None) -> Dict[str, object]:
+        """Monthly report; costs O(number of categories).
+
+        ``categories`` orders the breakdown, e.g. by a tenant's own list;
+        it defaults to the engine's configured categories.
+        """
+        totals = self.totals(chat_id, month)
+        categories = {category: totals.expense_by_category.get(category, 0)
+                      for category in (categories or self.categories)}
+        for category, amount in totals.expense_by_category.items():
+            categories.setdefault(category, amount)  # Categories outside the configured list
+        return {
+            'income': totals.income,
+            'expense': totals.expense,
+            'transfer': totals.transfer,
+            'count': totals.count,
+            'categories': {c: a for c, a in categories.items() if a},
+            'accounts': {a: n for a, n in totals.net_by_account.items() if n},
+        }
+
+    def top_categories(self, chat_id: int, month: Optional[str] = None, limit: int = 5) -> List[Tuple[str, int]]:
+        """Categories with the highest spending, for a month or all time."""
+        spending = self.totals(chat_id, month).expense_by_category
+        ranked = sorted(((c, a) for c, a in spending.items() if a), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+
+# Global instance
+aggregates = AggregateEngine()
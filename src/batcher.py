@@ -0,0 +1,172 @@
+"""
+Write-behind batching of Google Sheets appends for the Money Tracker Bot
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from models import Expense, Income, Transfer
+from sheets import FAILED, Delivery, SheetsIntegration, get_sheets_integration
+from config import get_settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+Transaction = Union[Expense, Income, Transfer]
+QueueItem = Tuple[Dict[str, Any], asyncio.Future]
+
+
+class SheetsBatcher:
+    """Collect transactions and send them to Google Sheets as bulk appends.
+
+    Payloads are queued and flushed either when ``max_items`` have been
+    collected or ``max_delay_ms`` after the first one arrived, whichever comes
+    first. Each caller awaits the outcome of its own payload: the script
+    reports rows it refused one by one, so an invalid payload does not fail
+    the rest of its batch.
+    """
+
+    def __init__(
+        self,
+        sheets: Optional[SheetsIntegration] = None,
+        max_items: Optional[int] = None,
+        max_delay_ms: Optional[int] = None
+    ):
+        settings = get_settings()
+        if max_items is None:
+            max_items = settings.SHEETS_BATCH_MAX_ITEMS
+        if max_delay_ms is None:
+            max_delay_ms = settings.SHEETS_BATCH_MAX_DELAY_MS
+        self.sheets = get_sheets_integration() if sheets is None else sheets
+        self.max_items = max(1, max_items)
+        self.max_delay = max(0, max_delay_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def pending(self) -> int:
+        """Number of payloads waiting to be flushed."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        """Start the background flush worker. Called on application startup."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run(), name='sheets-batcher')
+        logger.info(f"Sheets batcher started (max_items={self.max_items}, max_delay={self.max_delay}s)")
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Flush everything still queued and stop the worker.
+        
+        With a timeout, the worker is cancelled if flushing takes longer and
+        the payloads not sent are reported as failed; they come from the
+        outbox, which keeps them for the next start.
+        """
+        if not self.running:
+            return
+        await self._queue.put(None)  # Sentinel: flush and exit
+        try:
+            await asyncio.wait_for(asyncio.shield(self._worker), timeout)
+        except asyncio.TimeoutError:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            abandoned = 0
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None and not item[1].done():
+                    item[1].set_result(Delivery(FAILED, 'not flushed before shutdown'))
+                    abandoned += 1
+            logger.warning(f"Sheets batcher stopped after {timeout:.1f}s with {abandoned} payloads not flushed")
+        self._worker = None
+        logger.info("Sheets batcher stopped")
+
+    async def submit(self, transaction: Transaction) -> bool:
+        """Queue a transaction and wait until the batch containing it is sent."""
+        return await self.submit_payload(self.sheets.prepare_payload(transaction))
+
+    async def submit_payload(self, payload: Dict[str, Any]) -> bool:
+        """Queue a prepared payload and wait until the batch containing it is sent."""
+        return (await self.deliver(payload)).saved
+
+    async def deliver(self, payload: Dict[str, Any]) -> Delivery:
+        """Queue a prepared payload and return its outcome once its batch is sent."""
+        if not self.running:
+            # Not started (e.g. one-off scripts): fall back to a direct send
+            return (await self.sheets.send_payloads_each([payload]))[0]
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, future))
+        return await future
+
+    async def _collect(self) -> Tuple[List[QueueItem], bool]:
+        """Wait for the next batch. Returns the batch and whether to stop."""
+        loop = asyncio.get_running_loop()
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_items:
+            remaining = deadline - loop.time()
+            try:
+                if remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _flush(self, batch: List[QueueItem]) -> None:
+        """Send one batch and resolve the futures of everyone waiting on it."""
+        payloads = [payload for payload, _ in batch]
+        results = [Delivery(FAILED, 'not sent')] * len(batch)
+        try:
+            results = await self.sheets.send_payloads_each(payloads)
+        except Exception as e:
+            logger.error(f"Error flushing batch to Google Sheets: {str(e)}")
+            results = [Delivery(FAILED, str(e))] * len(batch)
+        finally:
+            # Also when cancelled on shutdown, so nobody waits forever
+            for (_, future), delivery in zip(batch, results):
+                if not future.done():
+                    future.set_result(delivery)
+        saved = sum(delivery.saved for delivery in results)
+        logger.info("Flushed batch of %d payloads to Google Sheets (%d saved)", len(batch), saved)
+
+    async def _run(self) -> None:
+        """Worker loop: collect batches and flush them one at a time."""
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect()
+            if batch:
+                await self._flush(batch)
+
+
+# Global instance, built on first use
+_sheets_batcher: Optional[SheetsBatcher] = None
+
+
+def get_sheets_batcher() -> SheetsBatcher:
+    """The default endpoint's batcher; later calls return the same object."""
+    global _sheets_batcher
+    if _sheets_batcher is None:
+        _sheets_batcher = SheetsBatcher()
+    return _sheets_batcher
+
+
+def __getattr__(name: str):
+    # Keeps ``from batcher import sheets_batcher`` working without building it at import
+    if name == 'sheets_batcher':
+        return get_sheets_batcher()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
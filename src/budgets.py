@@ -0,0 +1,153 @@
+"""
+Monthly category budgets for the Money Tracker Bot
+
+``/budget <category> <amount>`` sets how much a chat means to spend on a
+category each month. Every recorded expense is checked against the
+month-to-date spending kept by the aggregate engine, which is already
+updated in memory for each transaction and rebuilt from the local ledger
+on start. The check is a couple of dictionary lookups, so it adds nothing
+noticeable to a reply and never reads Google Sheets. A chat is warned once
+when its spending crosses 80% of a budget and again when it goes over.
+
+Budgets are small and change rarely; they are kept in memory and saved to
+a JSON file whenever one is set or removed.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, NamedTuple, Optional, Union
+
+from models import Expense, Income, Transfer
+from ledger import to_minor
+from aggregates import AggregateEngine, aggregates
+from config import get_settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+Transaction = Union[Expense, Income, Transfer]
+
+# Percentages of a budget that trigger a warning when spending crosses them
+THRESHOLDS = (80, 100)
+
+
+class BudgetAlert(NamedTuple):
+    """A budget threshold crossed by one expense; amounts in minor units."""
+    category: str
+    month: str
+    threshold: int
+    spent: int
+    limit: int
+
+
+class BudgetBook:
+    """Per-chat monthly budgets, checked against the in-memory aggregates."""
+
+    def __init__(self, path: Optional[str] = None, aggregates: AggregateEngine = aggregates):
+        self.path = get_settings().BUDGETS_PATH if path is None else path
+        self.aggregates = aggregates
+        self._budgets: Dict[int, Dict[str, int]] = {}  # chat_id -> category -> limit in minor units
+        self._lock = asyncio.Lock()
+
+    @property
+    def count(self) -> int:
+        """Number of budgets set across all chats."""
+        return sum(map(len, self._budgets.values()))
+
+    def budgets_for(self, chat_id: int) -> Dict[str, int]:
+        return dict(self._budgets.get(chat_id, {}))
+
+    def spent(self, chat_id: int, category: str, month: str) -> int:
+        """Month-to-date spending on a category, in minor units. O(1)."""
+        return self.aggregates.totals(chat_id, month).expense_by_category.get(category, 0)
+
+    def check(self, chat_id: int, transaction: Transaction) -> Optional[BudgetAlert]:
+        """The highest threshold a just-recorded expense pushed its category across.
+
+        Call it right after the transaction was applied to the aggregates.
+        O(1): the spending before the expense is the total now minus its amount.
+        """
+        if not isinstance(transaction, Expense):
+            return None
+        limit = self._budgets.get(chat_id, {}).get(transaction.category)
+        if not limit:
+            return None
+        month = transaction.date[:7]
+        after = self.spent(chat_id, transaction.category, month)
+        before = after - to_minor(transaction.amount)
+        crossed = [threshold for threshold in THRESHOLDS if before * 100 < threshold * limit <= after * 100]
+        if not crossed:
+            return None
+        return BudgetAlert(transaction.category, month, crossed[-1], after, limit)
+
+    async def set(self, chat_id: int, category: str, limit: int) -> None:
+        """Set a chat's monthly budget for a category; a limit of 0 removes it."""
+        async with self._lock:
+            budgets = self._budgets.setdefault(chat_id, {})
+            if limit > 0:
+                budgets[category] = limit
+            else:
+                budgets.pop(category, None)
+                if not budgets:
+                    del self._budgets[chat_id]
+            await self.save()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _load(self) -> int:
+        try:
+            with open(self.path, encoding='utf-8') as budgets_file:
+                data = json.load(budgets_file)
+        except FileNotFoundError:
+            return 0
+        self._budgets = {int(chat_id): {category: int(limit) for category, limit in budgets.items()}
+                         for chat_id, budgets in data.get('budgets', {}).items() if budgets}
+        return self.count
+
+    @staticmethod
+    def _write(path: str, budgets: dict) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as budgets_file:
+            json.dump({'budgets': budgets}, budgets_file)
+        os.replace(tmp_path, path)
+
+    async def save(self) -> None:
+        budgets = {str(chat_id): dict(budgets) for chat_id, budgets in self._budgets.items()}
+        try:
+            await asyncio.to_thread(self._write, self.path, budgets)
+        except OSError as e:
+            logger.error(f"Could not save budgets to {self.path}: {e}")
+
+    async def start(self) -> None:
+        """Load the saved budgets. Called on application startup."""
+        try:
+            loaded = await asyncio.to_thread(self._load)
+            logger.info(f"Budgets loaded: {loaded} from {self.path}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load budgets from {self.path}: {e}")
+
+
+# Global instance, built on first use
+_budget_book: Optional[BudgetBook] = None
+
+
+def get_budget_book() -> BudgetBook:
+    """The budgets at BUDGETS_PATH; later calls return the same object."""
+    global _budget_book
+    if _budget_book is None:
+        _budget_book = BudgetBook()
+    return _budget_book
+
+
+def __getattr__(name: str):
+    # Keeps ``from budgets import budget_book`` working without building it at import
+    if name == 'budget_book':
+        return get_budget_book()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
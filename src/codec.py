@@ -0,0 +1,91 @@
+"""
+Transaction serialization for the Money Tracker Bot
+
+Every model type has one serializer, written out field by field, that maps a
+transaction straight onto the Apps Script payload; dispatch is a single
+dictionary lookup on the exact type instead of an isinstance chain.
+Amounts leave as JSON numbers, which is what the Apps Script reads them as.
+
+JSON is encoded with orjson when it is installed and with the standard
+library otherwise. Both produce compact UTF-8 bytes and decode each other's
+output, so stored payloads survive switching between them.
+"""
+
+import json
+from typing import Any, Callable, Dict, Union
+
+from models import Expense, Income, Transfer
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up; the standard library is used without it
+    orjson = None
+
+Transaction = Union[Expense, Income, Transfer]
+
+
+if orjson is not None:
+    def dumps(value: Any) -> bytes:
+        """Encode a value as compact JSON bytes."""
+        return orjson.dumps(value)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(value: Any) -> bytes:
+        """Encode a value as compact JSON bytes."""
+        return _encoder.encode(value).encode()
+
+    loads = json.loads
+
+
+def _expense(transaction: Expense, timestamp: str) -> Dict[str, Any]:
+    return {
+        'timestamp': timestamp,
+        'date': transaction.date,
+        'amount': float(transaction.amount),
+        'type': 'expense',
+        'category': transaction.category,
+        'account': transaction.account,
+        'description': transaction.name,
+    }
+
+
+def _income(transaction: Income, timestamp: str) -> Dict[str, Any]:
+    return {
+        'timestamp': timestamp,
+        'date': transaction.date,
+        'amount': float(transaction.amount),
+        'type': 'income',
+        'category': transaction.category,
+        'account': transaction.account,
+        'description': transaction.name,
+    }
+
+
+def _transfer(transaction: Transfer, timestamp: str) -> Dict[str, Any]:
+    return {
+        'timestamp': timestamp,
+        'date': transaction.date,
+        'amount': float(transaction.amount),
+        'type': 'transfer',
+        'from_account': transaction.from_account,
+        'to_account': transaction.to_account,
+        'description': transaction.description,
+    }
+
+
+SERIALIZERS: Dict[type, Callable[[Any, str], Dict[str, Any]]] = {
+    Expense: _expense,
+    Income: _income,
+    Transfer: _transfer,
+}
+
+
+def to_payload(transaction: Transaction, timestamp: str) -> Dict[str, Any]:
+    """Map a transaction onto the Apps Script payload fields."""
+    serializer = SERIALIZERS.get(type(transaction))
+    if serializer is None:
+        raise ValueError(f"Unknown transaction type: {type(transaction)}")
+    return serializer(transaction, timestamp)
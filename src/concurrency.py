@@ -0,0 +1,78 @@
+"""
+Concurrent update processing for the Money Tracker Bot
+
+Updates from different chats are handled concurrently, up to a global
+limit, so one slow Google Sheets call no longer stalls every other user.
+Updates from the same chat still run one at a time, in the order they
+arrived, so a user's transactions are never reordered.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently across chats and sequentially within a chat.
+
+    Each chat gets its own FIFO queue, implemented as an ``asyncio.Lock``
+    (waiters are woken in arrival order). Queues are dropped as soon as a
+    chat has nothing left in flight, so memory stays bounded by the number
+    of active chats rather than every chat ever seen.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_pending: Dict[int, int] = {}
+
+    @staticmethod
+    def _chat_id(update: object) -> Optional[int]:
+        if isinstance(update, Update) and update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    @property
+    def active_chats(self) -> int:
+        """Number of chats with at least one update queued or running."""
+        return len(self._chat_locks)
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Wait for the chat's turn first, then for a global slot.
+
+        Taking the chat lock before the semaphore means updates queued
+        behind a busy chat hold no global slot, so one chat sending many
+        messages cannot starve the others.
+        """
+        chat_id = self._chat_id(update)
+        if chat_id is None:
+            await super().process_update(update, coroutine)
+            return
+
+        lock = self._chat_locks.get(chat_id)
+        if lock is None:
+            lock = self._chat_locks[chat_id] = asyncio.Lock()
+        self._chat_pending[chat_id] = self._chat_pending.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._chat_pending[chat_id] -= 1
+            if not self._chat_pending[chat_id]:
+                del self._chat_pending[chat_id]
+                del self._chat_locks[chat_id]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        logger.info(f"Processing up to {self.max_concurrent_updates} updates concurrently")
+
+    async def shutdown(self) -> None:
+        pass
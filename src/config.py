@@ -1,29 +1,225 @@
 """
 Configuration settings for the Money Tracker Bot
+
+Settings come from the environment (and a .env file), but are only read
+the first time one is used, not when this module is imported. The parser,
+models and formatters therefore work in offline tools, tests and batch
+jobs without credentials; the bot itself calls ``get_settings().validate()``
+at startup to fail fast on a missing token or Sheets URL.
+
+Existing ``from config import SHEETS_TIMEOUT`` style imports keep working:
+unknown module attributes are looked up on the settings object.
 """
 
 import os
-import logging
-from dotenv import load_dotenv
+from dataclasses import dataclass, fields
+from typing import Optional
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Environment-driven settings, read once by ``get_settings()``."""
+
+    # Logging: default level, per-module overrides ("sheets=WARNING,httpx=ERROR"),
+    # "json" or "text" output, fraction of INFO/DEBUG records kept, and redaction
+    # of amounts and descriptions
+    LOG_LEVEL: str
+    LOG_LEVELS: str
+    LOG_FORMAT: str
+    LOG_SAMPLE_RATE: float
+    LOG_REDACT: bool
+
+    # Bot token and Apps Script web app URL; required to run the bot
+    BOT_TOKEN: Optional[str]
+    SHEETS_API_URL: Optional[str]
+
+    # How the bot receives updates: "polling" (default) or "webhook"
+    BOT_MODE: str
+
+    # Webhook mode settings. WEBHOOK_URL is the public base URL Telegram posts to
+    # (e.g. a load balancer); the bot itself listens on WEBHOOK_LISTEN:WEBHOOK_PORT
+    WEBHOOK_URL: Optional[str]
+    WEBHOOK_LISTEN: str
+    WEBHOOK_PORT: int
+    WEBHOOK_PATH: str
+    WEBHOOK_SECRET: Optional[str]
+    WEBHOOK_CERT: Optional[str]  # Only needed when the bot terminates TLS itself
+    WEBHOOK_KEY: Optional[str]
+
+    # HTTP client settings for the Google Sheets integration
+    SHEETS_TIMEOUT: float
+    SHEETS_MAX_CONNECTIONS: int
+    SHEETS_MAX_KEEPALIVE: int
+    SHEETS_KEEPALIVE_EXPIRY: float
+    SHEETS_HTTP2: bool
+    # Maximum Google Sheets requests in flight at once, across all chats
+    SHEETS_MAX_CONCURRENCY: int
+    # Token bucket rate limit per Sheets endpoint: requests per second (0 disables) and burst size
+    SHEETS_RATE_LIMIT: float
+    SHEETS_RATE_BURST: int
+    # Circuit breaker per Sheets endpoint: consecutive failures before opening, seconds before probing again
+    SHEETS_BREAKER_FAILURES: int
+    SHEETS_BREAKER_RESET: float
+
+    # Maximum updates handled concurrently; updates from one chat always run in order
+    MAX_CONCURRENT_UPDATES: int
+
+    # Write-behind batching of Google Sheets appends
+    SHEETS_BATCH_MAX_ITEMS: int
+    SHEETS_BATCH_MAX_DELAY_MS: int
+
+    # CSV / bank statement imports
+    IMPORT_CHUNK_SIZE: int
+    IMPORT_PROGRESS_INTERVAL: float
+
+    # Reply immediately and write to Google Sheets in the background
+    SHEETS_BACKGROUND_WRITES: bool
+    # Escape user-typed text in Markdown replies so it cannot break their formatting
+    ESCAPE_MARKDOWN: bool
+
+    # Seconds queued Google Sheets writes get to go out on shutdown; the rest is sent on the next start
+    SHUTDOWN_TIMEOUT: float
 
-# Load environment variables from .env file
-load_dotenv()
+    # Local data directory for the durable outbox and other on-disk state
+    DATA_DIR: str
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+    # Durable outbox for Google Sheets delivery
+    OUTBOX_PATH: str
+    OUTBOX_MAX_IN_FLIGHT: int
+    OUTBOX_MAX_IN_FLIGHT_PER_ENDPOINT: int
+    OUTBOX_RETRY_BASE_DELAY: float
+    OUTBOX_RETRY_MAX_DELAY: float
+    # Attempts after which a payload the script keeps refusing becomes a dead letter
+    OUTBOX_MAX_ATTEMPTS: int
 
-# Get bot token from environment variable
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-SHEETS_API_URL = os.getenv('SHEETS_API')
+    # Local read-side ledger used by /balance and /summary
+    LEDGER_PATH: str
 
-if not BOT_TOKEN:
-    raise ValueError("BOT_TOKEN not found in environment variables. Please check your .env file.")
+    # Suppression of redelivered updates and repeated transactions: keys kept, seconds an
+    # update is remembered, seconds a queued message counts as a repeat (0 disables),
+    # and whether the keys are saved to DEDUP_PATH across restarts
+    DEDUP_CACHE_SIZE: int
+    DEDUP_WINDOW: float
+    DEDUP_CONTENT_WINDOW: float
+    DEDUP_PERSIST: bool
+    DEDUP_PATH: str
+
+    # Recurring transaction rules added with /recurring
+    RECURRING_PATH: str
+
+    # Monthly category budgets set with /budget
+    BUDGETS_PATH: str
+
+    # Prometheus-style metrics served on a local /metrics endpoint
+    METRICS_ENABLED: bool
+    METRICS_HOST: str
+    METRICS_PORT: int
+
+    # Tenant registry mapping chats / users to their own spreadsheet, accounts and categories
+    TENANTS_PATH: str
+    TENANT_CACHE_SIZE: int
+    TENANT_CACHE_TTL: float
+
+    @classmethod
+    def from_env(cls) -> 'Settings':
+        """Read every setting from the current environment."""
+        data_dir = os.getenv('DATA_DIR', 'data')
+        return cls(
+            LOG_LEVEL=os.getenv('LOG_LEVEL', 'INFO').upper(),
+            LOG_LEVELS=os.getenv('LOG_LEVELS', 'httpx=WARNING'),
+            LOG_FORMAT=os.getenv('LOG_FORMAT', 'json').lower(),
+            LOG_SAMPLE_RATE=float(os.getenv('LOG_SAMPLE_RATE', '1')),
+            LOG_REDACT=_flag('LOG_REDACT', 'true'),
+            BOT_TOKEN=os.getenv('BOT_TOKEN'),
+            SHEETS_API_URL=os.getenv('SHEETS_API'),
+            BOT_MODE=os.getenv('BOT_MODE', 'polling').lower(),
+            WEBHOOK_URL=os.getenv('WEBHOOK_URL'),
+            WEBHOOK_LISTEN=os.getenv('WEBHOOK_LISTEN', '0.0.0.0'),
+            WEBHOOK_PORT=int(os.getenv('WEBHOOK_PORT', '8443')),
+            WEBHOOK_PATH=os.getenv('WEBHOOK_PATH', 'telegram'),
+            WEBHOOK_SECRET=os.getenv('WEBHOOK_SECRET'),
+            WEBHOOK_CERT=os.getenv('WEBHOOK_CERT'),
+            WEBHOOK_KEY=os.getenv('WEBHOOK_KEY'),
+            SHEETS_TIMEOUT=float(os.getenv('SHEETS_TIMEOUT', '10')),
+            SHEETS_MAX_CONNECTIONS=int(os.getenv('SHEETS_MAX_CONNECTIONS', '20')),
+            SHEETS_MAX_KEEPALIVE=int(os.getenv('SHEETS_MAX_KEEPALIVE', '10')),
+            SHEETS_KEEPALIVE_EXPIRY=float(os.getenv('SHEETS_KEEPALIVE_EXPIRY', '60')),
+            SHEETS_HTTP2=_flag('SHEETS_HTTP2', 'true'),
+            SHEETS_MAX_CONCURRENCY=int(os.getenv('SHEETS_MAX_CONCURRENCY', '10')),
+            SHEETS_RATE_LIMIT=float(os.getenv('SHEETS_RATE_LIMIT', '10')),
+            SHEETS_RATE_BURST=int(os.getenv('SHEETS_RATE_BURST', '20')),
+            SHEETS_BREAKER_FAILURES=int(os.getenv('SHEETS_BREAKER_FAILURES', '5')),
+            SHEETS_BREAKER_RESET=float(os.getenv('SHEETS_BREAKER_RESET', '30')),
+            MAX_CONCURRENT_UPDATES=int(os.getenv('MAX_CONCURRENT_UPDATES', '64')),
+            SHEETS_BATCH_MAX_ITEMS=int(os.getenv('SHEETS_BATCH_MAX_ITEMS', '50')),
+            SHEETS_BATCH_MAX_DELAY_MS=int(os.getenv('SHEETS_BATCH_MAX_DELAY_MS', '200')),
+            IMPORT_CHUNK_SIZE=int(os.getenv('IMPORT_CHUNK_SIZE', '500')),
+            IMPORT_PROGRESS_INTERVAL=float(os.getenv('IMPORT_PROGRESS_INTERVAL', '3')),
+            SHEETS_BACKGROUND_WRITES=_flag('SHEETS_BACKGROUND_WRITES', 'true'),
+            ESCAPE_MARKDOWN=_flag('ESCAPE_MARKDOWN', 'true'),
+            SHUTDOWN_TIMEOUT=float(os.getenv('SHUTDOWN_TIMEOUT', '8')),
+            DATA_DIR=data_dir,
+            OUTBOX_PATH=os.getenv('OUTBOX_PATH', os.path.join(data_dir, 'outbox.sqlite3')),
+            OUTBOX_MAX_IN_FLIGHT=int(os.getenv('OUTBOX_MAX_IN_FLIGHT', '200')),
+            OUTBOX_MAX_IN_FLIGHT_PER_ENDPOINT=int(os.getenv('OUTBOX_MAX_IN_FLIGHT_PER_ENDPOINT', '100')),
+            OUTBOX_RETRY_BASE_DELAY=float(os.getenv('OUTBOX_RETRY_BASE_DELAY', '2')),
+            OUTBOX_RETRY_MAX_DELAY=float(os.getenv('OUTBOX_RETRY_MAX_DELAY', '300')),
+            OUTBOX_MAX_ATTEMPTS=int(os.getenv('OUTBOX_MAX_ATTEMPTS', '20')),
+            LEDGER_PATH=os.getenv('LEDGER_PATH', os.path.join(data_dir, 'ledger.sqlite3')),
+            RECURRING_PATH=os.getenv('RECURRING_PATH', os.path.join(data_dir, 'recurring.sqlite3')),
+            BUDGETS_PATH=os.getenv('BUDGETS_PATH', os.path.join(data_dir, 'budgets.json')),
+            DEDUP_CACHE_SIZE=int(os.getenv('DEDUP_CACHE_SIZE', '10000')),
+            DEDUP_WINDOW=float(os.getenv('DEDUP_WINDOW', '3600')),
+            DEDUP_CONTENT_WINDOW=float(os.getenv('DEDUP_CONTENT_WINDOW', '30')),
+            DEDUP_PERSIST=_flag('DEDUP_PERSIST', 'true'),
+            DEDUP_PATH=os.getenv('DEDUP_PATH', os.path.join(data_dir, 'dedup.json')),
+            METRICS_ENABLED=_flag('METRICS_ENABLED', 'false'),
+            METRICS_HOST=os.getenv('METRICS_HOST', '127.0.0.1'),
+            METRICS_PORT=int(os.getenv('METRICS_PORT', '9464')),
+            TENANTS_PATH=os.getenv('TENANTS_PATH', os.path.join(data_dir, 'tenants.json')),
+            TENANT_CACHE_SIZE=int(os.getenv('TENANT_CACHE_SIZE', '1024')),
+            TENANT_CACHE_TTL=float(os.getenv('TENANT_CACHE_TTL', '300')),
+        )
+
+    def validate(self) -> None:
+        """Raise ValueError if the bot cannot run with these settings."""
+        if not self.BOT_TOKEN:
+            raise ValueError("BOT_TOKEN not found in environment variables. Please check your .env file.")
+
+        if not self.SHEETS_API_URL:
+            raise ValueError("SHEETS_API not found in environment variables. Please check your .env file.")
+
+        if self.BOT_MODE not in ('polling', 'webhook'):
+            raise ValueError(f"BOT_MODE must be 'polling' or 'webhook', got '{self.BOT_MODE}'.")
+
+        if self.BOT_MODE == 'webhook' and not (self.WEBHOOK_URL and self.WEBHOOK_SECRET):
+            raise ValueError("WEBHOOK_URL and WEBHOOK_SECRET are required when BOT_MODE=webhook. Please check your .env file.")
+
+
+_SETTING_NAMES = frozenset(field.name for field in fields(Settings))
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    """Load settings on first use; later calls return the same object."""
+    global _settings
+    if _settings is None:
+        # Imported here so that importing config stays free of third-party modules
+        from dotenv import load_dotenv
+        load_dotenv()
+        _settings = Settings.from_env()
+    return _settings
+
+
+def __getattr__(name: str):
+    if name in _SETTING_NAMES:
+        return getattr(get_settings(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-if not SHEETS_API_URL:
-    raise ValueError("SHEETS_API not found in environment variables. Please check your .env file.")
 
 # Other configuration constants can be added here
 DEFAULT_CURRENCY = "Rp"
@@ -53,3 +249,20 @@ AVAILABLE_ACCOUNTS = [
     "ShopeePay",
     "PayPal"
 ]
+
+# Other spellings accepted for categories and accounts, mapped to the names above.
+# Case, unambiguous abbreviations and small typos are handled without entries here.
+NAME_ALIASES = {
+    "tunai": "Cash",
+    "gaji": "Salary",
+    "belanja": "Shopping",
+    "hiburan": "Entertainment",
+    "kesehatan": "Healthcare",
+    "pendidikan": "Education",
+    "investasi": "Investment",
+    "bisnis": "Business",
+    "lainnya": "Other",
+    "go-pay": "Gopay",
+    "spay": "ShopeePay",
+    "pp": "PayPal",
+}
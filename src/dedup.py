@@ -0,0 +1,207 @@
+"""
+Duplicate update and transaction suppression for the Money Tracker Bot
+
+Telegram redelivers an update when the bot restarts polling before the
+update was confirmed, or when a webhook request timed out on a slow
+handler. Every update is claimed by its ``update_id`` and its chat and
+``message_id`` before any handler runs, and a redelivered one is dropped
+without a reply or a Sheets write. Once its transactions were queued, a
+message is also remembered by its ID and a hash of its text for a short
+window, which catches the same message handled twice after its update key
+expired. Keying on the message rather than the parsed transactions keeps
+real repeats, such as two identical fares sent one after the other.
+
+Keys live in an LRU cache capped at ``max_size`` entries, each expiring
+after its window. The cache can be saved to a JSON file, so redeliveries
+after a restart are recognised as well.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+from metrics import DUPLICATES_SUPPRESSED
+from config import DEDUP_PATH, DEDUP_PERSIST, DEDUP_CACHE_SIZE, DEDUP_WINDOW, DEDUP_CONTENT_WINDOW
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Seconds between saves of a changed cache while the bot runs
+SAVE_INTERVAL = 30
+
+
+def content_key(chat_id: int, message_id: int, text: str) -> str:
+    """Key for one message's text in a chat.
+
+    The digest is stable across processes, unlike ``hash()``, so keys stay
+    valid in a saved cache.
+    """
+    digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+    return f"content:{chat_id}:{message_id}:{digest}"
+
+
+class DedupCache:
+    """Time-windowed LRU set of handled update and transaction keys."""
+
+    def __init__(
+        self,
+        path: str = DEDUP_PATH,
+        persist: bool = DEDUP_PERSIST,
+        max_size: int = DEDUP_CACHE_SIZE,
+        window: float = DEDUP_WINDOW,
+        content_window: float = DEDUP_CONTENT_WINDOW,
+        clock: Callable[[], float] = time.time
+    ):
+        self.path = path
+        self.persist = persist
+        self.max_size = max(1, max_size)
+        self.window = window
+        self.content_window = content_window
+        self.clock = clock  # Wall clock, so expiry times survive a restart
+        self._seen: 'OrderedDict[str, float]' = OrderedDict()  # key -> expires at
+        self._dirty = False
+        self._saver: Optional[asyncio.Task] = None
+        self.suppressed = {'update': 0, 'content': 0}
+
+    @property
+    def size(self) -> int:
+        """Number of keys currently remembered."""
+        return len(self._seen)
+
+    def _live(self, keys: Sequence[str]) -> bool:
+        """True if any of the keys is still within its window; expired ones are dropped."""
+        now = self.clock()
+        duplicate = False
+        for key in keys:
+            expires_at = self._seen.get(key)
+            if expires_at is not None:
+                if expires_at > now:
+                    duplicate = True
+                    self._seen.move_to_end(key)
+                else:
+                    del self._seen[key]
+        return duplicate
+
+    def _remember(self, keys: Sequence[str], window: float) -> None:
+        now = self.clock()
+        for key in keys:
+            self._seen[key] = now + window
+            self._seen.move_to_end(key)
+        while len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        self._dirty = True
+
+    def _claim(self, keys: Iterable[str], window: float) -> bool:
+        """Record the keys; return True if any of them is still within its window."""
+        keys = list(keys)
+        if self._live(keys):
+            return True
+        self._remember(keys, window)
+        return False
+
+    def seen_update(self, update_id: Optional[int], chat_id: Optional[int] = None,
+                    message_id: Optional[int] = None) -> bool:
+        """Claim an update; True if it was already handled within the window."""
+        keys = []
+        if update_id is not None:
+            keys.append(f"update:{update_id}")
+        if chat_id is not None and message_id is not None:
+            keys.append(f"message:{chat_id}:{message_id}")
+        if not keys or not self._claim(keys, self.window):
+            return False
+        self.suppressed['update'] += 1
+        DUPLICATES_SUPPRESSED.inc(reason='update')
+        return True
+
+    def seen_message(self, chat_id: int, message_id: Optional[int], text: str) -> bool:
+        """True if this message, with this text, was recorded in the chat just before.
+
+        Only checks; call :meth:`remember_message` once its transactions are
+        queued, so a message that failed to queue can be sent again.
+        """
+        if self.content_window <= 0 or message_id is None:
+            return False
+        if not self._live([content_key(chat_id, message_id, text)]):
+            return False
+        self.suppressed['content'] += 1
+        DUPLICATES_SUPPRESSED.inc(reason='content')
+        return True
+
+    def remember_message(self, chat_id: int, message_id: Optional[int], text: str) -> None:
+        """Remember a message whose transactions were queued for the content window."""
+        if self.content_window > 0 and message_id is not None:
+            self._remember([content_key(chat_id, message_id, text)], self.content_window)
+
+    def stats(self) -> Dict[str, int]:
+        return {'cached': len(self._seen), **self.suppressed}
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _load(self) -> int:
+        try:
+            with open(self.path, encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+        except FileNotFoundError:
+            return 0
+        now = self.clock()
+        entries = sorted((expires_at, key) for key, expires_at in data.get('entries', []) if expires_at > now)
+        for expires_at, key in entries[-self.max_size:]:
+            self._seen[key] = expires_at
+        return len(self._seen)
+
+    @staticmethod
+    def _write(path: str, entries: list) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump({'entries': entries}, cache_file)
+        os.replace(tmp_path, path)
+
+    async def save(self) -> None:
+        """Write the live keys to the cache file, if persistence is on."""
+        if not self.persist or not self._dirty:
+            return
+        now = self.clock()
+        entries = [[key, expires_at] for key, expires_at in self._seen.items() if expires_at > now]
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, self.path, entries)
+        except OSError as e:
+            self._dirty = True
+            logger.error(f"Could not save the dedup cache to {self.path}: {e}")
+
+    async def _save_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(SAVE_INTERVAL)
+            await self.save()
+
+    async def start(self) -> None:
+        """Load the saved cache and keep saving it. Called on application startup."""
+        if not self.persist or self._saver is not None:
+            return
+        try:
+            loaded = await asyncio.to_thread(self._load)
+            logger.info(f"Dedup cache loaded: {loaded} keys from {self.path}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load the dedup cache from {self.path}: {e}")
+        self._saver = asyncio.create_task(self._save_periodically(), name='dedup-saver')
+
+    async def stop(self) -> None:
+        """Save the cache one last time. Called on application shutdown."""
+        if self._saver is not None:
+            self._saver.cancel()
+            self._saver = None
+        await self.save()
+
+
+# Global instance
+dedup_cache = DedupCache()
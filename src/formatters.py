@@ -1,48 +1,403 @@
 """
 Response formatting utilities for the Money Tracker Bot
+
+Replies are rendered from templates prepared once: transaction replies are
+``str.format`` templates with the currency already filled in, picked by
+transaction type, and the static command replies are rendered on first use (or at
+startup by ``warm_static_replies``) and cached per list of names, so each
+tenant's /accounts and /categories reply is built once.
+
+Replies are sent with ``parse_mode='Markdown'``. Text the user typed
+(descriptions, names, file names) is escaped so a stray ``_`` or ``*`` cannot
+make Telegram reject the reply; ``configure_escaping(False)`` turns that off.
 """
 
-from typing import Union
-from models import Expense, Income, Transfer
+import html
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from models import Expense, Income, Transfer, BulkParseResult
+from resolver import Correction, UnknownNameError
 from config import DEFAULT_CURRENCY, AVAILABLE_CATEGORIES, AVAILABLE_ACCOUNTS
 
+# Characters with a meaning in Telegram's Markdown and MarkdownV2 parse modes
+_MARKDOWN_SPECIAL = re.compile(r'([_*`\[])')
+_MARKDOWN_V2_SPECIAL = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+# Escaped texts remembered; names and descriptions repeat a lot
+ESCAPE_CACHE_SIZE = 4096
+
+
+def escape_markdown(text: str, version: int = 1) -> str:
+    """Escape text so Telegram shows it literally with Markdown (1) or MarkdownV2 (2)."""
+    pattern = _MARKDOWN_V2_SPECIAL if version == 2 else _MARKDOWN_SPECIAL
+    return pattern.sub(r'\\\1', text)
+
+
+def escape_html(text: str) -> str:
+    """Escape text for ``parse_mode='HTML'``."""
+    return html.escape(text, quote=False)
+
+
+def escape_code(text: str) -> str:
+    """Make text safe inside a Markdown code span, where nothing can be escaped."""
+    return text.replace('`', "'")
+
+
+def _unescaped(text: str) -> str:
+    return text
+
+
+_escape: Callable[[str], str] = lru_cache(maxsize=ESCAPE_CACHE_SIZE)(escape_markdown)
+_escape_code: Callable[[str], str] = escape_code
+
+
+def configure_escaping(enabled: bool) -> None:
+    """Turn escaping of user text in replies on or off (on by default)."""
+    global _escape, _escape_code
+    if enabled:
+        _escape = lru_cache(maxsize=ESCAPE_CACHE_SIZE)(escape_markdown)
+        _escape_code = escape_code
+    else:
+        _escape = _escape_code = _unescaped
+    _accounts_message.cache_clear()
+    _categories_message.cache_clear()
+
+
+# Transaction replies in str.format syntax; compiled once by compile_template
+TRANSACTION_TEMPLATES = {
+    'expense': (
+        "💸 **Expense Recorded**\n\n"
+        "💰 Amount: {currency}{amount:,.2f}\n"
+        "📂 Category: {category}\n"
+        "🏦 Account: {account}\n"
+        "📝 Description: {name}\n"
+        "📅 Date: {date}"
+    ),
+    'income': (
+        "💵 **Income Recorded**\n\n"
+        "💰 Amount: +{currency}{amount:,.2f}\n"
+        "📂 Category: {category}\n"
+        "🏦 Account: {account}\n"
+        "📝 Description: {name}\n"
+        "📅 Date: {date}"
+    ),
+    'transfer': (
+        "🔄 **Transfer Recorded**\n\n"
+        "💰 Amount: {currency}{amount:,.2f}\n"
+        "📤 From: {from_account}\n"
+        "📥 To: {to_account}\n"
+        "📅 Date: {date}"
+    ),
+    'transfer_description': "\n📝 Description: {description}",
+}
+
+
+def compile_template(template: str, currency: str = DEFAULT_CURRENCY) -> Callable[..., str]:
+    """Prepare a ``str.format`` style template once, with the currency filled in.
+
+    Returns the bound ``format`` of the prepared template, which takes the
+    remaining fields as keyword arguments.
+    """
+    return template.replace('{currency}', currency.replace('{', '{{').replace('}', '}}')).format
+
+
+def _entry_response(render: Callable[..., str]) -> Callable[[Union[Expense, Income]], str]:
+    def response(transaction: Union[Expense, Income]) -> str:
+        return render(
+            amount=transaction.amount,
+            category=_escape(transaction.category),
+            account=_escape(transaction.account),
+            name=_escape(transaction.name),
+            date=transaction.date
+        )
+    return response
+
+
+_render_transfer = compile_template(TRANSACTION_TEMPLATES['transfer'])
+_render_transfer_description = compile_template(TRANSACTION_TEMPLATES['transfer_description'])
+
+
+def _transfer_response(transaction: Transfer) -> str:
+    response = _render_transfer(
+        amount=transaction.amount,
+        from_account=_escape(transaction.from_account),
+        to_account=_escape(transaction.to_account),
+        date=transaction.date
+    )
+    if transaction.description:
+        response += _render_transfer_description(description=_escape(transaction.description))
+    return response
+
+
+RESPONSE_RENDERERS: Dict[type, Callable[[Any], str]] = {
+    Expense: _entry_response(compile_template(TRANSACTION_TEMPLATES['expense'])),
+    Income: _entry_response(compile_template(TRANSACTION_TEMPLATES['income'])),
+    Transfer: _transfer_response,
+}
+
 
 def format_transaction_response(transaction: Union[Expense, Income, Transfer]) -> str:
     """Format the parsed transaction into a clean response."""
-    if isinstance(transaction, Expense):
-        return f"💸 **Expense Recorded**\n\n" \
-               f"💰 Amount: {DEFAULT_CURRENCY}{transaction.amount:,.2f}\n" \
-               f"📂 Category: {transaction.category}\n" \
-               f"🏦 Account: {transaction.account}\n" \
-               f"📝 Description: {transaction.name}\n" \
-               f"📅 Date: {transaction.date}"
+    render = RESPONSE_RENDERERS.get(type(transaction))
+    if render is None:
+        return "❌ Unknown transaction type"
+    return render(transaction)
+
+
+# Maximum number of invalid lines listed individually in a bulk reply
+MAX_LISTED_ERRORS = 10
+
+
+def format_bulk_response(result: BulkParseResult) -> str:
+    """Format the outcome of a multi-line message into one consolidated reply."""
+    expenses = [t for _, t in result.transactions if isinstance(t, Expense)]
+    incomes = [t for _, t in result.transactions if isinstance(t, Income)]
+    transfers = [t for _, t in result.transactions if isinstance(t, Transfer)]
+    
+    if result.transactions:
+        response = f"📋 **{len(result.transactions)} Transactions Recorded**\n"
+    else:
+        response = "❌ **No Transactions Recorded**\n"
+    if expenses:
+        response += f"\n💸 Expenses: {len(expenses)} ({DEFAULT_CURRENCY}{sum(t.amount for t in expenses):,.2f})"
+    if incomes:
+        response += f"\n💵 Income: {len(incomes)} (+{DEFAULT_CURRENCY}{sum(t.amount for t in incomes):,.2f})"
+    if transfers:
+        response += f"\n🔄 Transfers: {len(transfers)} ({DEFAULT_CURRENCY}{sum(t.amount for t in transfers):,.2f})"
     
-    elif isinstance(transaction, Income):
-        return f"💵 **Income Recorded**\n\n" \
-               f"💰 Amount: +{DEFAULT_CURRENCY}{transaction.amount:,.2f}\n" \
-               f"📂 Category: {transaction.category}\n" \
-               f"🏦 Account: {transaction.account}\n" \
-               f"📝 Description: {transaction.name}\n" \
-               f"📅 Date: {transaction.date}"
+    if result.corrections:
+        response += "\n\n✏️ **Names corrected:**"
+        for line_number, given, value in result.corrections[:MAX_LISTED_ERRORS]:
+            response += f"\n• Line {line_number}: {_escape(given)} → {_escape(value)}"
+        if len(result.corrections) > MAX_LISTED_ERRORS:
+            response += f"\n• ...and {len(result.corrections) - MAX_LISTED_ERRORS} more"
     
-    elif isinstance(transaction, Transfer):
-        response = f"🔄 **Transfer Recorded**\n\n" \
-                  f"💰 Amount: {DEFAULT_CURRENCY}{transaction.amount:,.2f}\n" \
-                  f"📤 From: {transaction.from_account}\n" \
-                  f"📥 To: {transaction.to_account}\n" \
-                  f"📅 Date: {transaction.date}"
-        
-        if transaction.description:
-            response += f"\n📝 Description: {transaction.description}"
-        
-        return response
+    if result.errors:
+        response += f"\n\n❌ **{len(result.errors)} line(s) could not be parsed:**"
+        for line_number, line, reason in result.errors[:MAX_LISTED_ERRORS]:
+            response += f"\n• Line {line_number}: `{_escape_code(line)}` ({_escape(reason)})"
+        if len(result.errors) > MAX_LISTED_ERRORS:
+            response += f"\n• ...and {len(result.errors) - MAX_LISTED_ERRORS} more"
     
-    return "❌ Unknown transaction type"
+    return response
 
 
-def get_welcome_message() -> str:
-    """Get the welcome message for the /start command."""
-    return """
+def format_corrections(corrections: List[Correction]) -> str:
+    """Note appended to a reply when typed names were mapped to canonical ones."""
+    if not corrections:
+        return ""
+    return "\n\n✏️ Corrected: " + ", ".join(f"{_escape(given)} → {_escape(value)}" for given, value in corrections)
+
+
+def format_unknown_name(error: UnknownNameError) -> str:
+    """Reply for a category or account that is not in the tenant's lists."""
+    response = f"❌ Unknown {error.kind}: `{_escape_code(error.given)}`"
+    if error.suggestions:
+        response += f"\n\nDid you mean: {', '.join(map(_escape, error.suggestions))}?"
+    command = '/categories' if error.kind == 'category' else '/accounts'
+    return response + f"\n\nSend {command} to see the full list."
+
+
+def format_import_progress(file_name: str, imported: int, skipped: int,
+                           sample_errors: List[Tuple[int, str]], done: bool) -> str:
+    """Format the progress (or final summary) of a CSV import."""
+    if done:
+        response = f"📥 **Import finished:** `{_escape_code(file_name)}`\n\n✅ Imported: {imported} transactions"
+    else:
+        response = f"📥 **Importing** `{_escape_code(file_name)}`...\n\n⏳ Imported so far: {imported} transactions"
+    
+    if skipped:
+        response += f"\n❌ Skipped rows: {skipped}"
+        for row_number, reason in sample_errors[:MAX_LISTED_ERRORS]:
+            response += f"\n• Row {row_number}: {_escape(reason)}"
+        if skipped > len(sample_errors[:MAX_LISTED_ERRORS]):
+            response += f"\n• ...and {skipped - len(sample_errors[:MAX_LISTED_ERRORS])} more"
+    
+    if done and imported:
+        response += "\n\nTransactions are being saved to the spreadsheet in the background."
+    return response
+
+
+def format_import_failed(file_name: str, error: Exception, imported: Optional[int] = None) -> str:
+    """Reply for an import that was rejected, or that stopped after ``imported`` transactions."""
+    if imported is None:
+        return f"❌ Could not import `{_escape_code(file_name)}`: {_escape(str(error))}"
+    return f"❌ Import of `{_escape_code(file_name)}` stopped after {imported} transactions: {_escape(str(error))}"
+
+
+def format_minor(amount_minor: int) -> str:
+    """Format an amount held in integer minor units (cents)."""
+    sign = "-" if amount_minor < 0 else ""
+    return f"{sign}{DEFAULT_CURRENCY}{abs(amount_minor) / 100:,.2f}"
+
+
+def format_balance_message(balances: Dict[str, int]) -> str:
+    """Format running balances per account for the /balance command."""
+    lines = "\n".join(f"• {_escape(account)}: {format_minor(balance)}" for account, balance in balances.items())
+    total = sum(balances.values())
+    return f"🏦 **Account Balances**\n\n{lines}\n\n💰 **Total:** {format_minor(total)}"
+
+
+def format_summary_message(month: str, summary: Dict[str, Any]) -> str:
+    """Format monthly totals for the /summary command."""
+    if not summary['count']:
+        return f"📊 **Summary for {month}**\n\nNo transactions recorded for this month."
+    
+    net = summary['income'] - summary['expense']
+    response = f"📊 **Summary for {month}**\n\n" \
+               f"💵 Income: {format_minor(summary['income'])}\n" \
+               f"💸 Expenses: {format_minor(summary['expense'])}\n" \
+               f"🔄 Transfers: {format_minor(summary['transfer'])}\n" \
+               f"📈 Net: {format_minor(net)}\n" \
+               f"🧾 Transactions: {summary['count']}"
+    
+    if summary['categories']:
+        response += "\n\n**Expenses by category:**"
+        for category, total in summary['categories']:
+            response += f"\n• {_escape(category)}: {format_minor(total)}"
+    return response
+
+
+def format_report_message(month: str, report: Dict[str, Any]) -> str:
+    """Format the incrementally maintained monthly report for the /report command."""
+    if not report['count']:
+        return f"📊 **Report for {month}**\n\nNo transactions recorded for this month."
+    
+    response = f"📊 **Report for {month}**\n\n" \
+               f"💵 Income: {format_minor(report['income'])}\n" \
+               f"💸 Expenses: {format_minor(report['expense'])}\n" \
+               f"📈 Net: {format_minor(report['income'] - report['expense'])}\n" \
+               f"🔄 Transferred: {format_minor(report['transfer'])}"
+    
+    if report['categories']:
+        response += "\n\n**Spending by category:**"
+        for category, total in report['categories'].items():
+            response += f"\n• {_escape(category)}: {format_minor(total)}"
+    
+    if report['accounts']:
+        response += "\n\n**Net flow by account:**"
+        for account, net in report['accounts'].items():
+            response += f"\n• {_escape(account)}: {format_minor(net)}"
+    return response
+
+
+def format_top_categories_message(period: str, ranked: List[Tuple[str, int]]) -> str:
+    """Format the highest-spending categories for the /top command."""
+    if not ranked:
+        return f"🏆 **Top categories ({period})**\n\nNo spending recorded yet."
+    lines = "\n".join(
+        f"{position}. {_escape(category)}: {format_minor(total)}" for position, (category, total) in enumerate(ranked, 1)
+    )
+    return f"🏆 **Top categories ({period})**\n\n{lines}"
+
+
+RECURRING_USAGE = """
+🔁 **Recurring transactions**
+
+• `/recurring add <schedule> <transaction>` - Record a transaction on a schedule
+• `/recurring list` - Show this chat's recurring transactions
+• `/recurring remove <id>` - Stop one
+
+The schedule is a cron expression (minute hour day month weekday) or one
+of @daily, @weekly, @monthly and @yearly. The transaction is dated the
+day it is recorded.
+
+*Examples:*
+`/recurring add 0 9 25 * * + 5000 Salary BRI Monthly salary`
+`/recurring add @monthly - 15 Entertainment Gopay Streaming`
+"""
+
+
+def format_recurring_added(rule_id: int, schedule: str, line: str, next_run: str) -> str:
+    """Reply confirming a new recurring transaction."""
+    return f"🔁 **Recurring transaction #{rule_id} added**\n\n" \
+           f"🗓 Schedule: `{_escape_code(schedule)}`\n" \
+           f"📝 Transaction: `{_escape_code(line)}`\n" \
+           f"⏭ Next: {next_run}"
+
+
+def format_recurring_list(rules: Sequence[Tuple[int, str, str, str]]) -> str:
+    """Format a chat's (id, schedule, transaction, next run) recurring transactions."""
+    if not rules:
+        return "🔁 **Recurring transactions**\n\nNone yet. Send /recurring for how to add one."
+    lines = "\n".join(
+        f"#{rule_id} `{_escape_code(schedule)}` `{_escape_code(line)}`\n   ⏭ {next_run}"
+        for rule_id, schedule, line, next_run in rules
+    )
+    return f"🔁 **Recurring transactions**\n\n{lines}"
+
+
+def format_recurring_recorded(transactions: Sequence[Union[Expense, Income, Transfer]]) -> str:
+    """Message sent to a chat when its recurring transactions were recorded."""
+    return "🔁 **Recurring**\n\n" + "\n\n".join(map(format_transaction_response, transactions))
+
+
+BUDGET_USAGE = """
+💰 **Budgets**
+
+• `/budget` - Show this month's spending against each budget
+• `/budget <category> <amount> [monthly]` - Set a monthly budget for a category
+• `/budget <category> 0` - Remove it
+
+You are warned when a category's spending this month passes 80% of its
+budget, and again when it goes over.
+
+*Example:*
+`/budget Shopping 1500000 monthly`
+"""
+
+
+def format_budget_set(category: str, limit: int, month: str, spent: int) -> str:
+    """Reply confirming a new or changed budget; amounts in minor units."""
+    return f"💰 **Budget set:** {_escape(category)} {format_minor(limit)} per month\n\n" \
+           f"Spent in {month}: {format_minor(spent)} ({spent * 100 // limit}%)"
+
+
+def format_budget_list(month: str, budgets: Sequence[Tuple[str, int, int]]) -> str:
+    """Format a chat's (category, spent, limit) budgets for a month."""
+    if not budgets:
+        return "💰 **Budgets**\n\nNone yet. Send /budget for how to set one."
+    lines = "\n".join(
+        f"• {_escape(category)}: {format_minor(spent)} of {format_minor(limit)} ({spent * 100 // limit}%)"
+        for category, spent, limit in budgets
+    )
+    return f"💰 **Budgets ({month})**\n\n{lines}"
+
+
+def format_budget_alerts(alerts: Sequence[Tuple[str, str, int, int, int]]) -> str:
+    """Warnings appended to a reply for (category, month, threshold, spent, limit) budget crossings."""
+    lines = []
+    for category, month, threshold, spent, limit in alerts:
+        if threshold >= 100:
+            lines.append(f"🚨 **Over budget:** {_escape(category)} {format_minor(spent)} of {format_minor(limit)} in {month}")
+        else:
+            lines.append(f"⚠️ **{threshold}% of budget:** {_escape(category)} {format_minor(spent)} of {format_minor(limit)} in {month}")
+    return "".join(f"\n\n{line}" for line in lines)
+
+
+def format_stats_message(stats: Dict[str, int]) -> str:
+    """Format the duplicate suppression and delivery counters for the /stats command."""
+    return "📈 **Bot Stats**\n\n" \
+           f"🔁 Redelivered updates dropped: {stats['update']}\n" \
+           f"♻️ Repeated transactions dropped: {stats['content']}\n" \
+           f"🗂 Recently handled keys: {stats['cached']}\n" \
+           f"📤 Waiting for the spreadsheet: {stats['outbox_pending']}\n" \
+           f"🚫 Refused by the spreadsheet: {stats['outbox_dead_letters']}"
+
+
+def format_sheets_status(response: str, saved: Optional[bool]) -> str:
+    """Append the spreadsheet delivery status to a transaction response."""
+    if saved is None:
+        status = "⏳ Saving to spreadsheet..."
+    elif saved:
+        status = "✅ Data saved to spreadsheet"
+    else:
+        status = "⚠️ Spreadsheet unavailable, the transaction will be saved automatically later"
+    return f"{response}\n\n{status}"
+
+
+# Static replies, rendered once
+WELCOME_MESSAGE = """
 🤖 **Welcome to Money Tracker Bot!**
 
 I can help you track your personal finances. Here are the supported formats:
@@ -65,14 +420,13 @@ I can help you track your personal finances. Here are the supported formats:
 • `/help` - Detailed help and examples
 • `/accounts` - View available accounts  
 • `/categories` - View available categories
+• `/balance` - Current balance per account
+• `/summary [YYYY-MM]` - Monthly totals
 
 Just send me a message in any of the transaction formats and I'll log it for you!
 """
 
-
-def get_help_message() -> str:
-    """Get the help message for the /help command."""
-    return """
+HELP_MESSAGE = """
 📖 **Money Tracker Bot Help**
 
 **Available Commands:**
@@ -80,6 +434,14 @@ def get_help_message() -> str:
 • `/help` - Show this help message
 • `/accounts` - List available accounts
 • `/categories` - List available categories
+• `/balance` - Show the running balance of every account
+• `/summary [YYYY-MM]` - Show income, expenses and top categories for a month
+• `/report [YYYY-MM]` - Spending by category and net flow per account
+• `/top [categories] [YYYY-MM]` - Highest-spending categories (all time by default)
+• `/resync` - Rebuild the local ledger from the spreadsheet
+• `/recurring` - Record transactions on a schedule (add, list, remove)
+• `/budget` - Monthly budgets per category, with warnings at 80% and 100%
+• `/stats` - Duplicates dropped and transactions waiting for the spreadsheet
 
 **Supported Transaction Formats:**
 
@@ -97,6 +459,13 @@ def get_help_message() -> str:
 • `+ 3000.00 Business Mandiri Web design project`
 • `t 500.00 Gopay > BRI Emergency fund transfer`
 
+**Several at once:** send one transaction per line in a single message.
+
+**Importing history:** send a `.csv` file with either
+`type,date,amount,category,account,description` columns or a bank
+statement with `date,description,debit,credit` columns. Put the account
+name in the file caption for bank statements.
+
 **Notes:**
 - Date format: YYYY-MM-DD (optional, defaults to today)
 - Amount: Use decimal format (e.g., 25.50)
@@ -104,10 +473,7 @@ def get_help_message() -> str:
 - Use "Other" category for miscellaneous expenses
 """
 
-
-def get_error_message() -> str:
-    """Get the error message for invalid formats."""
-    return """
+ERROR_MESSAGE = """
 ❌ **Invalid format!** 
 
 Please use one of these formats:
@@ -120,27 +486,57 @@ Send /help for more details and examples.
 """
 
 
-def get_accounts_message() -> str:
-    """Get the list of available accounts."""
-    accounts_list = "\n".join([f"• {account}" for account in AVAILABLE_ACCOUNTS])
-    return f"""
-🏦 **Available Accounts**
+NAME_LIST_TEMPLATE = """
+{title}
 
-{accounts_list}
+{names}
 
-You can use these account names in your transactions.
+You can use these {kind} names in your transactions.
 Use /help for transaction format examples.
 """
 
 
-def get_categories_message() -> str:
-    """Get the list of available categories."""
-    categories_list = "\n".join([f"• {category}" for category in AVAILABLE_CATEGORIES])
-    return f"""
-📂 **Available Categories**
+def get_welcome_message() -> str:
+    """Get the welcome message for the /start command."""
+    return WELCOME_MESSAGE
 
-{categories_list}
 
-You can use these category names in your transactions.
-Use /help for transaction format examples.
-"""
+def get_help_message() -> str:
+    """Get the help message for the /help command."""
+    return HELP_MESSAGE
+
+
+def get_error_message() -> str:
+    """Get the error message for invalid formats."""
+    return ERROR_MESSAGE
+
+
+def _name_list(title: str, kind: str, names: Tuple[str, ...]) -> str:
+    return NAME_LIST_TEMPLATE.format(title=title, kind=kind, names="\n".join(f"• {_escape(name)}" for name in names))
+
+
+@lru_cache(maxsize=256)
+def _accounts_message(accounts: Tuple[str, ...]) -> str:
+    return _name_list("🏦 **Available Accounts**", "account", accounts)
+
+
+@lru_cache(maxsize=256)
+def _categories_message(categories: Tuple[str, ...]) -> str:
+    return _name_list("📂 **Available Categories**", "category", categories)
+
+
+def get_accounts_message(accounts: Sequence[str] = AVAILABLE_ACCOUNTS) -> str:
+    """Get the list of available accounts, rendered once per list."""
+    return _accounts_message(tuple(accounts))
+
+
+def get_categories_message(categories: Sequence[str] = AVAILABLE_CATEGORIES) -> str:
+    """Get the list of available categories, rendered once per list."""
+    return _categories_message(tuple(categories))
+
+
+def warm_static_replies(name_lists: Iterable[Tuple[Sequence[str], Sequence[str]]]) -> None:
+    """Render the /accounts and /categories replies for each (accounts, categories) pair up front."""
+    for accounts, categories in name_lists:
+        get_accounts_message(accounts)
+        get_categories_message(categories)
@@ -2,14 +2,52 @@
 Bot command handlers for the Money Tracker Bot
 """
 
+import asyncio
 import logging
-from telegram import Update
-from telegram.ext import ContextTypes
+import os
+import tempfile
+import time
+from datetime import datetime
+from decimal import InvalidOperation
+from typing import List, Sequence, Tuple, Union
+from telegram import Message, Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
 
+from models import Expense, Income, Transfer, to_amount
 from parser import FinanceParser
-from sheets import sheets_integration
+from resolver import UnknownNameError
+from tenants import Tenant, tenant_registry, sheets_endpoints
+from outbox import outbox
+from ledger import ledger, to_minor
+from aggregates import aggregates
+from dedup import dedup_cache
+from recurring import recurring_scheduler
+from budgets import BudgetAlert, budget_book
+from metrics import HANDLER_STAGE_SECONDS, PARSE_FAILURES
+from importer import ImportFormatError, iter_csv_transactions, chunked
+from config import SHEETS_BACKGROUND_WRITES, IMPORT_CHUNK_SIZE, IMPORT_PROGRESS_INTERVAL
 from formatters import (
     format_transaction_response,
+    format_bulk_response,
+    format_corrections,
+    format_unknown_name,
+    format_import_progress,
+    format_import_failed,
+    MAX_LISTED_ERRORS,
+    format_sheets_status,
+    format_balance_message,
+    format_summary_message,
+    format_report_message,
+    format_top_categories_message,
+    format_stats_message,
+    format_recurring_added,
+    format_recurring_list,
+    format_recurring_recorded,
+    RECURRING_USAGE,
+    format_budget_set,
+    format_budget_list,
+    format_budget_alerts,
+    BUDGET_USAGE,
     get_welcome_message,
     get_help_message,
     get_error_message,
@@ -36,58 +74,419 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await update.message.reply_text(help_message, parse_mode='Markdown')
 
 
+def tenant_for(update: Update) -> Tenant:
+    """Tenant (spreadsheet, accounts and categories) serving this update's chat or user."""
+    user = update.effective_user
+    return tenant_registry.resolve(update.effective_chat.id, user.id if user else None)
+
+
 async def accounts_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send list of available accounts."""
-    accounts_message = get_accounts_message()
+    accounts_message = get_accounts_message(tenant_for(update).accounts)
     await update.message.reply_text(accounts_message, parse_mode='Markdown')
 
 
 async def categories_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send list of available categories."""
-    categories_message = get_categories_message()
+    categories_message = get_categories_message(tenant_for(update).categories)
     await update.message.reply_text(categories_message, parse_mode='Markdown')
 
 
+async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the running balance of every account from the local ledger."""
+    balances = await ledger.balances(update.effective_chat.id, tenant_for(update).accounts)
+    await update.message.reply_text(format_balance_message(balances), parse_mode='Markdown')
+
+
+async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send monthly totals from the local ledger: /summary [YYYY-MM]."""
+    month = context.args[0] if context.args else datetime.now().strftime('%Y-%m')
+    try:
+        summary = await ledger.summary(update.effective_chat.id, month)
+    except ValueError:
+        await update.message.reply_text("❌ Invalid month. Use YYYY-MM, e.g. `/summary 2025-07`", parse_mode='Markdown')
+        return
+    await update.message.reply_text(format_summary_message(month, summary), parse_mode='Markdown')
+
+
+async def resync_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Rebuild the local ledger from the spreadsheet."""
+    progress = await update.message.reply_text("🔄 Rebuilding the ledger from the spreadsheet...")
+    try:
+        sheets = sheets_endpoints.sheets_for(tenant_for(update).endpoint)
+        loaded = await ledger.resync(update.effective_chat.id, sheets, await outbox.pending_keys())
+        aggregates.rebuild(await ledger.aggregate_rows())
+    except Exception as e:
+        logger.error(f"Ledger resync failed: {e}")
+        await progress.edit_text("❌ Could not read the spreadsheet. Please try again later.")
+        return
+    await progress.edit_text(f"✅ Ledger rebuilt from the spreadsheet: {loaded} transactions loaded.")
+
+
+def parse_month_argument(value: str) -> str:
+    """Validate a YYYY-MM command argument."""
+    return datetime.strptime(value, '%Y-%m').strftime('%Y-%m')
+
+
+async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the monthly report from the in-memory aggregates: /report [YYYY-MM]."""
+    try:
+        month = parse_month_argument(context.args[0]) if context.args else datetime.now().strftime('%Y-%m')
+    except ValueError:
+        await update.message.reply_text("❌ Invalid month. Use YYYY-MM, e.g. `/report 2025-07`", parse_mode='Markdown')
+        return
+    report = aggregates.report(update.effective_chat.id, month, tenant_for(update).categories)
+    await update.message.reply_text(format_report_message(month, report), parse_mode='Markdown')
+
+
+async def top_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the highest-spending categories: /top [categories] [YYYY-MM]."""
+    args = [arg for arg in (context.args or []) if arg.lower() != 'categories']
+    try:
+        month = parse_month_argument(args[0]) if args else None
+    except ValueError:
+        await update.message.reply_text("❌ Invalid month. Use YYYY-MM, e.g. `/top categories 2025-07`", parse_mode='Markdown')
+        return
+    ranked = aggregates.top_categories(update.effective_chat.id, month)
+    await update.message.reply_text(format_top_categories_message(month or "all time", ranked), parse_mode='Markdown')
+
+
+def format_run_time(timestamp: float) -> str:
+    """Local date and time of a recurring rule's next run, to the minute."""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+def split_schedule(args: Sequence[str]) -> Tuple[str, str]:
+    """Split /recurring add arguments into the schedule (a shortcut or five cron fields) and the transaction."""
+    count = 1 if args and args[0].startswith('@') else 5
+    return ' '.join(args[:count]), ' '.join(args[count:])
+
+
+async def recurring_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Manage recurring transactions: /recurring add|list|remove."""
+    args = context.args or []
+    action = args[0].lower() if args else ''
+    chat_id = update.effective_chat.id
+
+    if action == 'list':
+        rules = [(rule.rule_id, rule.schedule.expression, rule.line, format_run_time(rule.next_run_at))
+                 for rule in recurring_scheduler.rules_for(chat_id)]
+        await update.message.reply_text(format_recurring_list(rules), parse_mode='Markdown')
+
+    elif action == 'add':
+        schedule, line = split_schedule(args[1:])
+        try:
+            transaction, _ = finance_parser.parse_with_corrections(line, tenant_for(update).resolver)
+            if transaction is None:
+                await update.message.reply_text(RECURRING_USAGE, parse_mode='Markdown')
+                return
+            user = update.effective_user
+            rule = await recurring_scheduler.add(chat_id, user.id if user else None, schedule, line)
+        except UnknownNameError as e:
+            await update.message.reply_text(format_unknown_name(e), parse_mode='Markdown')
+            return
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+        await update.message.reply_text(
+            format_recurring_added(rule.rule_id, rule.schedule.expression, line, format_run_time(rule.next_run_at)),
+            parse_mode='Markdown'
+        )
+
+    elif action in ('remove', 'delete') and len(args) == 2:
+        try:
+            removed = await recurring_scheduler.remove(chat_id, int(args[1].lstrip('#')))
+        except ValueError:
+            removed = False
+        if removed:
+            await update.message.reply_text(f"🗑 Recurring transaction {args[1]} removed.")
+        else:
+            await update.message.reply_text(f"❌ No recurring transaction {args[1]} in this chat. Send `/recurring list` to see them.",
+                                            parse_mode='Markdown')
+
+    else:
+        await update.message.reply_text(RECURRING_USAGE, parse_mode='Markdown')
+
+
+async def notify_recurring(bot, chat_id: int, transactions: List[Union[Expense, Income, Transfer]],
+                           alerts: Sequence[BudgetAlert] = ()) -> None:
+    """Tell a chat which of its recurring transactions were just recorded."""
+    await bot.send_message(chat_id, format_recurring_recorded(transactions) + format_budget_alerts(alerts),
+                           parse_mode='Markdown')
+
+
+async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show or set monthly category budgets: /budget [<category> <amount> [monthly]]."""
+    args = context.args or []
+    chat_id = update.effective_chat.id
+    month = datetime.now().strftime('%Y-%m')
+
+    if not args:
+        budgets = [(category, budget_book.spent(chat_id, category, month), limit)
+                   for category, limit in sorted(budget_book.budgets_for(chat_id).items())]
+        await update.message.reply_text(format_budget_list(month, budgets), parse_mode='Markdown')
+        return
+
+    if len(args) not in (2, 3) or (len(args) == 3 and args[2].lower() != 'monthly'):
+        await update.message.reply_text(BUDGET_USAGE, parse_mode='Markdown')
+        return
+    try:
+        category = tenant_for(update).resolver.category(args[0])
+        limit = to_minor(to_amount(args[1].replace(',', '')))
+    except UnknownNameError as e:
+        await update.message.reply_text(format_unknown_name(e), parse_mode='Markdown')
+        return
+    except InvalidOperation:
+        await update.message.reply_text(f"❌ Invalid amount: {args[1]}")
+        return
+    if limit < 0:
+        await update.message.reply_text(f"❌ Invalid amount: {args[1]}")
+        return
+
+    await budget_book.set(chat_id, category, limit)
+    if limit:
+        response = format_budget_set(category, limit, month, budget_book.spent(chat_id, category, month))
+        await update.message.reply_text(response, parse_mode='Markdown')
+    else:
+        await update.message.reply_text(f"🗑 Budget for {category} removed.")
+
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the duplicate suppression counters and the outbox depth."""
+    stats = {**dedup_cache.stats(), 'outbox_pending': await outbox.pending(),
+             'outbox_dead_letters': await outbox.dead_letters()}
+    await update.message.reply_text(format_stats_message(stats), parse_mode='Markdown')
+
+
+async def drop_duplicate_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stop an update Telegram already delivered before any handler sees it.
+    
+    Registered in a group that runs ahead of every other handler.
+    """
+    chat, message = update.effective_chat, update.effective_message
+    if dedup_cache.seen_update(update.update_id, chat.id if chat else None, message.message_id if message else None):
+        logger.info("Dropped redelivered update %s", update.update_id)
+        raise ApplicationHandlerStop
+
+
+def is_repeat(update: Update) -> bool:
+    """True if this message was already recorded moments ago; it gets no reply and is not saved again."""
+    message = update.message
+    if not dedup_cache.seen_message(update.effective_chat.id, message.message_id, message.text):
+        return False
+    logger.info("Dropped a repeat of message %s in chat %s", message.message_id, update.effective_chat.id)
+    return True
+
+
+def remember_message(update: Update) -> None:
+    """Count this message as a repeat from now on; call it once its transactions are queued."""
+    dedup_cache.remember_message(update.effective_chat.id, update.message.message_id, update.message.text)
+
+
+async def queue_transactions(update: Update, transactions: Sequence[Union[Expense, Income, Transfer]],
+                             track: bool = True) -> Tuple[List[str], List[BudgetAlert]]:
+    """Durably queue transactions for the chat's spreadsheet and mirror them in the local ledger.
+    
+    Returns the outbox keys and the budget thresholds the expenses crossed.
+    Each expense is checked right after it is added to the month's totals,
+    so a bulk message warns at the line that crossed the threshold.
+    """
+    chat_id = update.effective_chat.id
+    keys = await outbox.put_many(list(transactions), track=track, endpoint=tenant_for(update).endpoint)
+    await ledger.record_many(chat_id, transactions, keys)
+    alerts = []
+    for transaction in transactions:
+        aggregates.apply(chat_id, transaction)
+        alert = budget_book.check(chat_id, transaction)
+        if alert is not None:
+            alerts.append(alert)
+    return keys, alerts
+
+
+async def wait_for_sheets(keys: List[str]) -> bool:
+    """Wait for the first attempt to deliver queued transactions to Google Sheets."""
+    try:
+        results = await asyncio.gather(*(outbox.wait_for(key) for key in keys))
+    except Exception as e:
+        logger.error(f"Error sending to Google Sheets: {str(e)}")
+        return False
+    
+    sheets_success = all(results)
+    if sheets_success:
+        logger.info("Successfully sent %d transaction(s) to Google Sheets", len(keys))
+    else:
+        logger.warning("Failed to send transaction(s) to Google Sheets, they stay queued for retry")
+    return sheets_success
+
+
+async def save_and_update_reply(keys: List[str], reply: Message, response: str) -> None:
+    """Background task: wait for the Sheets write, then edit the reply with the outcome."""
+    sheets_success = await wait_for_sheets(keys)
+    await reply.edit_text(format_sheets_status(response, sheets_success), parse_mode='Markdown')
+
+
+async def save_and_confirm(keys: List[str], update: Update) -> None:
+    """Wait for the Sheets write, then send a separate confirmation message."""
+    sheets_success = await wait_for_sheets(keys)
+    if sheets_success:
+        await update.message.reply_text("✅ Data saved to spreadsheet", parse_mode='Markdown')
+    else:
+        await update.message.reply_text("⚠️ Spreadsheet unavailable, the transaction will be saved automatically later", parse_mode='Markdown')
+
+
+async def reply_and_save(update: Update, context: ContextTypes.DEFAULT_TYPE, keys: List[str], response: str) -> None:
+    """Reply with the response and report the Sheets delivery of the queued keys."""
+    if SHEETS_BACKGROUND_WRITES:
+        # Reply right away and save to Google Sheets in the background;
+        # the reply is edited in place once the write has finished
+        with HANDLER_STAGE_SECONDS.time(stage='reply'):
+            reply = await update.message.reply_text(
+                format_sheets_status(response, None), parse_mode='Markdown'
+            )
+        context.application.create_task(
+            save_and_update_reply(keys, reply, response), update=update
+        )
+    else:
+        with HANDLER_STAGE_SECONDS.time(stage='reply'):
+            await update.message.reply_text(response, parse_mode='Markdown')
+        await save_and_confirm(keys, update)
+
+
+async def handle_bulk_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle a message with one transaction per line and send one consolidated reply."""
+    with HANDLER_STAGE_SECONDS.time(stage='parse'):
+        result = finance_parser.parse_bulk(update.message.text, tenant_for(update).resolver)
+    logger.info("Parsed bulk message: %d transactions, %d errors", len(result.transactions), len(result.errors))
+    if result.errors:
+        PARSE_FAILURES.inc(len(result.errors), reason='bulk_line')
+    
+    with HANDLER_STAGE_SECONDS.time(stage='format'):
+        response = format_bulk_response(result)
+    if not result.transactions:
+        await update.message.reply_text(response, parse_mode='Markdown')
+        return
+    transactions = [transaction for _, transaction in result.transactions]
+    if is_repeat(update):
+        return
+    
+    # Queue everything durably in one write before replying
+    with HANDLER_STAGE_SECONDS.time(stage='queue'):
+        keys, alerts = await queue_transactions(update, transactions)
+    # Only a message that was queued counts as a repeat next time
+    remember_message(update)
+    await reply_and_save(update, context, keys, response + format_budget_alerts(alerts))
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle incoming messages and parse finance data."""
     message_text = update.message.text
-    logger.info(f"Received message: {message_text}")
+    # Only the size is logged: message text is financial data
+    logger.debug("Received message from chat %s (%d chars)", update.effective_chat.id, len(message_text))
     
     try:
+        # Several lines: parse them all in one pass
+        if '\n' in message_text.strip():
+            await handle_bulk_message(update, context)
+            return
+        
         # Parse the message
-        transaction = finance_parser.parse_message(message_text)
+        with HANDLER_STAGE_SECONDS.time(stage='parse'):
+            transaction, corrections = finance_parser.parse_with_corrections(
+                message_text, tenant_for(update).resolver
+            )
         
         if transaction:
-            # Format and send success response
-            response = format_transaction_response(transaction)
-            await update.message.reply_text(response, parse_mode='Markdown')
+            if is_repeat(update):
+                return
+            
+            # Format the success response
+            with HANDLER_STAGE_SECONDS.time(stage='format'):
+                response = format_transaction_response(transaction) + format_corrections(corrections)
             
             # Log the transaction
-            logger.info(f"Parsed transaction: {transaction}")
+            logger.debug("Parsed %s transaction", type(transaction).__name__)
             
-            # Send to Google Sheets
-            try:
-                sheets_success = await sheets_integration.send_to_sheets(transaction)
-                if sheets_success:
-                    logger.info("Successfully sent transaction to Google Sheets")
-                    # Optionally send a confirmation message
-                    await update.message.reply_text("✅ Data saved to spreadsheet", parse_mode='Markdown')
-                else:
-                    logger.warning("Failed to send transaction to Google Sheets")
-                    await update.message.reply_text("⚠️ Transaction recorded but failed to save to spreadsheet", parse_mode='Markdown')
-            except Exception as e:
-                logger.error(f"Error sending to Google Sheets: {str(e)}")
-                await update.message.reply_text("⚠️ Transaction recorded but failed to save to spreadsheet", parse_mode='Markdown')
+            # Queue it durably before replying, so it survives Sheets outages and restarts
+            with HANDLER_STAGE_SECONDS.time(stage='queue'):
+                keys, alerts = await queue_transactions(update, [transaction])
+            remember_message(update)
+            await reply_and_save(update, context, keys, response + format_budget_alerts(alerts))
         else:
+            PARSE_FAILURES.inc(reason='invalid_format')
             # Send error message with examples
             error_message = get_error_message()
             await update.message.reply_text(error_message, parse_mode='Markdown')
             
+    except UnknownNameError as e:
+        PARSE_FAILURES.inc(reason='unknown_name')
+        await update.message.reply_text(format_unknown_name(e), parse_mode='Markdown')
     except ValueError as e:
+        PARSE_FAILURES.inc(reason='invalid_amount')
         error_msg = f"❌ Error parsing amount: {str(e)}\nPlease use valid decimal format (e.g., 25.50)"
         await update.message.reply_text(error_msg)
         logger.error(f"Value error: {e}")
     except Exception as e:
+        PARSE_FAILURES.inc(reason='error')
         error_msg = "❌ An error occurred while processing your message. Please try again."
         await update.message.reply_text(error_msg)
         logger.error(f"Unexpected error: {e}")
+
+
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Import transactions from an uploaded CSV file.
+    
+    The file is streamed row by row and queued in chunks, and a single
+    progress message is edited as the import goes. The caption may name the
+    account used for bank statements without an account column.
+    """
+    document = update.message.document
+    file_name = document.file_name or 'upload.csv'
+    default_account = (update.message.caption or '').strip() or 'Cash'
+    logger.info(f"Received document for import: {file_name} ({document.file_size} bytes)")
+    
+    progress = await update.message.reply_text(
+        format_import_progress(file_name, 0, 0, [], done=False), parse_mode='Markdown'
+    )
+    imported = 0
+    skipped = 0
+    sample_errors = []  # Only the first few are kept, so memory stays flat
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'import.csv')
+        try:
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_drive(path)
+            
+            last_edit = time.monotonic()
+            rows = iter_csv_transactions(path, default_account, tenant_for(update).resolver)
+            for chunk in chunked(rows, IMPORT_CHUNK_SIZE):
+                transactions = []
+                for row_number, transaction, error in chunk:
+                    if transaction is not None:
+                        transactions.append(transaction)
+                    else:
+                        skipped += 1
+                        if len(sample_errors) < MAX_LISTED_ERRORS:
+                            sample_errors.append((row_number, error))
+                
+                # One durable write per chunk; the outbox delivers them as bulk appends.
+                # Budget warnings are not sent for imported history
+                await queue_transactions(update, transactions, track=False)
+                imported += len(transactions)
+                
+                if time.monotonic() - last_edit >= IMPORT_PROGRESS_INTERVAL:
+                    await progress.edit_text(
+                        format_import_progress(file_name, imported, skipped, sample_errors, done=False), parse_mode='Markdown'
+                    )
+                    last_edit = time.monotonic()
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            logger.warning(f"Rejected import {file_name}: {e}")
+            await progress.edit_text(format_import_failed(file_name, e), parse_mode='Markdown')
+            return
+        except Exception as e:
+            logger.error(f"Error importing {file_name}: {e}")
+            await progress.edit_text(format_import_failed(file_name, e, imported), parse_mode='Markdown')
+            return
+    
+    logger.info(f"Imported {imported} transactions from {file_name} ({skipped} rows skipped)")
+    await progress.edit_text(format_import_progress(file_name, imported, skipped, sample_errors, done=True), parse_mode='Markdown')
@@ -0,0 +1,172 @@
+"""
+CSV / bank statement import for the Money Tracker Bot
+
+Files are read row by row with generators, so memory stays flat no matter
+how many rows a file has. Two layouts are recognised from the header row:
+
+* Native export: ``type, date, amount, category, account, description``
+  plus ``from_account, to_account`` for transfers.
+* Bank statement: ``date, description, debit, credit`` (``category`` and
+  ``account`` columns are optional). Debits become expenses and credits
+  become income.
+
+When a resolver is given, category and account names go through it like
+the names typed in a message, and rows naming an unknown one are reported
+with the other invalid rows.
+"""
+
+import csv
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+from models import Expense, Income, Transfer, amount_from_text
+from resolver import Resolver
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+Transaction = Union[Expense, Income, Transfer]
+# (row number, transaction or None, error reason or None)
+ImportRow = Tuple[int, Optional[Transaction], Optional[str]]
+T = TypeVar('T')
+
+NATIVE_COLUMNS = {'type', 'date', 'amount'}
+BANK_COLUMNS = {'date', 'description', 'debit', 'credit'}
+
+# Date formats accepted in imported files, normalised to YYYY-MM-DD
+DATE_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d %b %Y')
+
+
+class ImportFormatError(ValueError):
+    """Raised when a file's header matches no supported layout."""
+
+
+def parse_date(value: str) -> str:
+    """Normalise a date in any supported format to YYYY-MM-DD."""
+    value = value.strip()
+    try:
+        # Fast path for ISO dates, much cheaper than strptime on large files
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d')
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date '{value}'")
+
+
+def parse_amount(value: str) -> Decimal:
+    """Parse an amount, ignoring currency symbols and thousands separators."""
+    cleaned = value.strip().replace(',', '').replace('Rp', '').replace(' ', '')
+    if not cleaned:
+        raise ValueError("missing amount")
+    try:
+        amount = amount_from_text(cleaned)
+    except InvalidOperation:
+        raise ValueError(f"invalid amount '{value}'") from None
+    if not amount.is_finite():
+        raise ValueError(f"invalid amount '{value}'")
+    if amount < 0:
+        raise ValueError(f"negative amount '{value}'")
+    return amount
+
+
+def _required(row: Dict[str, str], column: str) -> str:
+    value = row.get(column, '').strip()
+    if not value:
+        raise ValueError(f"missing {column.replace('_', ' ')}")
+    return value
+
+
+def _native_row(row: Dict[str, str]) -> Transaction:
+    transaction_type = row.get('type', '').strip().lower()
+    date = parse_date(row.get('date', ''))
+    amount = parse_amount(row.get('amount', ''))
+    if not amount:
+        raise ValueError("amount must be greater than zero")
+    description = row.get('description', '').strip()
+
+    if transaction_type == 'expense':
+        return Expense(amount=amount, category=row.get('category', '').strip() or 'Other',
+                       account=_required(row, 'account'), name=description, date=date)
+    if transaction_type == 'income':
+        return Income(amount=amount, category=row.get('category', '').strip() or 'Other',
+                      account=_required(row, 'account'), name=description, date=date)
+    if transaction_type == 'transfer':
+        return Transfer(amount=amount, from_account=_required(row, 'from_account'),
+                        to_account=_required(row, 'to_account'), description=description, date=date)
+    raise ValueError(f"unknown type '{transaction_type}'")
+
+
+def _bank_row(row: Dict[str, str], default_account: str) -> Transaction:
+    date = parse_date(row.get('date', ''))
+    # Statements leave the unused side blank
+    debit = parse_amount(row['debit']) if row.get('debit', '').strip() else Decimal(0)
+    credit = parse_amount(row['credit']) if row.get('credit', '').strip() else Decimal(0)
+    category = row.get('category', '').strip() or 'Other'
+    account = row.get('account', '').strip() or default_account
+    description = row.get('description', '').strip()
+
+    if debit and credit:
+        raise ValueError("both debit and credit are set")
+    if debit:
+        return Expense(amount=debit, category=category, account=account, name=description, date=date)
+    if credit:
+        return Income(amount=credit, category=category, account=account, name=description, date=date)
+    raise ValueError("no debit or credit amount")
+
+
+def iter_csv_transactions(path: str, default_account: str = 'Cash',
+                          resolver: Optional[Resolver] = None) -> Iterator[ImportRow]:
+    """Stream transactions out of a CSV file, one row at a time.
+
+    Yields ``(row_number, transaction, None)`` for good rows and
+    ``(row_number, None, reason)`` for rows that could not be mapped,
+    including names the resolver does not know.
+    Row numbers count the header as row 1, like a spreadsheet.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader, None)
+        if header is None:
+            raise ImportFormatError("The file is empty")
+
+        columns = [name.strip().lower() for name in header]
+        if NATIVE_COLUMNS <= set(columns):
+            def map_row(row):
+                return _native_row(row)
+        elif BANK_COLUMNS <= set(columns):
+            def map_row(row):
+                return _bank_row(row, default_account)
+        else:
+            raise ImportFormatError(
+                "Unrecognised columns. Expected either "
+                "type,date,amount,category,account,description or date,description,debit,credit"
+            )
+
+        for row_number, values in enumerate(reader, 2):
+            if not any(value.strip() for value in values):
+                continue
+            try:
+                transaction = map_row(dict(zip(columns, values)))
+                if resolver is not None:
+                    transaction, _ = resolver.apply(transaction)
+            except ValueError as e:
+                yield row_number, None, str(e)
+            else:
+                yield row_number, transaction, None
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Split an iterable into lists of at most ``size`` items, lazily."""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,336 @@
+"""
+Local read-side ledger for the Money Tracker Bot
+
+Every transaction the bot records is mirrored into a local SQLite database
+indexed by date, account and category, with running balances per account
+kept up to date incrementally. Reporting commands such as /balance and
+/summary read from here instead of fetching whole sheets from Apps Script.
+Amounts are stored as integer minor units (cents) so sums stay exact.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Any, Collection, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from models import Expense, Income, Transfer, to_amount
+from config import AVAILABLE_ACCOUNTS, get_settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+Transaction = Union[Expense, Income, Transfer]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    type TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount_minor INTEGER NOT NULL,
+    category TEXT,
+    account TEXT,
+    from_account TEXT,
+    to_account TEXT,
+    description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_chat_date ON transactions (chat_id, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_chat_account ON transactions (chat_id, account);
+CREATE INDEX IF NOT EXISTS idx_transactions_chat_category ON transactions (chat_id, category);
+
+CREATE TABLE IF NOT EXISTS balances (
+    chat_id INTEGER NOT NULL,
+    account TEXT NOT NULL,
+    balance_minor INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, account)
+);
+"""
+
+INSERT_TRANSACTION = (
+    "INSERT OR IGNORE INTO transactions "
+    "(chat_id, idempotency_key, type, date, amount_minor, category, account, from_account, to_account, description) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+ADJUST_BALANCE = (
+    "INSERT INTO balances (chat_id, account, balance_minor) VALUES (?, ?, ?) "
+    "ON CONFLICT (chat_id, account) DO UPDATE SET balance_minor = balance_minor + excluded.balance_minor"
+)
+
+# Rows requested per page when resyncing from the Apps Script export endpoint
+RESYNC_PAGE_SIZE = 1000
+# Keys per query when looking up who owns the rows of an export page
+KEY_LOOKUP_CHUNK = 500
+
+
+def to_minor(amount: Decimal) -> int:
+    """Convert an amount to integer minor units (cents)."""
+    return int((amount * 100).to_integral_value(ROUND_HALF_EVEN))
+
+
+def transaction_row(chat_id: int, transaction: Transaction, key: Optional[str]) -> Tuple:
+    """Map a transaction onto a row of the transactions table."""
+    amount_minor = to_minor(transaction.amount)
+    if isinstance(transaction, Expense):
+        return (chat_id, key, 'expense', transaction.date, amount_minor,
+                transaction.category, transaction.account, None, None, transaction.name)
+    if isinstance(transaction, Income):
+        return (chat_id, key, 'income', transaction.date, amount_minor,
+                transaction.category, transaction.account, None, None, transaction.name)
+    if isinstance(transaction, Transfer):
+        return (chat_id, key, 'transfer', transaction.date, amount_minor,
+                None, None, transaction.from_account, transaction.to_account, transaction.description)
+    raise ValueError(f"Unknown transaction type: {type(transaction)}")
+
+
+def balance_deltas(row: Tuple) -> List[Tuple[int, str, int]]:
+    """Balance adjustments (chat_id, account, delta) caused by one transactions row."""
+    chat_id, _, kind, _, amount_minor, _, account, from_account, to_account, _ = row
+    if kind == 'expense':
+        return [(chat_id, account, -amount_minor)]
+    if kind == 'income':
+        return [(chat_id, account, amount_minor)]
+    return [(chat_id, from_account, -amount_minor), (chat_id, to_account, amount_minor)]
+
+
+def month_range(month: str) -> Tuple[str, str]:
+    """Return the [start, end) date strings for a YYYY-MM month."""
+    year, month_number = (int(part) for part in month.split('-'))
+    if not 1 <= month_number <= 12:
+        raise ValueError(f"Invalid month: {month}")
+    next_year, next_month = (year + 1, 1) if month_number == 12 else (year, month_number + 1)
+    return f"{year:04d}-{month_number:02d}-01", f"{next_year:04d}-{next_month:02d}-01"
+
+
+class Ledger:
+    """SQLite mirror of recorded transactions with incremental account balances.
+
+    Like the outbox, all database work runs on one dedicated thread so the
+    event loop never waits on disk I/O.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = get_settings().LEDGER_PATH if path is None else path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ledger-db')
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # ------------------------------------------------------------------
+    # Database access (runs on the ledger thread)
+    # ------------------------------------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, rows: List[Tuple]) -> List[bool]:
+        recorded = []
+        for row in rows:
+            inserted = bool(conn.execute(INSERT_TRANSACTION, row).rowcount)
+            if inserted:
+                conn.executemany(ADJUST_BALANCE, balance_deltas(row))
+            recorded.append(inserted)
+        return recorded
+
+    def _db_record(self, rows: List[Tuple]) -> List[bool]:
+        conn = self._db()
+        with conn:
+            return self._insert(conn, rows)
+
+    def _db_balances(self, chat_id: int) -> Dict[str, int]:
+        rows = self._db().execute(
+            "SELECT account, balance_minor FROM balances WHERE chat_id = ?", (chat_id,)
+        ).fetchall()
+        return dict(rows)
+
+    def _db_summary(self, chat_id: int, start: str, end: str) -> Dict[str, Any]:
+        conn = self._db()
+        totals = dict(conn.execute(
+            "SELECT type, SUM(amount_minor) FROM transactions "
+            "WHERE chat_id = ? AND date >= ? AND date < ? GROUP BY type",
+            (chat_id, start, end)
+        ).fetchall())
+        categories = conn.execute(
+            "SELECT category, SUM(amount_minor) AS total FROM transactions "
+            "WHERE chat_id = ? AND date >= ? AND date < ? AND type = 'expense' "
+            "GROUP BY category ORDER BY total DESC",
+            (chat_id, start, end)
+        ).fetchall()
+        count = conn.execute(
+            "SELECT COUNT(*) FROM transactions WHERE chat_id = ? AND date >= ? AND date < ?",
+            (chat_id, start, end)
+        ).fetchone()[0]
+        return {
+            'income': totals.get('income', 0),
+            'expense': totals.get('expense', 0),
+            'transfer': totals.get('transfer', 0),
+            'categories': categories,
+            'count': count,
+        }
+
+    def _db_aggregate_rows(self) -> List[Tuple]:
+        return self._db().execute(
+            "SELECT chat_id, substr(date, 1, 7) AS month, type, category, account, from_account, to_account, "
+            "SUM(amount_minor), COUNT(*) FROM transactions "
+            "GROUP BY chat_id, month, type, category, account, from_account, to_account"
+        ).fetchall()
+
+    def _db_replace(self, chat_id: int, keep_keys: Set[str], staged: List[Tuple[str, List[Any]]]) -> int:
+        """Swap this chat's rows for the staged export rows in one database transaction."""
+        conn = self._db()
+        keys = [export_row_key(row) for _, row in staged]
+        foreign = self._db_foreign_keys(chat_id, [key for key in keys if key])
+        rows = [transaction_row(chat_id, export_row_to_transaction(transaction_type, row), key)
+                for (transaction_type, row), key in zip(staged, keys) if key not in foreign]
+        kept = [row for row in conn.execute(
+            "SELECT chat_id, idempotency_key, type, date, amount_minor, category, account, "
+            "from_account, to_account, description FROM transactions "
+            "WHERE chat_id = ? AND idempotency_key IS NOT NULL ORDER BY id", (chat_id,)
+        ) if row[1] in keep_keys]
+        with conn:
+            conn.execute("DELETE FROM transactions WHERE chat_id = ?", (chat_id,))
+            conn.execute("DELETE FROM balances WHERE chat_id = ?", (chat_id,))
+            self._insert(conn, kept)
+            return sum(self._insert(conn, rows))
+
+    def _db_foreign_keys(self, chat_id: int, keys: List[str]) -> Set[str]:
+        conn = self._db()
+        foreign = set()
+        for start in range(0, len(keys), KEY_LOOKUP_CHUNK):
+            chunk = keys[start:start + KEY_LOOKUP_CHUNK]
+            foreign.update(key for key, in conn.execute(
+                f"SELECT idempotency_key FROM transactions WHERE chat_id != ? "
+                f"AND idempotency_key IN ({', '.join('?' * len(chunk))})", (chat_id, *chunk)
+            ))
+        return foreign
+
+    def _db_close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run_db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Open the ledger database. Called on application startup."""
+        await self._run_db(self._db)
+        logger.info(f"Ledger opened (path={self.path})")
+
+    async def close(self) -> None:
+        """Close the ledger database. Called on application shutdown."""
+        await self._run_db(self._db_close)
+
+    async def record(self, chat_id: int, transaction: Transaction, key: Optional[str] = None) -> None:
+        """Mirror one recorded transaction and update the running balances."""
+        await self.record_many(chat_id, [transaction], [key])
+
+    async def record_many(self, chat_id: int, transactions: Sequence[Transaction],
+                          keys: Optional[Sequence[Optional[str]]] = None) -> int:
+        """Mirror several transactions in one database transaction.
+
+        Rows whose idempotency key is already present are skipped, so
+        recording the same transaction twice never double-counts it.
+        Returns the number of rows actually recorded.
+        """
+        keys = keys if keys is not None else [None] * len(transactions)
+        rows = [transaction_row(chat_id, t, key) for t, key in zip(transactions, keys)]
+        return sum(await self._run_db(self._db_record, rows))
+
+    async def record_unseen(self, chat_id: int, transactions: Sequence[Transaction],
+                            keys: Sequence[str]) -> List[Transaction]:
+        """Like record_many, but return the transactions whose key was not recorded before."""
+        rows = [transaction_row(chat_id, t, key) for t, key in zip(transactions, keys)]
+        recorded = await self._run_db(self._db_record, rows)
+        return [transaction for transaction, inserted in zip(transactions, recorded) if inserted]
+
+    async def balances(self, chat_id: int, accounts: Sequence[str] = AVAILABLE_ACCOUNTS) -> Dict[str, int]:
+        """Running balance per account in minor units, including every configured account."""
+        stored = await self._run_db(self._db_balances, chat_id)
+        balances = {account: stored.pop(account, 0) for account in accounts}
+        balances.update(stored)  # Accounts used in transactions but not configured
+        return balances
+
+    async def summary(self, chat_id: int, month: str) -> Dict[str, Any]:
+        """Totals for a YYYY-MM month: income, expense, transfers and expense per category."""
+        start, end = month_range(month)
+        return await self._run_db(self._db_summary, chat_id, start, end)
+
+    async def aggregate_rows(self) -> List[Tuple]:
+        """Sums grouped by chat, month, type, category and accounts, for rebuilding aggregates."""
+        return await self._run_db(self._db_aggregate_rows)
+
+    async def resync(self, chat_id: int, sheets, keep_keys: Collection[str] = ()) -> int:
+        """Rebuild this chat's ledger from its spreadsheet via the Apps Script export endpoint.
+
+        A spreadsheet may be shared by several chats of a tenant, so rows are
+        matched by idempotency key: rows the ledger holds for another chat are
+        left to it, other rows (including ones typed in by hand) are loaded into
+        this chat. This chat's rows whose keys are in ``keep_keys`` (payloads
+        still in the outbox, not in the sheet yet) are kept.
+
+        Every page is fetched before the ledger is touched, and the rows are
+        swapped in one database transaction, so a failed or interrupted export
+        leaves the ledger as it was. Returns the number of transactions loaded.
+        """
+        staged: List[Tuple[str, List[Any]]] = []
+        for transaction_type in ('expense', 'income', 'transfer'):
+            offset = 0
+            while offset is not None:
+                page = await sheets.fetch_export(transaction_type, offset, RESYNC_PAGE_SIZE)
+                staged.extend((transaction_type, row) for row in page['rows'])
+                offset = page.get('next_offset')
+        loaded = await self._run_db(self._db_replace, chat_id, set(keep_keys), staged)
+        logger.info(f"Ledger resync for chat {chat_id} loaded {loaded} transactions")
+        return loaded
+
+
+def export_row_key(row: List[Any]) -> Optional[str]:
+    """Idempotency key from the hidden Key column (G) of a sheet row, if it has one."""
+    return str(row[6]) if len(row) > 6 and row[6] else None
+
+
+def export_row_to_transaction(transaction_type: str, row: List[Any]) -> Transaction:
+    """Map a sheet row [timestamp, date, amount, D, E, description, key] onto a model."""
+    _, date, amount, first, second, description = (list(row) + [''] * 6)[:6]
+    amount = to_amount(amount or 0)
+    if transaction_type == 'expense':
+        return Expense(amount=amount, category=first, account=second, name=description, date=date)
+    if transaction_type == 'income':
+        return Income(amount=amount, category=first, account=second, name=description, date=date)
+    return Transfer(amount=amount, from_account=first, to_account=second, description=description, date=date)
+
+
+# Global instance, built on first use
+_ledger: Optional[Ledger] = None
+
+
+def get_ledger() -> Ledger:
+    """The ledger at LEDGER_PATH; later calls return the same object."""
+    global _ledger
+    if _ledger is None:
+        _ledger = Ledger()
+    return _ledger
+
+
+def __getattr__(name: str):
+    # Keeps ``from ledger import ledger`` working without building it at import
+    if name == 'ledger':
+        return get_ledger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
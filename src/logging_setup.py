@@ -0,0 +1,158 @@
+"""
+Logging setup for the Money Tracker Bot
+
+Records are handed to a background thread through a queue, so the event
+loop never waits on formatting or stderr. Formatting is deferred to that
+thread too: log calls pass %-style arguments and the message is only built
+if the record is actually written. On the way out records can be sampled,
+are scrubbed of amounts and descriptions, and are written as one JSON
+object per line.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_SAMPLE_RATE, LOG_REDACT
+
+REDACTED = '***'
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+# Keys whose values are financial data, in dict/JSON reprs, dataclass reprs and ``extra`` fields
+SENSITIVE_KEYS = ('amount', 'description', 'name', 'text')
+_DICT_VALUE = re.compile(r"""(['"](?:%s)['"]\s*:\s*)('[^']*'|"[^"]*"|[^,}\s]+)""" % '|'.join(SENSITIVE_KEYS))
+_KEYWORD_VALUE = re.compile(r"""\b((?:%s)=)(Decimal\('[^']*'\)|'[^']*'|"[^"]*"|[^,)\s]+)""" % '|'.join(SENSITIVE_KEYS))
+# Raw transaction lines such as "- 50.00 Transportation Cash Bus fare", alone or after "label: "
+_TRANSACTION_LINE = re.compile(r'(^|\n|:\s)(\s*(?:[-+]|t)\s+)\d[\d.,]*[^\n]*')
+
+
+def redact(text: str) -> str:
+    """Mask amounts and descriptions in a log message."""
+    text = _DICT_VALUE.sub(rf"\1'{REDACTED}'", text)
+    text = _KEYWORD_VALUE.sub(rf"\1{REDACTED}", text)
+    return _TRANSACTION_LINE.sub(rf"\1\2{REDACTED}", text)
+
+
+class RedactingFilter(logging.Filter):
+    """Scrub financial data from the rendered message and ``extra`` fields."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact(record.getMessage())
+        record.args = None
+        for key in SENSITIVE_KEYS:
+            if key in record.__dict__ and key not in _STANDARD_ATTRIBUTES:
+                setattr(record, key, REDACTED)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler renders the message before enqueueing, which is the
+    expensive part of a log call. Records stay in-process, so they can be
+    queued as they are.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse ``"sheets=WARNING,httpx=ERROR"`` into a module -> level mapping."""
+    levels = {}
+    for item in spec.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(
+    level: str = LOG_LEVEL,
+    levels: str = LOG_LEVELS,
+    log_format: str = LOG_FORMAT,
+    sample_rate: float = LOG_SAMPLE_RATE,
+    redact_data: bool = LOG_REDACT,
+    stream=None
+) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a background writer thread.
+
+    Safe to call more than once; the previous listener is stopped first.
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if log_format == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    if redact_data:
+        output.addFilter(RedactingFilter())
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    if sample_rate < 1:
+        handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, module_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -7,34 +7,198 @@ A Telegram bot for tracking personal finances with support for:
 - Transfers: t <amount> <from_account> > <to_account> [description] [@date]
 """
 
+import asyncio
 import logging
+from functools import partial
+from typing import Optional
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, TypeHandler, filters
 
-from config import BOT_TOKEN
-from handlers import start_command, help_command, handle_message, accounts_command, categories_command
+from config import (
+    get_settings,
+    BOT_TOKEN,
+    BOT_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_CERT,
+    WEBHOOK_KEY,
+    MAX_CONCURRENT_UPDATES,
+    ESCAPE_MARKDOWN,
+    SHUTDOWN_TIMEOUT
+)
+from handlers import (
+    start_command,
+    help_command,
+    handle_message,
+    handle_document,
+    accounts_command,
+    categories_command,
+    balance_command,
+    summary_command,
+    resync_command,
+    report_command,
+    top_command,
+    stats_command,
+    recurring_command,
+    notify_recurring,
+    budget_command,
+    drop_duplicate_update
+)
+from concurrency import PerChatUpdateProcessor
+from sheets import sheets_integration
+from batcher import sheets_batcher
+from tenants import sheets_endpoints, tenant_registry
+from formatters import configure_escaping, warm_static_replies
+from outbox import outbox
+from ledger import ledger
+from aggregates import aggregates
+from dedup import dedup_cache
+from recurring import recurring_scheduler
+from budgets import budget_book
+from metrics import metrics
+from logging_setup import configure_logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 
-def main() -> None:
-    """Start the Money Tracker Bot."""
-    # Create the Application
-    application = Application.builder().token(BOT_TOKEN).build()
+BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+def register_gauges(application: Application) -> None:
+    """Expose queue depths and breaker states as gauges, read at scrape time."""
+    metrics.gauge('moneybot_outbox_pending', 'Payloads waiting in the outbox for delivery', outbox.pending)
+    metrics.gauge('moneybot_outbox_dead_letters', 'Payloads the spreadsheet refused and the outbox gave up on',
+                  outbox.dead_letters)
+    metrics.gauge('moneybot_outbox_in_flight', 'Outbox deliveries currently running', lambda: outbox.in_flight)
+    metrics.gauge('moneybot_batcher_pending', 'Payloads waiting to be flushed in a Sheets batch',
+                  lambda: sum(batcher.pending for batcher in sheets_endpoints.batchers()))
+    metrics.gauge('moneybot_updates_in_flight', 'Telegram updates currently being processed',
+                  lambda: application.update_processor.current_concurrent_updates)
+    metrics.gauge('moneybot_sheets_breaker_state', 'Circuit breaker state per Sheets endpoint (0 closed, 1 half-open, 2 open)',
+                  lambda: {(m['endpoint'],): BREAKER_STATES[m['breaker']['state']] for m in sheets_endpoints.metrics()},
+                  labels=('endpoint',))
+    metrics.gauge('moneybot_sheets_breaker_rejected', 'Requests rejected by an open circuit breaker per Sheets endpoint',
+                  lambda: {(m['endpoint'],): m['breaker']['rejected'] for m in sheets_endpoints.metrics()},
+                  labels=('endpoint',))
+    metrics.gauge('moneybot_dedup_cached_keys', 'Update and transaction keys remembered for duplicate suppression',
+                  lambda: dedup_cache.size)
+    metrics.gauge('moneybot_recurring_rules', 'Recurring transaction rules scheduled', lambda: recurring_scheduler.count)
+    metrics.gauge('moneybot_budgets', 'Monthly category budgets set', lambda: budget_book.count)
+
+
+async def post_init(application: Application) -> None:
+    """Open long-lived resources once the application has started."""
+    configure_escaping(ESCAPE_MARKDOWN)
+    warm_static_replies((tenant.accounts, tenant.categories) for tenant in tenant_registry.tenants())
+    await dedup_cache.start()
+    await ledger.start()
+    aggregates.rebuild(await ledger.aggregate_rows())
+    await budget_book.start()
+    await sheets_integration.start()
+    await sheets_batcher.start()
+    await sheets_endpoints.start()
+    await outbox.start()
+    await recurring_scheduler.start(partial(notify_recurring, application.bot))
+    register_gauges(application)
+    await metrics.start()
+
+
+async def post_shutdown(application: Application) -> None:
+    """Release long-lived resources when the application shuts down.
+    
+    By now no more updates are fetched and every handler has finished.
+    Queued Sheets writes get SHUTDOWN_TIMEOUT seconds to go out; whatever
+    is left stays in the outbox and is delivered first on the next start.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SHUTDOWN_TIMEOUT
+
+    def remaining() -> float:
+        return max(0.0, deadline - loop.time())
+
+    await metrics.stop()
+    await recurring_scheduler.stop()
+    await outbox.stop(remaining())
+    await sheets_endpoints.stop(remaining())
+    await sheets_batcher.stop(remaining())
+    await sheets_integration.close()
+    await ledger.close()
+    await dedup_cache.stop()
+
+
+# Only message updates are handled (text, commands and documents), so Telegram
+# is asked not to send anything else
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+
+def build_application(builder: Optional[ApplicationBuilder] = None) -> Application:
+    """Build the Application with all handlers and lifecycle hooks registered."""
+    if builder is None:
+        builder = Application.builder().token(BOT_TOKEN)
+    
+    # Create the Application. Updates from different chats are processed
+    # concurrently, while each chat's updates stay in order
+    application = (
+        builder
+        .concurrent_updates(PerChatUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+
+    # Drop updates Telegram delivers again, ahead of every other handler
+    application.add_handler(TypeHandler(Update, drop_duplicate_update), group=-1)
 
     # Add command handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("accounts", accounts_command))
     application.add_handler(CommandHandler("categories", categories_command))
+    application.add_handler(CommandHandler("balance", balance_command))
+    application.add_handler(CommandHandler("summary", summary_command))
+    application.add_handler(CommandHandler("resync", resync_command))
+    application.add_handler(CommandHandler("report", report_command))
+    application.add_handler(CommandHandler("top", top_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("recurring", recurring_command))
+    application.add_handler(CommandHandler("budget", budget_command))
     
     # Add message handler for text messages (excluding commands)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    
+    # Add document handler for CSV / bank statement imports
+    application.add_handler(MessageHandler(filters.Document.FileExtension("csv"), handle_document))
+    
+    return application
+
+
+def main() -> None:
+    """Start the Money Tracker Bot."""
+    get_settings().validate()
+    configure_logging()
+    application = build_application()
 
-    # Run the bot until the user presses Ctrl-C
-    logger.info("Starting Money Tracker Bot...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if BOT_MODE == 'webhook':
+        # Receive updates over HTTP(S); several instances can sit behind a load balancer
+        logger.info(f"Starting Money Tracker Bot in webhook mode on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}...")
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            cert=WEBHOOK_CERT,
+            key=WEBHOOK_KEY,
+            allowed_updates=ALLOWED_UPDATES
+        )
+    else:
+        # Run the bot until the user presses Ctrl-C
+        logger.info("Starting Money Tracker Bot...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == '__main__':
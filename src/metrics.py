@@ -0,0 +1,299 @@
+"""
+Prometheus-style metrics for the Money Tracker Bot
+
+Counters, histograms and gauges are kept in process and served in the
+Prometheus text exposition format on a local ``/metrics`` HTTP endpoint.
+When metrics are disabled every recording call returns after a single
+attribute check, and timers are a shared no-op context manager, so the
+instrumentation costs next to nothing on the hot path.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from config import get_settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+GaugeValue = Union[float, Dict[LabelValues, float]]
+GaugeCallback = Callable[[], Union[GaugeValue, Awaitable[GaugeValue]]]
+
+# Latency buckets in seconds, from sub-millisecond parsing up to Sheets timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labels: Tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+    kind = 'counter'
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class _Timer:
+    """Context manager observing its elapsed time into a histogram."""
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram: 'Histogram', labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> '_Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class _NullTimer:
+    """Shared do-nothing timer used while metrics are disabled."""
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullTimer':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(*args)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def time(self, **labels) -> Union[_Timer, _NullTimer]:
+        """``with histogram.time(stage='parse'):`` records the block's duration."""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, series in self._values.items():
+            cumulative = 0
+            labels = _format_labels(self.label_names, key)
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Point-in-time value read from a callback at scrape time.
+
+    The callback may be a coroutine function, and may return a plain number
+    or a dict mapping label value tuples to numbers.
+    """
+    kind = 'gauge'
+
+    def __init__(self, *args, callback: GaugeCallback):
+        super().__init__(*args)
+        self.callback = callback
+
+    async def collect(self) -> Dict[LabelValues, float]:
+        value = self.callback()
+        if inspect.isawaitable(value):
+            value = await value
+        return value if isinstance(value, dict) else {(): value}
+
+    async def render_async(self) -> List[str]:
+        lines = self.header()
+        for key, value in (await self.collect()).items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {float(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric and serves them over HTTP."""
+
+    def __init__(self, enabled: Optional[bool] = None):
+        if enabled is not None:
+            self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def __getattr__(self, name: str):
+        # Only reached while ``enabled`` is unset: it is read from the settings on
+        # first use, then stays a plain attribute for the hot path
+        if name == 'enabled':
+            self.enabled = get_settings().METRICS_ENABLED
+            return self.enabled
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labels, buckets=buckets))
+
+    def gauge(self, name: str, documentation: str, callback: GaugeCallback, labels: Tuple[str, ...] = ()) -> Gauge:
+        """Register a gauge; re-registering a name replaces its callback."""
+        gauge = Gauge(self, name, documentation, labels, callback=callback)
+        self._metrics[name] = gauge
+        return gauge
+
+    async def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            if isinstance(metric, Gauge):
+                try:
+                    lines.extend(await metric.render_async())
+                except Exception as e:
+                    logger.error(f"Error collecting gauge {metric.name}: {e}")
+            else:
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    # ------------------------------------------------------------------
+    # HTTP endpoint
+    # ------------------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass  # Headers are not needed
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', (await self.render()).encode()
+            else:
+                status, body = '404 Not Found', b'Not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Error serving metrics: {e}")
+        finally:
+            writer.close()
+
+    async def start(self, host: Optional[str] = None, port: Optional[int] = None) -> None:
+        """Serve /metrics, by default on the configured host and port. Does nothing while metrics are disabled."""
+        if not self.enabled or self._server is not None:
+            return
+        settings = get_settings()
+        host = settings.METRICS_HOST if host is None else host
+        port = settings.METRICS_PORT if port is None else port
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Metrics available at http://{host}:{self.port}/metrics")
+
+    @property
+    def port(self) -> Optional[int]:
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+# Hot-path metrics shared across modules
+HANDLER_STAGE_SECONDS = metrics.histogram(
+    'moneybot_handler_stage_seconds', 'Time spent in each stage of handling a message', ('stage',)
+)
+PARSE_FAILURES = metrics.counter(
+    'moneybot_parse_failures_total', 'Messages or lines that could not be parsed, by reason', ('reason',)
+)
+DUPLICATES_SUPPRESSED = metrics.counter(
+    'moneybot_duplicates_suppressed_total', 'Redelivered updates and repeated transactions dropped, by reason', ('reason',)
+)
+SHEETS_REQUESTS = metrics.counter(
+    'moneybot_sheets_requests_total', 'Google Sheets requests by outcome', ('outcome',)
+)
+SHEETS_REQUEST_SECONDS = metrics.histogram(
+    'moneybot_sheets_request_seconds', 'Latency of Google Sheets requests that reached the network'
+)
@@ -1,32 +1,83 @@
 """
 Data models for the Money Tracker Bot
+
+Transactions are frozen, slotted dataclasses: no per-instance ``__dict__``
+and no accidental mutation once parsed. Amounts are exact ``Decimal``
+values; floats passed in (e.g. from JSON) are converted through their
+shortest repr, so ``50.25`` becomes ``Decimal('50.25')``. A Decimal is four
+times the size of a float, but people record the same few amounts over and
+over, so amounts parsed from text are cached and shared between
+transactions.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import lru_cache
+from typing import List, Tuple, Union
 
+# Distinct amounts kept by amount_from_text
+AMOUNT_CACHE_SIZE = 4096
 
-@dataclass
-class Expense:
-    amount: float
+
+@lru_cache(maxsize=AMOUNT_CACHE_SIZE)
+def amount_from_text(text: str) -> Decimal:
+    """Parse an amount as typed; repeated amounts share one Decimal.
+
+    Raises decimal.InvalidOperation if the text is not a number.
+    """
+    return Decimal(text)
+
+
+def to_amount(value: Union[Decimal, int, float, str]) -> Decimal:
+    """Convert a number or numeric string to an exact Decimal amount."""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return amount_from_text(repr(value))
+    if isinstance(value, str):
+        return amount_from_text(value)
+    return Decimal(value)
+
+
+class _Amount:
+    """Coerces ``amount`` to Decimal for transactions built from floats or strings."""
+    __slots__ = ()
+
+    def __post_init__(self):
+        if type(self.amount) is not Decimal:
+            object.__setattr__(self, 'amount', to_amount(self.amount))
+
+
+@dataclass(frozen=True, slots=True)
+class Expense(_Amount):
+    amount: Decimal
     category: str
     account: str
     name: str
     date: str
 
 
-@dataclass
-class Income:
-    amount: float
+@dataclass(frozen=True, slots=True)
+class Income(_Amount):
+    amount: Decimal
     category: str
     account: str
     name: str
     date: str
 
 
-@dataclass
-class Transfer:
-    amount: float
+@dataclass(frozen=True, slots=True)
+class Transfer(_Amount):
+    amount: Decimal
     from_account: str
     to_account: str
     description: str
     date: str
+
+
+@dataclass
+class BulkParseResult:
+    """Outcome of parsing a multi-line message, keyed by 1-based line number."""
+    transactions: List[Tuple[int, Union[Expense, Income, Transfer]]] = field(default_factory=list)
+    errors: List[Tuple[int, str, str]] = field(default_factory=list)  # (line, text, reason)
+    corrections: List[Tuple[int, str, str]] = field(default_factory=list)  # (line, as typed, canonical)
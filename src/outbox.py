@@ -0,0 +1,480 @@
+"""
+Durable outbox for Google Sheets delivery in the Money Tracker Bot
+
+Every transaction is written to a local SQLite outbox before the user gets
+a reply. A background drainer delivers queued payloads through the batcher
+and retries failures with exponential backoff and jitter, so nothing is lost
+when Apps Script times out, hits its quota or the bot restarts.
+
+Payloads the script refuses are not retried forever: a row it reports as
+invalid becomes a dead letter at once, and so does a payload whose request
+is still refused after ``max_attempts`` attempts. Dead letters stay in the outbox file with their
+last error, are never sent again and are counted separately from pending
+entries. Timeouts and outages are retried for as long as they last, as
+the data itself is fine.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from models import Expense, Income, Transfer
+from codec import dumps, loads
+from batcher import SheetsBatcher, get_sheets_batcher
+from sheets import FAILED, INVALID, Delivery
+from tenants import SheetsEndpoints, get_sheets_endpoints
+from config import get_settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+Transaction = Union[Expense, Income, Transfer]
+# (row id, idempotency key, payload, attempts, endpoint or None for the default)
+OutboxEntry = Tuple[int, str, Dict[str, Any], int, Optional[str]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    endpoint TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT,
+    dead_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_next_attempt ON outbox (next_attempt_at);
+"""
+
+# Entries are fetched from disk in chunks of this size
+FETCH_CHUNK = 500
+
+
+class Outbox:
+    """SQLite-backed queue of Sheets payloads with a retrying drainer.
+
+    All database work runs on a single dedicated thread, so the event loop is
+    never blocked on disk I/O and SQLite sees one writer at a time.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        batcher: Optional[SheetsBatcher] = None,
+        endpoints: Optional[SheetsEndpoints] = None,
+        max_in_flight: Optional[int] = None,
+        max_in_flight_per_endpoint: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        lease: Optional[float] = None
+    ):
+        settings = get_settings()
+        if max_in_flight is None:
+            max_in_flight = settings.OUTBOX_MAX_IN_FLIGHT
+        if max_in_flight_per_endpoint is None:
+            max_in_flight_per_endpoint = settings.OUTBOX_MAX_IN_FLIGHT_PER_ENDPOINT
+        if base_delay is None:
+            base_delay = settings.OUTBOX_RETRY_BASE_DELAY
+        if max_delay is None:
+            max_delay = settings.OUTBOX_RETRY_MAX_DELAY
+        if max_attempts is None:
+            max_attempts = settings.OUTBOX_MAX_ATTEMPTS
+        if lease is None:
+            lease = settings.SHEETS_TIMEOUT * 3
+        self.path = settings.OUTBOX_PATH if path is None else path
+        self.batcher = get_sheets_batcher() if batcher is None else batcher
+        self.endpoints = endpoints  # Routes tenant payloads to their own endpoint
+        self.max_in_flight = max(1, max_in_flight)
+        # A slow endpoint can hold at most this many slots, leaving the rest to other tenants
+        self.max_in_flight_per_endpoint = max(1, min(max_in_flight_per_endpoint, self.max_in_flight))
+        self._in_flight: Dict[str, int] = {}  # Endpoint ('' for the default) -> deliveries running
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max(1, max_attempts)
+        self.lease = lease  # Claimed entries are not picked up again for this long
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outbox-db')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._deliveries: Dict[asyncio.Task, int] = {}  # Running delivery -> its row id
+        self._wakeup: Optional[asyncio.Event] = None
+        self._drainer: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # Database access (runs on the outbox thread)
+    # ------------------------------------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+            if 'endpoint' not in columns:
+                # Outbox files created before multi-tenant routing
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN endpoint TEXT")
+            for column in ('last_error TEXT', 'dead_at REAL'):
+                if column.split()[0] not in columns:
+                    # Outbox files created before dead letters
+                    self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {column}")
+        return self._conn
+
+    def _db_insert(self, payloads: List[Dict[str, Any]], endpoint: Optional[str]) -> None:
+        now = time.time()
+        conn = self._db()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, payload, endpoint, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(p['idempotency_key'], dumps(p).decode(), endpoint, now, now) for p in payloads]
+            )
+
+    @staticmethod
+    def _excluding(saturated: List[str]) -> str:
+        if not saturated:
+            return ""
+        return f" AND COALESCE(endpoint, '') NOT IN ({', '.join('?' * len(saturated))})"
+
+    def _db_claim_due(self, limit: int, in_flight: Dict[str, int]) -> List[OutboxEntry]:
+        now = time.time()
+        cap = self.max_in_flight_per_endpoint
+        saturated = [endpoint for endpoint, count in in_flight.items() if count >= cap]
+        conn = self._db()
+        with conn:
+            selected = conn.execute(
+                "SELECT id, idempotency_key, payload, attempts, endpoint, next_attempt_at > created_at FROM outbox "
+                "WHERE next_attempt_at <= ? AND dead_at IS NULL" + self._excluding(saturated) +
+                " ORDER BY next_attempt_at, id LIMIT ?",
+                (now, *saturated, limit)
+            ).fetchall()
+            # Only claim up to each endpoint's remaining share; the rest stay due
+            rows, claimed = [], dict(in_flight)
+            for row in selected:
+                endpoint = row[4] or ''
+                if claimed.get(endpoint, 0) < cap:
+                    claimed[endpoint] = claimed.get(endpoint, 0) + 1
+                    rows.append(row)
+            conn.executemany(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                [(now + self.lease, row[0]) for row in rows]
+            )
+        return [(row_id, key, self._marked(loads(payload), attempts or sent_before), attempts, endpoint)
+                for row_id, key, payload, attempts, endpoint, sent_before in rows]
+
+    @staticmethod
+    def _marked(payload: Dict[str, Any], redelivery: bool) -> Dict[str, Any]:
+        """Flag a payload that may have reached the spreadsheet before.
+
+        An entry was sent before if an attempt failed or it was claimed and
+        released (or its lease ran out), which moves next_attempt_at past
+        created_at. Only flagged payloads make the Apps Script look for their
+        key in the sheet, so first deliveries stay cheap.
+        """
+        if redelivery:
+            payload['retry'] = True
+        return payload
+
+    def _db_delete(self, row_id: int) -> None:
+        conn = self._db()
+        with conn:
+            conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    def _db_reschedule(self, row_id: int, attempts: int, next_attempt_at: float, error: str) -> None:
+        conn = self._db()
+        with conn:
+            conn.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, next_attempt_at, error, row_id)
+            )
+
+    def _db_bury(self, row_id: int, attempts: int, error: str) -> None:
+        """Turn an entry into a dead letter: kept on disk, never sent again."""
+        conn = self._db()
+        with conn:
+            conn.execute(
+                "UPDATE outbox SET attempts = ?, last_error = ?, dead_at = ? WHERE id = ?",
+                (attempts, error, time.time(), row_id)
+            )
+
+    def _db_next_due(self, saturated: List[str]) -> Optional[float]:
+        row = self._db().execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE dead_at IS NULL" + self._excluding(saturated), saturated
+        ).fetchone()
+        return row[0] if row else None
+
+    def _db_release(self, row_ids: List[int]) -> None:
+        """Make claimed entries due again, so the next start delivers them right away."""
+        now = time.time()
+        conn = self._db()
+        with conn:
+            conn.executemany("UPDATE outbox SET next_attempt_at = ? WHERE id = ?", [(now, row_id) for row_id in row_ids])
+
+    def _db_has_due(self) -> bool:
+        return self._db().execute(
+            "SELECT 1 FROM outbox WHERE next_attempt_at <= ? AND dead_at IS NULL LIMIT 1", (time.time(),)
+        ).fetchone() is not None
+
+    def _db_count(self, dead: bool = False) -> int:
+        condition = "dead_at IS NOT NULL" if dead else "dead_at IS NULL"
+        return self._db().execute(f"SELECT COUNT(*) FROM outbox WHERE {condition}").fetchone()[0]
+
+    def _db_pending_keys(self) -> Set[str]:
+        return {key for key, in self._db().execute("SELECT idempotency_key FROM outbox WHERE dead_at IS NULL")}
+
+    def _db_close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run_db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._drainer is not None and not self._drainer.done()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of deliveries currently running."""
+        return len(self._deliveries)
+
+    async def put(self, transaction: Transaction) -> str:
+        """Durably queue a transaction for delivery. Returns its idempotency key."""
+        keys = await self.put_many([transaction])
+        return keys[0]
+
+    async def put_many(self, transactions: List[Transaction], track: bool = True,
+                       endpoint: Optional[str] = None) -> List[str]:
+        """Durably queue several transactions in one disk write."""
+        payloads = [self.batcher.sheets.prepare_payload(t) for t in transactions]
+        return await self.put_payloads(payloads, track, endpoint)
+
+    async def put_payloads(self, payloads: List[Dict[str, Any]], track: bool = True,
+                           endpoint: Optional[str] = None) -> List[str]:
+        """Durably queue prepared payloads. Returns their idempotency keys.
+
+        With ``track`` the first delivery attempt can be awaited via
+        :meth:`wait_for`; bulk producers that never wait should pass False.
+        ``endpoint`` routes them to a tenant's spreadsheet instead of the
+        default one.
+        """
+        if not payloads:
+            return []
+        keys = [p['idempotency_key'] for p in payloads]
+        if track:
+            loop = asyncio.get_running_loop()
+            for key in keys:
+                self._waiters[key] = loop.create_future()
+        await self._run_db(self._db_insert, payloads, endpoint)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return keys
+
+    async def wait_for(self, key: str) -> bool:
+        """Wait for the first delivery attempt of a queued payload.
+
+        Returns True once it is in the spreadsheet, False if the attempt failed
+        and the payload stays queued for a retry.
+        """
+        future = self._waiters.get(key)
+        if future is None or not self.running:
+            return False
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._waiters.pop(key, None)
+
+    async def pending(self) -> int:
+        """Number of payloads still waiting for delivery; dead letters are not counted."""
+        return await self._run_db(self._db_count)
+
+    async def pending_keys(self) -> Set[str]:
+        """Idempotency keys of the payloads still waiting for delivery."""
+        return await self._run_db(self._db_pending_keys)
+
+    async def dead_letters(self) -> int:
+        """Number of payloads given up on because the script refused them."""
+        return await self._run_db(self._db_count, True)
+
+    async def start(self) -> None:
+        """Open the outbox and start the drainer. Called on application startup."""
+        if self.running:
+            return
+        await self._run_db(self._db)
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()  # Deliver whatever survived the last run
+        self._drainer = asyncio.create_task(self._drain(), name='outbox-drainer')
+        logger.info(f"Outbox started ({await self.pending()} pending, path={self.path})")
+
+    async def flush(self, timeout: float) -> bool:
+        """Deliver everything that is due, for at most ``timeout`` seconds.
+
+        Entries waiting for a retry are not waited for. Returns True if
+        nothing due is left undelivered.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.running:
+            if self._deliveries:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                await asyncio.wait(list(self._deliveries), timeout=remaining)
+            elif await self._run_db(self._db_has_due):
+                if loop.time() >= deadline:
+                    return False
+                self._wakeup.set()
+                await asyncio.sleep(0.01)  # Let the drainer claim them
+            else:
+                return True
+        return not self._deliveries
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the drainer and close the database. Undelivered payloads stay on disk.
+
+        Without a timeout, deliveries already running are awaited. With one,
+        everything due is delivered first, and deliveries still running when
+        it expires are cancelled and made due again, so the next start sends
+        them straight away.
+        """
+        if timeout is not None and self.running:
+            if not await self.flush(timeout):
+                logger.warning(f"Outbox not drained within {timeout:.1f}s, the rest is delivered on the next start")
+        if self._drainer is not None:
+            self._drainer.cancel()
+            try:
+                await self._drainer
+            except asyncio.CancelledError:
+                pass
+            self._drainer = None
+        if self._deliveries:
+            deliveries = list(self._deliveries.items())
+            if timeout is not None:
+                for task, _ in deliveries:
+                    task.cancel()
+            await asyncio.gather(*(task for task, _ in deliveries), return_exceptions=True)
+            unfinished = [row_id for task, row_id in deliveries if task.cancelled()]
+            if unfinished:
+                await self._run_db(self._db_release, unfinished)
+        for future in self._waiters.values():
+            if not future.done():
+                future.set_result(False)
+        self._waiters.clear()
+        left = await self.pending() if self._conn is not None else 0
+        await self._run_db(self._db_close)
+        logger.info(f"Outbox stopped ({left} pending)")
+
+    # ------------------------------------------------------------------
+    # Drainer
+    # ------------------------------------------------------------------
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with jitter for the given number of failed attempts."""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _batcher_for(self, endpoint: Optional[str]) -> SheetsBatcher:
+        if endpoint is None or self.endpoints is None:
+            return self.batcher
+        return await self.endpoints.batcher_for(endpoint)
+
+    async def _deliver(self, entry: OutboxEntry) -> None:
+        row_id, key, payload, attempts, endpoint = entry
+        try:
+            batcher = await self._batcher_for(endpoint)
+            delivery = await batcher.deliver(payload)
+        except Exception as e:
+            logger.error("Error delivering outbox entry %s: %s", row_id, e)
+            delivery = Delivery(FAILED, str(e))
+        finally:
+            self._in_flight[endpoint or ''] -= 1
+            if not self._in_flight[endpoint or '']:
+                del self._in_flight[endpoint or '']
+
+        if delivery.saved:
+            await self._run_db(self._db_delete, row_id)
+        else:
+            attempts += 1
+            # An outage says nothing about the payload, so only refusals use up attempts
+            if delivery.outcome == INVALID or (delivery.outcome != FAILED and attempts >= self.max_attempts):
+                logger.error("Outbox entry %s refused after %d attempt(s), giving up: %s", row_id, attempts, delivery.error)
+                await self._run_db(self._db_bury, row_id, attempts, delivery.error)
+            else:
+                delay = self._backoff(attempts)
+                logger.warning("Outbox entry %s failed (attempt %d), retrying in %.1fs", row_id, attempts, delay)
+                await self._run_db(self._db_reschedule, row_id, attempts, time.time() + delay, delivery.error)
+
+        future = self._waiters.get(key)
+        if future is not None and not future.done():
+            future.set_result(delivery.saved)
+
+    def _on_delivery_done(self, task: asyncio.Task) -> None:
+        self._deliveries.pop(task, None)
+        self._wakeup.set()  # A slot is free again
+
+    async def _drain(self) -> None:
+        """Claim due entries and deliver them, keeping at most max_in_flight in flight."""
+        while True:
+            # Cleared before any await, so wakeups during this pass are not lost
+            self._wakeup.clear()
+            free = self.max_in_flight - len(self._deliveries)
+            entries = await self._run_db(
+                self._db_claim_due, min(free, FETCH_CHUNK), dict(self._in_flight)
+            ) if free > 0 else []
+
+            for entry in entries:
+                endpoint = entry[4] or ''
+                self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+                task = asyncio.create_task(self._deliver(entry))
+                self._deliveries[task] = entry[0]
+                task.add_done_callback(self._on_delivery_done)
+
+            if len(entries) == FETCH_CHUNK:
+                continue  # More are probably due right now
+
+            # Sleep until new entries arrive, a delivery finishes or a retry is due
+            if len(self._deliveries) >= self.max_in_flight:
+                timeout = None
+            else:
+                saturated = [endpoint for endpoint, count in self._in_flight.items()
+                             if count >= self.max_in_flight_per_endpoint]
+                next_due = await self._run_db(self._db_next_due, saturated)
+                timeout = None if next_due is None else max(0.0, next_due - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global instance, built on first use
+_outbox: Optional[Outbox] = None
+
+
+def get_outbox() -> Outbox:
+    """The outbox routing through every tenant endpoint; later calls return the same object."""
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox(endpoints=get_sheets_endpoints())
+    return _outbox
+
+
+def __getattr__(name: str):
+    # Keeps ``from outbox import outbox`` working without building it at import
+    if name == 'outbox':
+        return get_outbox()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,81 +1,289 @@
 """
 Parser for finance messages in the Money Tracker Bot
+
+Messages are split into fields by a small tokenizer instead of one regex
+per transaction type. The old patterns ended in a lazy ``(.+?)`` followed by
+an optional ``\\s+@date`` and ``$``, which backtracks quadratically over long
+runs of whitespace. Here the fixed-width head (sign, amount and the
+space-free fields) is matched by patterns in which whitespace and
+non-whitespace runs simply alternate, and the free-text tail and optional
+date are cut off with plain string operations, so parsing is linear in the
+length of the message. Messages longer than ``MAX_MESSAGE_LENGTH`` are
+rejected outright.
 """
 
 import re
 from datetime import datetime
-from typing import Optional, Union
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional, Tuple, Union
+
+from models import Expense, Income, Transfer, BulkParseResult, amount_from_text
+from resolver import Correction, Resolver, UnknownNameError
+
+# Telegram caps a message at 4096 characters; anything longer is not a transaction
+MAX_MESSAGE_LENGTH = 4096
+
+# Fields before the free text. Every quantifier is followed by a disjoint
+# character class, so a failed match gives up after a single pass.
+_AMOUNT = r'\s*(\d+(?:\.\d{2})?)\s+'
+_EXPENSE_HEAD = re.compile(r'-' + _AMOUNT + r'(\S+)\s+(\S+)\s+')
+_INCOME_HEAD = re.compile(r'\+' + _AMOUNT + r'(\S+)\s+(\S+)\s+')
+_TRANSFER_HEAD = re.compile(r't' + _AMOUNT)
+_WORD = re.compile(r'\S+')
+_SPACE = re.compile(r'\s*')
+# " @YYYY-MM-DD", matched only at its fixed offset from the end of the text
+_DATE_SUFFIX = re.compile(r'\s@(\d{4}-\d{2}-\d{2})\Z')
+_DATE_SUFFIX_LENGTH = 12
+
+# (amount, category or from_account, account or to_account, name or description, date)
+Fields = Tuple[str, str, str, Optional[str], Optional[str]]
+
+
+def _positive_amount(text: str) -> Decimal:
+    """Parse a matched amount, refusing zero: a transaction of nothing is a typo.
+
+    Raises ValueError for a zero amount.
+    """
+    amount = amount_from_text(text)
+    if not amount:
+        raise ValueError(f"Amount must be greater than zero: {text}")
+    return amount
+
+
+def _split_date(text: str) -> Optional[Tuple[str, Optional[str]]]:
+    """Split free text into (text, date) at an optional trailing ``@YYYY-MM-DD``.
+
+    ``text`` starts with a non-space character. Returns None when the text
+    is empty or spans several lines, as free text stays on one line.
+    """
+    date = None
+    start = len(text) - _DATE_SUFFIX_LENGTH
+    match = _DATE_SUFFIX.match(text, start) if start > 0 else None
+    if match:
+        text, date = text[:start].rstrip(), match.group(1)
+    if not text or '\n' in text:
+        return None
+    return text, date
+
+
+def _entry_fields(head: 're.Pattern[str]', text: str) -> Optional[Fields]:
+    """Fields of an expense or income line: amount, category, account, name, date."""
+    match = head.match(text)
+    if not match:
+        return None
+    tail = _split_date(text[match.end():])
+    if tail is None:
+        return None
+    return (*match.groups(), *tail)
+
+
+def _transfer_tail(text: str, position: int) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """Description and date after the destination account ending at ``position``."""
+    if position == len(text):
+        return None, None
+    return _split_date(text[position:].lstrip())
+
+
+def _transfer_fields(text: str) -> Optional[Fields]:
+    """Fields of a transfer line: amount, from_account, to_account, description, date.
+
+    The source account is the longest prefix of the first word that is
+    followed by ``>`` and a destination account, so ``a>b > c`` moves money
+    from ``a>b`` to ``c`` while ``a>b`` alone moves it from ``a`` to ``b``.
+    Only three splits can be that longest prefix, tried in this order: the
+    whole word followed by a separate ``>``, the word minus a trailing ``>``,
+    and the word up to its rightmost inner ``>``. Splits further left end
+    their destination where that last one does, so they share its tail and
+    cannot succeed where it failed.
+    """
+    head = _TRANSFER_HEAD.match(text)
+    if not head:
+        return None
+    start = head.end()
+    first = _WORD.match(text, start)
+    if not first:
+        return None
+    end = first.end()
 
-from models import Expense, Income, Transfer
+    arrow = _SPACE.match(text, end).end()
+    if text.startswith('>', arrow):
+        target = _WORD.match(text, _SPACE.match(text, arrow + 1).end())
+        tail = _transfer_tail(text, target.end()) if target else None
+        if tail:
+            return (head.group(1), text[start:end], target.group(), *tail)
+
+    if end - start > 1 and text[end - 1] == '>':
+        target = _WORD.match(text, arrow)
+        tail = _transfer_tail(text, target.end()) if target else None
+        if tail:
+            return (head.group(1), text[start:end - 1], target.group(), *tail)
+
+    split = text.rfind('>', start + 1, end - 1)
+    if split != -1:
+        tail = _transfer_tail(text, end)
+        if tail:
+            return (head.group(1), text[start:split], text[split + 1:end], *tail)
+    return None
 
 
 class FinanceParser:
-    """Parser for finance messages."""
-    
-    def __init__(self):
-        # Regex patterns for different transaction types
-        self.expense_pattern = r'^-\s*(\d+(?:\.\d{2})?)\s+(\S+)\s+(\S+)\s+(.+?)(?:\s+@(\d{4}-\d{2}-\d{2}))?$'
-        self.income_pattern = r'^\+\s*(\d+(?:\.\d{2})?)\s+(\S+)\s+(\S+)\s+(.+?)(?:\s+@(\d{4}-\d{2}-\d{2}))?$'
-        self.transfer_pattern = r'^t\s*(\d+(?:\.\d{2})?)\s+(\S+)\s*>\s*(\S+)(?:\s+(.+?))?(?:\s+@(\d{4}-\d{2}-\d{2}))?$'
-    
+    """Parser for finance messages.
+
+    With a resolver, categories and accounts are mapped to their canonical
+    names by ``parse_with_corrections`` and ``parse_bulk``; names that do
+    not resolve raise UnknownNameError (or become a bulk error line). A
+    zero amount raises ValueError (or becomes a bulk error line).
+    """
+
+    def __init__(self, max_length: int = MAX_MESSAGE_LENGTH, resolver: Optional[Resolver] = None):
+        self.max_length = max_length
+        self.resolver = resolver
+
     def get_today_date(self) -> str:
         """Get today's date in YYYY-MM-DD format."""
         return datetime.now().strftime('%Y-%m-%d')
-    
+
     def parse_expense(self, text: str) -> Optional[Expense]:
         """Parse expense message format: - <amount> <category> <account> <name> [@YYYY-MM-DD]"""
-        match = re.match(self.expense_pattern, text.strip())
-        if match:
-            amount, category, account, name, date = match.groups()
+        text = text.strip()
+        fields = _entry_fields(_EXPENSE_HEAD, text) if len(text) <= self.max_length else None
+        if fields:
+            amount, category, account, name, date = fields
             return Expense(
-                amount=float(amount),
+                amount=_positive_amount(amount),
                 category=category,
                 account=account,
-                name=name.strip(),
+                name=name,
                 date=date if date else self.get_today_date()
             )
         return None
-    
+
     def parse_income(self, text: str) -> Optional[Income]:
         """Parse income message format: + <amount> <category> <account> <name> [@YYYY-MM-DD]"""
-        match = re.match(self.income_pattern, text.strip())
-        if match:
-            amount, category, account, name, date = match.groups()
+        text = text.strip()
+        fields = _entry_fields(_INCOME_HEAD, text) if len(text) <= self.max_length else None
+        if fields:
+            amount, category, account, name, date = fields
             return Income(
-                amount=float(amount),
+                amount=_positive_amount(amount),
                 category=category,
                 account=account,
-                name=name.strip(),
+                name=name,
                 date=date if date else self.get_today_date()
             )
         return None
-    
+
     def parse_transfer(self, text: str) -> Optional[Transfer]:
         """Parse transfer message format: t <amount> <from_account> > <to_account> [description] [@YYYY-MM-DD]"""
-        match = re.match(self.transfer_pattern, text.strip())
-        if match:
-            amount, from_account, to_account, description, date = match.groups()
+        text = text.strip()
+        fields = _transfer_fields(text) if len(text) <= self.max_length else None
+        if fields:
+            amount, from_account, to_account, description, date = fields
             return Transfer(
-                amount=float(amount),
+                amount=_positive_amount(amount),
                 from_account=from_account,
                 to_account=to_account,
-                description=description.strip() if description else "",
+                description=description or "",
                 date=date if date else self.get_today_date()
             )
         return None
-    
+
     def parse_message(self, text: str) -> Optional[Union[Expense, Income, Transfer]]:
         """Parse any supported message format."""
+        text = text.strip()
+
         # Try to parse as expense
-        if text.strip().startswith('-'):
+        if text.startswith('-'):
             return self.parse_expense(text)
-        
+
         # Try to parse as income
-        elif text.strip().startswith('+'):
+        elif text.startswith('+'):
             return self.parse_income(text)
-        
+
         # Try to parse as transfer
-        elif text.strip().startswith('t '):
+        elif text.startswith('t '):
             return self.parse_transfer(text)
-        
+
         return None
+
+    def parse_with_corrections(
+        self, text: str, resolver: Optional[Resolver] = None
+    ) -> Tuple[Optional[Union[Expense, Income, Transfer]], List[Correction]]:
+        """Parse a message and resolve its names, returning the names that were corrected.
+
+        ``resolver`` overrides the parser's own, e.g. with a tenant's lists.
+        Raises UnknownNameError if a category or account does not resolve.
+        """
+        transaction = self.parse_message(text)
+        resolver = resolver or self.resolver
+        if transaction is None or resolver is None:
+            return transaction, []
+        return resolver.apply(transaction)
+
+    def parse_bulk(self, text: str, resolver: Optional[Resolver] = None) -> BulkParseResult:
+        """Parse a message with one transaction per line in a single pass.
+
+        Blank lines are skipped. Every other line ends up either in
+        ``transactions`` or in ``errors``, tagged with its 1-based line number.
+        Names changed by the resolver are listed in ``corrections``.
+        """
+        result = BulkParseResult()
+        resolver = resolver or self.resolver
+        today = self.get_today_date()
+        tokenizers = {
+            '-': (lambda line: _entry_fields(_EXPENSE_HEAD, line), Expense),
+            '+': (lambda line: _entry_fields(_INCOME_HEAD, line), Income),
+            't ': (_transfer_fields, Transfer),
+        }
+
+        for line_number, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+            if len(line) > self.max_length:
+                result.errors.append((line_number, line[:50], f"Line too long (max {self.max_length} characters)"))
+                continue
+
+            entry = tokenizers.get(line[:2] if line[0] == 't' else line[0])
+            fields = entry[0](line) if entry else None
+            if not fields:
+                result.errors.append((line_number, line, "Invalid format"))
+                continue
+
+            amount, first, second, name, date = fields
+            try:
+                amount = _positive_amount(amount)
+            except InvalidOperation:
+                result.errors.append((line_number, line, f"Invalid amount: {amount}"))
+                continue
+            except ValueError as e:
+                result.errors.append((line_number, line, str(e)))
+                continue
+
+            model = entry[1]
+            if model is Transfer:
+                transaction = Transfer(
+                    amount=amount,
+                    from_account=first,
+                    to_account=second,
+                    description=name or "",
+                    date=date or today
+                )
+            else:
+                transaction = model(
+                    amount=amount,
+                    category=first,
+                    account=second,
+                    name=name,
+                    date=date or today
+                )
+            if resolver is not None:
+                try:
+                    transaction, corrections = resolver.apply(transaction)
+                except UnknownNameError as e:
+                    result.errors.append((line_number, line, str(e)))
+                    continue
+                result.corrections.extend((line_number, given, value) for given, value in corrections)
+            result.transactions.append((line_number, transaction))
+
+        return result
@@ -0,0 +1,476 @@
+"""
+Recurring transactions for the Money Tracker Bot
+
+``/recurring add <schedule> <transaction>`` stores a rule in a local SQLite
+file. Schedules are five-field cron expressions (minute, hour, day of month,
+month, day of week) or one of the @hourly, @daily, @weekly, @monthly and
+@yearly shortcuts, in the bot's local time. The transaction is written in
+the usual message formats and is dated the day it fires.
+
+A single scheduler task serves every rule from a heap ordered by the next
+run time, so it only ever sleeps until the earliest rule is due, however
+many rules there are. Rules that come due together are queued with one
+outbox write per spreadsheet and go out as bulk appends. Every firing has
+a deterministic idempotency key, and a rule's next run time only moves on
+once its transaction is queued, so a firing missed while the bot was down
+is caught up once on start and never recorded twice.
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, timedelta
+from decimal import InvalidOperation
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+
+from models import Expense, Income, Transfer
+from parser import FinanceParser
+from resolver import UnknownNameError
+from codec import to_payload
+from outbox import Outbox, get_outbox
+from ledger import Ledger, get_ledger
+from aggregates import AggregateEngine, aggregates
+from budgets import BudgetAlert, BudgetBook, get_budget_book
+from tenants import Tenant, TenantRegistry, get_tenant_registry
+from config import DATE_FORMAT, get_settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+Transaction = Union[Expense, Income, Transfer]
+Notify = Callable[[int, List[Transaction], List[BudgetAlert]], Awaitable[None]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER,
+    schedule TEXT NOT NULL,
+    line TEXT NOT NULL,
+    next_run_at REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rules_chat ON rules (chat_id);
+"""
+
+CRON_SHORTCUTS = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+}
+# (low, high) of minute, hour, day of month, month and day of week (0 and 7 are Sunday)
+CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# Schedules are searched this far ahead, enough to reach any 29 February
+MAX_LOOKAHEAD_DAYS = 8 * 366
+
+# Rules one chat may have
+MAX_RULES_PER_CHAT = 100
+# The scheduler wakes at least this often, so clock changes are noticed
+MAX_SLEEP = 60.0
+# Seconds before firing again after the rules could not be queued
+RETRY_DELAY = 30.0
+
+
+def _parse_cron_field(text: str, low: int, high: int) -> FrozenSet[int]:
+    values: Set[int] = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"invalid step in '{text}'")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(bound) for bound in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"'{text}' is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    """A cron expression, evaluated in local time."""
+    expression: str
+    minutes: Tuple[int, ...]
+    hours: Tuple[int, ...]
+    days: FrozenSet[int]
+    months: FrozenSet[int]
+    weekdays: FrozenSet[int]  # 0 is Sunday
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> 'CronSchedule':
+        """Parse five cron fields or a shortcut such as @monthly. Raises ValueError."""
+        expression = ' '.join(expression.split())
+        fields = CRON_SHORTCUTS.get(expression.lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError("a schedule has five fields (minute hour day month weekday) or is a shortcut like @monthly")
+        try:
+            minutes, hours, days, months, weekdays = (
+                _parse_cron_field(text, low, high) for text, (low, high) in zip(fields, CRON_RANGES)
+            )
+        except ValueError as e:
+            raise ValueError(f"invalid schedule '{expression}': {e}") from None
+        schedule = cls(
+            expression=expression,
+            minutes=tuple(sorted(minutes)),
+            hours=tuple(sorted(hours)),
+            days=days,
+            months=months,
+            weekdays=frozenset(day % 7 for day in weekdays),
+            any_day=fields[2] == '*',
+            any_weekday=fields[4] == '*',
+        )
+        schedule.next_after(datetime.now())  # Rejects schedules that never fire, such as 30 February
+        return schedule
+
+    def _matches_day(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        in_month = day.day in self.days
+        in_week = day.isoweekday() % 7 in self.weekdays
+        # As in cron, a restricted day of month and day of week match when either does
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First time strictly after ``moment`` the schedule fires."""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if self._matches_day(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"schedule '{self.expression}' never fires")
+
+
+@dataclass
+class RecurringRule:
+    rule_id: int
+    chat_id: int
+    user_id: Optional[int]
+    schedule: CronSchedule
+    line: str
+    next_run_at: float  # When the rule fires next; its idempotency key is derived from it
+    wake_at: float = field(default=0.0, compare=False)  # Its current entry in the timer heap
+
+    @property
+    def key(self) -> str:
+        """Idempotency key of the next firing."""
+        return f"recurring-{self.rule_id}-{int(self.next_run_at)}"
+
+
+class RecurringScheduler:
+    """Stores recurring rules and fires them from a single timer heap.
+
+    Like the outbox and the ledger, all database work runs on one dedicated
+    thread so the event loop never waits on disk I/O.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        outbox: Optional[Outbox] = None,
+        ledger: Optional[Ledger] = None,
+        aggregates: AggregateEngine = aggregates,
+        budgets: Optional[BudgetBook] = None,
+        registry: Optional[TenantRegistry] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.path = get_settings().RECURRING_PATH if path is None else path
+        self.outbox = get_outbox() if outbox is None else outbox
+        self.ledger = get_ledger() if ledger is None else ledger
+        self.aggregates = aggregates
+        self.budgets = get_budget_book() if budgets is None else budgets
+        self.registry = get_tenant_registry() if registry is None else registry
+        self.clock = clock
+        self.parser = FinanceParser()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recurring-db')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._rules: Dict[int, RecurringRule] = {}
+        self._by_chat: Dict[int, Set[int]] = defaultdict(set)
+        self._heap: List[Tuple[float, int]] = []  # (wake_at, rule_id); stale entries are skipped
+        self._notify: Optional[Notify] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.fired = 0
+
+    # ------------------------------------------------------------------
+    # Database access (runs on the recurring thread)
+    # ------------------------------------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _db_load(self) -> List[Tuple]:
+        return self._db().execute(
+            "SELECT id, chat_id, user_id, schedule, line, next_run_at FROM rules"
+        ).fetchall()
+
+    def _db_insert(self, chat_id: int, user_id: Optional[int], schedule: str, line: str, next_run_at: float) -> int:
+        conn = self._db()
+        with conn:
+            return conn.execute(
+                "INSERT INTO rules (chat_id, user_id, schedule, line, next_run_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (chat_id, user_id, schedule, line, next_run_at, time.time())
+            ).lastrowid
+
+    def _db_delete(self, rule_id: int) -> None:
+        conn = self._db()
+        with conn:
+            conn.execute("DELETE FROM rules WHERE id = ?", (rule_id,))
+
+    def _db_set_next_runs(self, updates: List[Tuple[float, int]]) -> None:
+        conn = self._db()
+        with conn:
+            conn.executemany("UPDATE rules SET next_run_at = ? WHERE id = ?", updates)
+
+    def _db_close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run_db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ------------------------------------------------------------------
+    # Rules
+    # ------------------------------------------------------------------
+
+    def _schedule(self, rule: RecurringRule, wake_at: float) -> None:
+        rule.wake_at = wake_at
+        heapq.heappush(self._heap, (wake_at, rule.rule_id))
+        if self._wakeup is not None and self._heap[0][1] == rule.rule_id:
+            self._wakeup.set()  # Now the earliest rule
+
+    def _next_run(self, schedule: CronSchedule, after: float) -> float:
+        return schedule.next_after(datetime.fromtimestamp(after)).timestamp()
+
+    def rules_for(self, chat_id: int) -> List[RecurringRule]:
+        """A chat's rules, in the order they were added."""
+        return sorted((self._rules[rule_id] for rule_id in self._by_chat.get(chat_id, ())), key=lambda r: r.rule_id)
+
+    @property
+    def count(self) -> int:
+        return len(self._rules)
+
+    async def add(self, chat_id: int, user_id: Optional[int], schedule: str, line: str) -> RecurringRule:
+        """Store a rule. Raises ValueError for an invalid schedule or when the chat has too many rules.
+
+        The line is not parsed here; handlers validate it against the chat's
+        tenant before adding it.
+        """
+        cron = CronSchedule.parse(schedule)
+        if len(self._by_chat.get(chat_id, ())) >= MAX_RULES_PER_CHAT:
+            raise ValueError(f"a chat can have at most {MAX_RULES_PER_CHAT} recurring transactions")
+        next_run_at = self._next_run(cron, self.clock())
+        rule_id = await self._run_db(self._db_insert, chat_id, user_id, cron.expression, line, next_run_at)
+        rule = RecurringRule(rule_id, chat_id, user_id, cron, line, next_run_at)
+        self._rules[rule_id] = rule
+        self._by_chat[chat_id].add(rule_id)
+        self._schedule(rule, next_run_at)
+        return rule
+
+    async def remove(self, chat_id: int, rule_id: int) -> bool:
+        """Delete one of a chat's rules. Returns False if the chat has no such rule."""
+        rule = self._rules.get(rule_id)
+        if rule is None or rule.chat_id != chat_id:
+            return False
+        await self._run_db(self._db_delete, rule_id)
+        del self._rules[rule_id]
+        self._by_chat[chat_id].discard(rule_id)
+        return True  # Its heap entry is skipped when it comes up
+
+    # ------------------------------------------------------------------
+    # Firing
+    # ------------------------------------------------------------------
+
+    def _transaction_for(self, rule: RecurringRule, tenant: Tenant) -> Optional[Transaction]:
+        try:
+            transaction, _ = self.parser.parse_with_corrections(rule.line, tenant.resolver)
+        except (UnknownNameError, ValueError, InvalidOperation) as e:
+            logger.warning(f"Recurring rule {rule.rule_id} no longer parses: {e}")
+            return None
+        if transaction is None:
+            logger.warning(f"Recurring rule {rule.rule_id} no longer parses")
+            return None
+        return replace(transaction, date=datetime.fromtimestamp(rule.next_run_at).strftime(DATE_FORMAT))
+
+    async def fire(self, rules: List[RecurringRule]) -> None:
+        """Record one transaction per rule and move each rule to its next run.
+
+        All payloads for a spreadsheet are queued in one outbox write, so
+        the batcher sends them as bulk appends. A rule whose next run was
+        missed (the bot was down) fires once and then moves past now.
+        """
+        timestamp = datetime.now().isoformat()
+        payloads: Dict[Optional[str], List[dict]] = defaultdict(list)
+        by_chat: Dict[int, List[Tuple[Transaction, str]]] = defaultdict(list)
+        for rule in rules:
+            tenant = self.registry.resolve(rule.chat_id, rule.user_id)
+            transaction = self._transaction_for(rule, tenant)
+            if transaction is None:
+                continue
+            payloads[tenant.endpoint].append({**to_payload(transaction, timestamp), 'idempotency_key': rule.key})
+            by_chat[rule.chat_id].append((transaction, rule.key))
+
+        for endpoint, endpoint_payloads in payloads.items():
+            await self.outbox.put_payloads(endpoint_payloads, track=False, endpoint=endpoint)
+        recorded: Dict[int, List[Transaction]] = {}
+        alerts: Dict[int, List[BudgetAlert]] = defaultdict(list)
+        for chat_id, entries in by_chat.items():
+            # Keys recorded before (a firing repeated after a crash) are skipped
+            new = await self.ledger.record_unseen(chat_id, [t for t, _ in entries], [key for _, key in entries])
+            for transaction in new:
+                self.aggregates.apply(chat_id, transaction)
+                alert = self.budgets.check(chat_id, transaction)
+                if alert is not None:
+                    alerts[chat_id].append(alert)
+            if new:
+                recorded[chat_id] = new
+
+        now = self.clock()
+        for rule in rules:
+            rule.next_run_at = self._next_run(rule.schedule, max(now, rule.next_run_at))
+        await self._run_db(self._db_set_next_runs, [(rule.next_run_at, rule.rule_id) for rule in rules])
+        self.fired += sum(len(entries) for entries in recorded.values())
+        logger.info("Fired %d recurring rules (%d transactions recorded)", len(rules), sum(map(len, recorded.values())))
+
+        if self._notify is not None and recorded:
+            results = await asyncio.gather(
+                *(self._notify(chat_id, transactions, alerts[chat_id]) for chat_id, transactions in recorded.items()),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"Could not notify a chat about recurring transactions: {result}")
+
+    def _pop_due(self, now: float) -> List[RecurringRule]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            wake_at, rule_id = heapq.heappop(self._heap)
+            rule = self._rules.get(rule_id)
+            if rule is not None and rule.wake_at == wake_at:
+                due.append(rule)
+        return due
+
+    async def _run(self) -> None:
+        """Sleep until the earliest rule is due, then fire everything that is due."""
+        while True:
+            self._wakeup.clear()
+            due = self._pop_due(self.clock())
+            if due:
+                try:
+                    await self.fire(due)
+                except Exception as e:
+                    logger.error(f"Error firing {len(due)} recurring rules, retrying in {RETRY_DELAY:.0f}s: {e}")
+                    retry_at = self.clock() + RETRY_DELAY
+                    for rule in due:
+                        self._schedule(rule, retry_at)
+                    continue
+                for rule in due:
+                    if rule.rule_id in self._rules:
+                        self._schedule(rule, rule.next_run_at)
+                continue
+
+            timeout = MAX_SLEEP
+            if self._heap:
+                timeout = min(MAX_SLEEP, max(0.0, self._heap[0][0] - self.clock()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self, notify: Optional[Notify] = None) -> None:
+        """Load the rules and start the scheduler. Called on application startup.
+
+        Rules whose run time passed while the bot was down are due at once.
+        ``notify`` is called with each chat's newly recorded transactions
+        and the budget thresholds they crossed.
+        """
+        if self.running:
+            return
+        self._notify = notify
+        self._rules.clear()
+        self._by_chat.clear()
+        self._heap.clear()
+        for rule_id, chat_id, user_id, schedule, line, next_run_at in await self._run_db(self._db_load):
+            try:
+                cron = CronSchedule.parse(schedule)
+            except ValueError as e:
+                logger.error(f"Skipping recurring rule {rule_id}: {e}")
+                continue
+            rule = RecurringRule(rule_id, chat_id, user_id, cron, line, next_run_at)
+            self._rules[rule_id] = rule
+            self._by_chat[chat_id].add(rule_id)
+            rule.wake_at = next_run_at
+            self._heap.append((next_run_at, rule_id))
+        heapq.heapify(self._heap)
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.create_task(self._run(), name='recurring-scheduler')
+        logger.info(f"Recurring scheduler started ({len(self._rules)} rules, path={self.path})")
+
+    async def stop(self) -> None:
+        """Stop the scheduler and close the database. Called on application shutdown."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self._run_db(self._db_close)
+
+
+# Global instance, built on first use
+_recurring_scheduler: Optional[RecurringScheduler] = None
+
+
+def get_recurring_scheduler() -> RecurringScheduler:
+    """The scheduler at RECURRING_PATH; later calls return the same object."""
+    global _recurring_scheduler
+    if _recurring_scheduler is None:
+        _recurring_scheduler = RecurringScheduler()
+    return _recurring_scheduler
+
+
+def __getattr__(name: str):
+    # Keeps ``from recurring import recurring_scheduler`` working without building it at import
+    if name == 'recurring_scheduler':
+        return get_recurring_scheduler()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,139 @@
+"""
+Resilience primitives for outbound calls in the Money Tracker Bot
+"""
+
+import asyncio
+import logging
+import time
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Asynchronous token bucket rate limiter.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``;
+    each request takes one, waiting if none are left. A rate of 0 or less
+    disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        if not self.enabled:
+            return
+        # Waiters queue on the lock, so tokens are handed out first come, first served
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    @property
+    def tokens(self) -> float:
+        """Tokens currently available (after refilling)."""
+        if not self.enabled:
+            return float(self.capacity)
+        self._refill()
+        return self._tokens
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    * closed: calls go through; ``failure_threshold`` failures in a row open it.
+    * open: calls are rejected immediately for ``reset_timeout`` seconds.
+    * half-open: a single probe call is let through; success closes the
+      breaker, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now. Counts rejections."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._state = self.HALF_OPEN
+            self._probing = True
+            logger.info(f"Circuit breaker {self.name} half-open, probing")
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info(f"Circuit breaker {self.name} closed")
+        self._state = self.CLOSED
+        self._probing = False
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(
+                    f"Circuit breaker {self.name} opened after {self.consecutive_failures} consecutive failures"
+                )
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._probing = False
+
+    def release(self) -> None:
+        """Forget a call that ended without a verdict, e.g. one cancelled on shutdown.
+
+        A half-open breaker lets the next call be the probe instead.
+        """
+        self._probing = False
+
+    def metrics(self) -> dict:
+        """Current state and counters, for monitoring."""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'times_opened': self.times_opened,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,252 @@
+"""
+Category and account name resolution for the Money Tracker Bot
+
+Names typed in a message are mapped onto the canonical spellings the Apps
+Script dropdowns accept. Each list of names gets a precomputed index:
+a case-insensitive map, aliases, a prefix trie for unambiguous
+abbreviations ("transport" -> "Transportation") and, as a last resort, a
+bounded edit distance ("Csah" -> "Cash"). Typo candidates come from a
+deletion index: every name is stored under all strings left after deleting
+up to MAX_EDIT_DISTANCE characters, so two names within that distance share
+an entry and a lookup only computes the distance to a handful of names.
+Indexes are built once per list and results are memoised, so resolving a
+name costs a dictionary lookup on the hot path.
+"""
+
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from models import Expense, Income, Transfer
+
+# Abbreviations must be at least this long to resolve through the trie
+MIN_PREFIX_LENGTH = 3
+# Largest edit distance still treated as a typo; short names allow only 1
+MAX_EDIT_DISTANCE = 2
+MAX_SUGGESTIONS = 3
+# Memoised lookups per index before the memo is cleared
+MAX_MEMO_SIZE = 4096
+# Characters of an unknown name repeated back in error messages
+MAX_SHOWN_NAME_LENGTH = 40
+
+# (as typed, canonical name)
+Correction = Tuple[str, str]
+Aliases = Tuple[Tuple[str, str], ...]
+
+
+@dataclass(frozen=True)
+class Resolution:
+    """Outcome of resolving one typed name."""
+    given: str
+    value: Optional[str]  # Canonical name, or None if nothing matched confidently
+    suggestions: Tuple[str, ...] = ()
+
+    @property
+    def corrected(self) -> bool:
+        return self.value is not None and self.value != self.given
+
+
+class UnknownNameError(ValueError):
+    """A category or account that does not resolve to a known name."""
+
+    def __init__(self, kind: str, given: str, suggestions: Sequence[str] = ()):
+        if len(given) > MAX_SHOWN_NAME_LENGTH:
+            given = given[:MAX_SHOWN_NAME_LENGTH] + '…'
+        self.kind = kind
+        self.given = given
+        self.suggestions = tuple(suggestions)
+        message = f"Unknown {kind} '{given}'"
+        if self.suggestions:
+            message += f" (did you mean {', '.join(self.suggestions)}?)"
+        super().__init__(message)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance between ``a`` and ``b``, capped at ``limit + 1``.
+
+    Insertions, deletions, substitutions and swaps of adjacent characters
+    each cost 1. Rows stop being computed once every entry exceeds the
+    limit, so far-apart names are rejected after a few characters.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # A shared prefix and suffix do not change the distance; typos are usually
+    # a character or two, so this leaves a tiny table
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(len(a) + len(b), limit + 1)
+
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def deletions(key: str, depth: int) -> Set[str]:
+    """``key`` and every string left after deleting up to ``depth`` of its characters."""
+    found = {key}
+    frontier = {key}
+    for _ in range(depth):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        found |= frontier
+    return found
+
+
+class NameIndex:
+    """Precomputed lookup structures for one list of canonical names."""
+
+    def __init__(self, names: Iterable[str], aliases: Aliases = (), max_distance: int = MAX_EDIT_DISTANCE):
+        self.names = tuple(names)
+        self.max_distance = max_distance
+        self._exact: Dict[str, str] = {name.casefold(): name for name in self.names}
+        # Aliases only count for names in this list, so one alias table serves categories and accounts
+        self._aliases: Dict[str, str] = {
+            alias.casefold(): self._exact[canonical.casefold()]
+            for alias, canonical in aliases
+            if canonical.casefold() in self._exact and alias.casefold() not in self._exact
+        }
+        keys = {**self._exact, **self._aliases}
+        # Anything longer than this is further than max_distance from every name
+        self._longest = max(map(len, keys), default=0)
+
+        # Trie over names and aliases; every node lists the names reachable below it
+        self._trie: dict = {}
+        for key, canonical in keys.items():
+            node = self._trie
+            for char in key:
+                node = node.setdefault(char, {'': []})
+                if canonical not in node['']:
+                    node[''].append(canonical)
+
+        self._keys = keys
+        self._deletions: Dict[str, List[str]] = {}
+        for key in keys:
+            for deleted in deletions(key, max_distance):
+                self._deletions.setdefault(deleted, []).append(key)
+        self._memo: Dict[str, Resolution] = {}
+
+    def _prefix_matches(self, key: str) -> List[str]:
+        node = self._trie
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node['']
+
+    def _nearest(self, key: str) -> Tuple[int, List[str]]:
+        """Smallest edit distance up to ``max_distance`` and the names at that distance."""
+        best, nearest = self.max_distance + 1, []
+        # Names one edit (or one swap) away share a single-deletion entry, so the
+        # cheap pass settles most typos before the full set of deletions is built
+        for depth in range(1, self.max_distance + 1):
+            candidates = set()
+            for deleted in deletions(key, depth):
+                candidates.update(self._deletions.get(deleted, ()))
+            for candidate in candidates:
+                distance = edit_distance(key, candidate, self.max_distance)
+                canonical = self._keys[candidate]
+                if distance < best:
+                    best, nearest = distance, [canonical]
+                elif distance == best and canonical not in nearest:
+                    nearest.append(canonical)
+            if best <= depth:
+                break
+        return best, nearest
+
+    def _resolve(self, given: str) -> Resolution:
+        key = given.casefold()
+        canonical = self._exact.get(key) or self._aliases.get(key)
+        if canonical:
+            return Resolution(given, canonical)
+        # Deletions grow combinatorially with the length, so a long token must not reach them
+        if len(key) > self._longest + self.max_distance:
+            return Resolution(given, None)
+
+        if len(key) >= MIN_PREFIX_LENGTH:
+            matches = self._prefix_matches(key)
+            if len(matches) == 1:
+                return Resolution(given, matches[0])
+            if matches:
+                return Resolution(given, None, tuple(sorted(matches)[:MAX_SUGGESTIONS]))
+
+        # Short names only absorb one typo; anything further is merely suggested
+        limit = 1 if len(key) <= 4 else self.max_distance
+        distance, nearest = self._nearest(key)
+        if distance <= limit and len(nearest) == 1:
+            return Resolution(given, nearest[0])
+        return Resolution(given, None, tuple(sorted(nearest)[:MAX_SUGGESTIONS]))
+
+    def resolve(self, given: str) -> Resolution:
+        """Resolve a typed name to its canonical spelling."""
+        resolution = self._memo.get(given)
+        if resolution is None:
+            if len(self._memo) >= MAX_MEMO_SIZE:
+                self._memo.clear()
+            resolution = self._memo[given] = self._resolve(given)
+        return resolution
+
+
+class Resolver:
+    """Resolves the categories and accounts of parsed transactions."""
+
+    def __init__(self, categories: Iterable[str], accounts: Iterable[str], aliases: Aliases = ()):
+        self.categories = NameIndex(categories, aliases)
+        self.accounts = NameIndex(accounts, aliases)
+
+    @staticmethod
+    def _lookup(index: NameIndex, kind: str, given: str, corrections: List[Correction]) -> str:
+        resolution = index.resolve(given)
+        if resolution.value is None:
+            raise UnknownNameError(kind, given, resolution.suggestions)
+        if resolution.corrected:
+            corrections.append((given, resolution.value))
+        return resolution.value
+
+    def category(self, given: str) -> str:
+        """Canonical name of a category as typed.
+
+        Raises UnknownNameError if it cannot be resolved.
+        """
+        return self._lookup(self.categories, 'category', given, [])
+
+    def apply(self, transaction: Union[Expense, Income, Transfer]) -> Tuple[Union[Expense, Income, Transfer], List[Correction]]:
+        """Return the transaction with canonical names, plus the names that were changed.
+
+        Raises UnknownNameError if a category or account cannot be resolved.
+        """
+        corrections: List[Correction] = []
+        if isinstance(transaction, Transfer):
+            resolved = replace(
+                transaction,
+                from_account=self._lookup(self.accounts, 'account', transaction.from_account, corrections),
+                to_account=self._lookup(self.accounts, 'account', transaction.to_account, corrections),
+            )
+        else:
+            resolved = replace(
+                transaction,
+                category=self._lookup(self.categories, 'category', transaction.category, corrections),
+                account=self._lookup(self.accounts, 'account', transaction.account, corrections),
+            )
+        return resolved, corrections
+
+
+@lru_cache(maxsize=256)
+def resolver_for(categories: Tuple[str, ...], accounts: Tuple[str, ...], aliases: Aliases = ()) -> Resolver:
+    """Shared resolver for a list of categories and accounts, built on first use."""
+    return Resolver(categories, accounts, aliases)
@@ -1,116 +1,331 @@
 """
 Google Sheets integration for the Money Tracker Bot
+
+Settings are read when an integration is created, not when this module is
+imported; the default endpoint's ``sheets_integration`` is built on first use.
 """
 
 import asyncio
 import logging
-from typing import Union, Dict, Any
+import uuid
+from typing import Optional, Union, Dict, Any, List, NamedTuple, Tuple
 import httpx
 from datetime import datetime
 
 from models import Expense, Income, Transfer
-from config import SHEETS_API_URL
+from codec import dumps, loads, to_payload
+from resilience import TokenBucket, CircuitBreaker, CircuitOpenError
+from metrics import SHEETS_REQUESTS, SHEETS_REQUEST_SECONDS
+from config import get_settings
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Outcome of a request to the Apps Script, or of one payload in it
+SAVED = 'saved'
+INVALID = 'invalid'  # The script refused this payload's data; sending it again cannot help
+REJECTED = 'rejected'  # The script answered but refused the request: nothing wrong with the endpoint
+FAILED = 'failed'  # Timeout, network or server error, or an open circuit: the endpoint is unwell
+
+
+class Delivery(NamedTuple):
+    """Outcome of sending one payload, with the reason when it was not saved."""
+    outcome: str
+    error: str = ''
+
+    @property
+    def saved(self) -> bool:
+        return self.outcome == SAVED
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """True for errors that say the endpoint is unwell: transport errors, timeouts and 5xx."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
 
 class SheetsIntegration:
     """Handle Google Sheets API integration for financial data."""
     
-    def __init__(self):
-        self.api_url = SHEETS_API_URL
-        self.timeout = 10.0  # 10 seconds timeout
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        rate_limit: Optional[float] = None,
+        rate_burst: Optional[int] = None,
+        breaker_failures: Optional[int] = None,
+        breaker_reset: Optional[float] = None
+    ):
+        """Arguments left as None come from the settings."""
+        settings = get_settings()
+        if max_concurrency is None:
+            max_concurrency = settings.SHEETS_MAX_CONCURRENCY
+        if rate_limit is None:
+            rate_limit = settings.SHEETS_RATE_LIMIT
+        if rate_burst is None:
+            rate_burst = settings.SHEETS_RATE_BURST
+        if breaker_failures is None:
+            breaker_failures = settings.SHEETS_BREAKER_FAILURES
+        if breaker_reset is None:
+            breaker_reset = settings.SHEETS_BREAKER_RESET
+        self.api_url = api_url or settings.SHEETS_API_URL
+        self.timeout = settings.SHEETS_TIMEOUT
+        self.http2 = settings.SHEETS_HTTP2
+        self.limits = httpx.Limits(
+            max_connections=settings.SHEETS_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SHEETS_MAX_KEEPALIVE,
+            keepalive_expiry=settings.SHEETS_KEEPALIVE_EXPIRY
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        # Bounds outbound requests independently of how many updates run at once
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Keeps this endpoint within its Apps Script quota
+        self.rate_limiter = TokenBucket(rate_limit, rate_burst)
+        # Stops hammering an endpoint that keeps failing; callers fail fast while it is open
+        self.breaker = CircuitBreaker(self.api_url, breaker_failures, breaker_reset)
+    
+    @staticmethod
+    def _http2_available() -> bool:
+        """Check whether the optional h2 package needed for HTTP/2 is installed."""
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the shared, connection-pooled HTTP client."""
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=self.http2 and self._http2_available(),
+            follow_redirects=True,  # Follow redirects for Google Apps Script
+            headers={
+                'Content-Type': 'application/json',
+                'User-Agent': 'MoneyTrackerBot/1.0'
+            }
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+    
+    async def start(self) -> None:
+        """Open the shared HTTP client. Called on application startup."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        logger.info(
+            f"Google Sheets client started (max_connections={self.limits.max_connections}, "
+            f"http2={self.http2 and self._http2_available()})"
+        )
+    
+    async def close(self) -> None:
+        """Close the shared HTTP client. Called on application shutdown."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Google Sheets client closed")
+        self._client = None
     
     def _prepare_payload(self, transaction: Union[Expense, Income, Transfer]) -> Dict[str, Any]:
         """Prepare payload for Google Sheets API based on transaction type."""
+        return to_payload(transaction, datetime.now().isoformat())
+    
+    def prepare_payload(self, transaction: Union[Expense, Income, Transfer]) -> Dict[str, Any]:
+        """Prepare a payload tagged with a fresh idempotency key.
         
-        # Common fields
-        base_payload = {
-            'timestamp': datetime.now().isoformat(),
-            'date': transaction.date,
-            'amount': transaction.amount
-        }
-        
-        if isinstance(transaction, Expense):
-            return {
-                **base_payload,
-                'type': 'expense',
-                'category': transaction.category,
-                'account': transaction.account,
-                'description': transaction.name
-            }
-        
-        elif isinstance(transaction, Income):
-            return {
-                **base_payload,
-                'type': 'income',
-                'category': transaction.category,
-                'account': transaction.account,
-                'description': transaction.name
-            }
+        The Apps Script skips payloads whose key it has already stored, so the
+        same payload can safely be retried.
+        """
+        payload = self._prepare_payload(transaction)
+        payload['idempotency_key'] = uuid.uuid4().hex
+        return payload
+    
+    async def _post(self, payload: Dict[str, Any]) -> Tuple[Delivery, Dict[str, str]]:
+        """POST a JSON payload through the circuit breaker.
         
-        elif isinstance(transaction, Transfer):
-            return {
-                **base_payload,
-                'type': 'transfer',
-                'from_account': transaction.from_account,
-                'to_account': transaction.to_account,
-                'description': transaction.description
-            }
+        Returns the outcome of the request and the reasons the script gave
+        for payloads it refused, by idempotency key.
         
+        While the breaker is open this returns FAILED at once instead of
+        waiting on another timeout; the outbox keeps the payload queued and
+        retries it later. Only FAILED counts against the breaker: a request
+        the script refused (bad data from one user) says nothing about the
+        endpoint and must not block everyone else's writes.
+        """
+        if not self.breaker.allow():
+            logger.warning("Google Sheets circuit is %s, not sending to %s", self.breaker.state, self.api_url)
+            SHEETS_REQUESTS.inc(outcome='circuit_open')
+            return Delivery(FAILED, f"circuit {self.breaker.state}"), {}
+        try:
+            delivery, invalid = await self._send(payload)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        if delivery.outcome == FAILED:
+            self.breaker.record_failure()
         else:
-            raise ValueError(f"Unknown transaction type: {type(transaction)}")
+            self.breaker.record_success()
+        return delivery, invalid
     
-    async def send_to_sheets(self, transaction: Union[Expense, Income, Transfer]) -> bool:
-        """Send transaction data to Google Sheets API."""
+    async def _send(self, payload: Dict[str, Any]) -> Tuple[Delivery, Dict[str, str]]:
+        """POST a JSON payload to the Google Sheets API; see :meth:`_post` for the result."""
         try:
-            payload = self._prepare_payload(transaction)
+            logger.debug("Sending %d transaction(s) to Google Sheets", len(payload.get('transactions', [payload])))
             
-            logger.info(f"Sending to Google Sheets: {payload}")
+            await self.rate_limiter.acquire()
+            async with self._semaphore:
+                with SHEETS_REQUEST_SECONDS.time():
+                    response = await self.client.post(
+                        self.api_url,
+                        content=dumps(payload)
+                    )
             
-            async with httpx.AsyncClient(
-                timeout=self.timeout,
-                follow_redirects=True,  # Follow redirects for Google Apps Script
-                headers={
-                    'Content-Type': 'application/json',
-                    'User-Agent': 'MoneyTrackerBot/1.0'
-                }
-            ) as client:
-                response = await client.post(
-                    self.api_url,
-                    json=payload
-                )
-                
-                response.raise_for_status()  # Raises exception for 4xx/5xx status codes
-                
-                # Check if the response contains success indicators
-                response_text = response.text
-                logger.info(f"Google Sheets response: {response_text}")
-                
-                # Consider it successful if we get a 200 response
-                # You may need to adjust this based on your Google Apps Script response format
-                logger.info(f"Successfully sent to Google Sheets. Status: {response.status_code}")
-                return True
+            response.raise_for_status()  # Raises exception for 4xx/5xx status codes
+            
+            # Check if the response contains success indicators
+            response_text = response.text
+            logger.debug("Google Sheets response: %.200s", response_text)
+            
+            # The Apps Script answers 200 even when it fails, with an "Error: ..." body
+            if response_text.startswith('Error'):
+                logger.error("Google Sheets rejected the request: %.200s", response_text)
+                SHEETS_REQUESTS.inc(outcome='rejected')
+                return Delivery(REJECTED, response_text[:200]), {}
+            
+            # Current scripts list the rows they refused, e.g. {"saved": 9, "invalid": {"<key>": "..."}};
+            # older ones answer "Success" for the whole request
+            invalid = {}
+            if response_text.startswith('{'):
+                invalid = loads(response_text).get('invalid') or {}
+                if invalid:
+                    logger.warning("Google Sheets refused %d payload(s): %.200s", len(invalid), invalid)
+            
+            logger.debug("Successfully sent to Google Sheets. Status: %s", response.status_code)
+            SHEETS_REQUESTS.inc(outcome='success')
+            return Delivery(SAVED), invalid
                 
         except httpx.TimeoutException:
             logger.error("Timeout while sending data to Google Sheets")
-            return False
+            SHEETS_REQUESTS.inc(outcome='timeout')
+            return Delivery(FAILED, 'timeout'), {}
         except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error while sending to Google Sheets: {e.response.status_code} - {e.response.text}")
-            return False
+            logger.error("HTTP error while sending to Google Sheets: %s - %.200s", e.response.status_code, e.response.text)
+            SHEETS_REQUESTS.inc(outcome='http_error')
+            return Delivery(FAILED if is_endpoint_failure(e) else REJECTED, f"HTTP {e.response.status_code}"), {}
         except Exception as e:
+            logger.error("Unexpected error while sending to Google Sheets: %s", e)
+            SHEETS_REQUESTS.inc(outcome='error')
+            return Delivery(FAILED if is_endpoint_failure(e) else REJECTED, str(e)[:200]), {}
+    
+    async def send_to_sheets(self, transaction: Union[Expense, Income, Transfer]) -> bool:
+        """Send transaction data to Google Sheets API."""
+        try:
+            payload = self.prepare_payload(transaction)
+        except ValueError as e:
             logger.error(f"Unexpected error while sending to Google Sheets: {str(e)}")
             return False
+        return (await self.send_payloads_each([payload]))[0].saved
+    
+    async def send_batch(self, transactions: List[Union[Expense, Income, Transfer]]) -> bool:
+        """Send several transactions to Google Sheets API in a single bulk request."""
+        try:
+            payloads = [self.prepare_payload(t) for t in transactions]
+        except ValueError as e:
+            logger.error(f"Unexpected error while sending to Google Sheets: {str(e)}")
+            return False
+        return await self.send_payloads(payloads)
+    
+    async def send_payloads(self, payloads: List[Dict[str, Any]]) -> bool:
+        """Send already prepared payloads to Google Sheets API in a single bulk request."""
+        return all(delivery.saved for delivery in await self.send_payloads_each(payloads))
+    
+    async def send_payloads_each(self, payloads: List[Dict[str, Any]]) -> List[Delivery]:
+        """Send prepared payloads in a single bulk request and return the outcome of each.
+        
+        The script checks every row on its own, so one invalid payload no
+        longer fails the valid ones sent with it.
+        """
+        delivery, invalid = await self._post({'transactions': payloads})
+        if not delivery.saved:
+            return [delivery] * len(payloads)
+        results = []
+        for payload in payloads:
+            reason = invalid.get(payload.get('idempotency_key'))
+            results.append(delivery if reason is None else Delivery(INVALID, str(reason)))
+        return results
+    
+    async def fetch_export(self, transaction_type: str, offset: int, limit: int) -> Dict[str, Any]:
+        """Fetch one page of rows from a sheet via the Apps Script export endpoint.
+        
+        Returns ``{'rows': [...], 'next_offset': int or None}``. Raises
+        CircuitOpenError while the endpoint's circuit breaker is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Google Sheets circuit is {self.breaker.state} for {self.api_url}")
+        try:
+            await self.rate_limiter.acquire()
+            async with self._semaphore:
+                response = await self.client.get(
+                    self.api_url,
+                    params={'action': 'export', 'type': transaction_type, 'offset': offset, 'limit': limit}
+                )
+            response.raise_for_status()
+            page = response.json()
+        except asyncio.CancelledError:
+            # Cancelled on shutdown: no sign of an unwell endpoint
+            self.breaker.release()
+            raise
+        except Exception as e:
+            if is_endpoint_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return page
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Circuit breaker state and rate limiter headroom for this endpoint."""
+        return {
+            'endpoint': self.api_url,
+            'breaker': self.breaker.metrics(),
+            'rate_limit_tokens': self.rate_limiter.tokens,
+        }
     
     def send_to_sheets_sync(self, transaction: Union[Expense, Income, Transfer]) -> bool:
         """Synchronous wrapper for sending to Google Sheets (for testing)."""
+        async def _send_once() -> bool:
+            try:
+                return await self.send_to_sheets(transaction)
+            finally:
+                # The pooled client is bound to this event loop, so close it here
+                await self.close()
+        
         try:
-            return asyncio.run(self.send_to_sheets(transaction))
+            return asyncio.run(_send_once())
         except Exception as e:
             logger.error(f"Error in sync sheets operation: {str(e)}")
             return False
 
 
-# Global instance
-sheets_integration = SheetsIntegration()
+# Global instance for the default endpoint, built on first use
+_sheets_integration: Optional[SheetsIntegration] = None
+
+
+def get_sheets_integration() -> SheetsIntegration:
+    """The default endpoint's integration; later calls return the same object."""
+    global _sheets_integration
+    if _sheets_integration is None:
+        _sheets_integration = SheetsIntegration()
+    return _sheets_integration
+
+
+def __getattr__(name: str):
+    # Keeps ``from sheets import sheets_integration`` working without building it at import
+    if name == 'sheets_integration':
+        return get_sheets_integration()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,277 @@
+"""
+Multi-tenant routing for the Money Tracker Bot
+
+A tenant registry maps Telegram chat or user IDs to their own Google Sheets
+endpoint, accounts and categories, so one bot can serve a whole team. The
+registry file is JSON:
+
+    {
+      "tenants": {
+        "finance-team": {
+          "sheets_api": "https://script.google.com/macros/s/.../exec",
+          "accounts": ["Cash", "BCA"],
+          "categories": ["Travel", "Other"],
+          "aliases": {"taxi": "Travel"},
+          "chats": [-1001234567890],
+          "users": [123456789]
+        }
+      }
+    }
+
+Chats and users that are not listed use the default tenant built from the
+environment (SHEETS_API, AVAILABLE_ACCOUNTS, AVAILABLE_CATEGORIES). A
+tenant's aliases are added to NAME_ALIASES for resolving typed names.
+Every endpoint gets its own SheetsIntegration, and with it its own
+connection pool and rate limiter, plus its own batcher, so a slow Apps
+Script deployment only ever delays its own tenant.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sheets import SheetsIntegration, get_sheets_integration
+from batcher import SheetsBatcher, get_sheets_batcher
+from resolver import Aliases, Resolver, resolver_for
+from config import AVAILABLE_ACCOUNTS, AVAILABLE_CATEGORIES, NAME_ALIASES, get_settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT_ID = 'default'
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A spreadsheet with its own accounts and categories."""
+    tenant_id: str
+    sheets_api: str
+    accounts: Tuple[str, ...]
+    categories: Tuple[str, ...]
+    aliases: Aliases = ()
+
+    @property
+    def resolver(self) -> Resolver:
+        """Resolver for this tenant's names, shared by tenants with the same lists."""
+        return resolver_for(self.categories, self.accounts, self.aliases)
+
+    @property
+    def is_default(self) -> bool:
+        return self.tenant_id == DEFAULT_TENANT_ID
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        """Endpoint to route writes to, or None for the default spreadsheet."""
+        return None if self.is_default else self.sheets_api
+
+
+_default_tenant: Optional[Tenant] = None
+
+
+def get_default_tenant() -> Tenant:
+    """The tenant built from the environment; later calls return the same object."""
+    global _default_tenant
+    if _default_tenant is None:
+        _default_tenant = Tenant(
+            tenant_id=DEFAULT_TENANT_ID,
+            sheets_api=get_settings().SHEETS_API_URL,
+            accounts=tuple(AVAILABLE_ACCOUNTS),
+            categories=tuple(AVAILABLE_CATEGORIES),
+            aliases=tuple(NAME_ALIASES.items()),
+        )
+    return _default_tenant
+
+
+class TenantRegistry:
+    """Resolve chats and users to tenants through an LRU cache with a TTL.
+
+    The registry file is only read on a cache miss, and only re-parsed when
+    it changed on disk, so lookups on the hot path are a dictionary hit.
+    Entries expire after ``ttl`` seconds, which is how edits to the file
+    reach chats that are already cached.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: Optional[int] = None,
+                 ttl: Optional[float] = None, default: Optional[Tenant] = None):
+        settings = get_settings()
+        self.path = settings.TENANTS_PATH if path is None else path
+        self.max_size = max(1, settings.TENANT_CACHE_SIZE if max_size is None else max_size)
+        self.ttl = settings.TENANT_CACHE_TTL if ttl is None else ttl
+        self.default = get_default_tenant() if default is None else default
+        self._cache: 'OrderedDict[Tuple[int, Optional[int]], Tuple[Tenant, float]]' = OrderedDict()
+        self._mtime: Optional[float] = None
+        self._by_chat: Dict[int, Tenant] = {}
+        self._by_user: Dict[int, Tenant] = {}
+        self.loads = 0
+
+    def _tenant_from_entry(self, tenant_id: str, entry: Dict[str, Any]) -> Tenant:
+        if not entry.get('sheets_api'):
+            raise ValueError(f"Tenant '{tenant_id}' has no sheets_api")
+        return Tenant(
+            tenant_id=tenant_id,
+            sheets_api=entry['sheets_api'],
+            accounts=tuple(entry.get('accounts') or self.default.accounts),
+            categories=tuple(entry.get('categories') or self.default.categories),
+            aliases=tuple({**dict(self.default.aliases), **(entry.get('aliases') or {})}.items()),
+        )
+
+    def _load(self) -> None:
+        """(Re)read the registry file if it changed since the last read."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self._mtime, self._by_chat, self._by_user = None, {}, {}
+            return
+        if mtime == self._mtime:
+            return
+
+        with open(self.path, encoding='utf-8') as registry_file:
+            data = json.load(registry_file)
+        by_chat, by_user = {}, {}
+        for tenant_id, entry in data.get('tenants', {}).items():
+            tenant = self._tenant_from_entry(tenant_id, entry)
+            by_chat.update((int(chat_id), tenant) for chat_id in entry.get('chats', []))
+            by_user.update((int(user_id), tenant) for user_id in entry.get('users', []))
+        self._mtime, self._by_chat, self._by_user = mtime, by_chat, by_user
+        self.loads += 1
+        logger.info(f"Tenant registry loaded: {len(data.get('tenants', {}))} tenants from {self.path}")
+
+    def resolve(self, chat_id: int, user_id: Optional[int] = None) -> Tenant:
+        """Tenant for a chat, falling back to the user, then the default tenant."""
+        key = (chat_id, user_id)
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None and cached[1] > now:
+            self._cache.move_to_end(key)
+            return cached[0]
+
+        try:
+            self._load()
+        except (OSError, ValueError) as e:
+            # Keep serving the last good registry rather than failing the update
+            logger.error(f"Could not load tenant registry {self.path}: {e}")
+        tenant = self._by_chat.get(chat_id) or (self._by_user.get(user_id) if user_id is not None else None)
+        tenant = tenant or self.default
+
+        self._cache[key] = (tenant, now + self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return tenant
+
+    def tenants(self) -> List[Tenant]:
+        """The default tenant plus every tenant in the registry file."""
+        try:
+            self._load()
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load tenant registry {self.path}: {e}")
+        found = {self.default.tenant_id: self.default}
+        for tenant in [*self._by_chat.values(), *self._by_user.values()]:
+            found.setdefault(tenant.tenant_id, tenant)
+        return list(found.values())
+
+    def invalidate(self) -> None:
+        """Drop every cached lookup, e.g. after editing the registry file."""
+        self._cache.clear()
+        self._mtime = None
+
+
+class SheetsEndpoints:
+    """One SheetsIntegration and SheetsBatcher per Sheets endpoint.
+
+    The default endpoint uses the global instances, whose lifecycle is
+    handled in main; tenant endpoints are created on first use.
+    """
+
+    def __init__(self, default_sheets: Optional[SheetsIntegration] = None,
+                 default_batcher: Optional[SheetsBatcher] = None):
+        self.default_sheets = get_sheets_integration() if default_sheets is None else default_sheets
+        self.default_batcher = get_sheets_batcher() if default_batcher is None else default_batcher
+        self._batchers: Dict[str, SheetsBatcher] = {}
+        self._started = False
+
+    def sheets_for(self, endpoint: Optional[str]) -> SheetsIntegration:
+        """SheetsIntegration for an endpoint, for direct reads such as /resync."""
+        if endpoint is None or endpoint == self.default_sheets.api_url:
+            return self.default_sheets
+        return self._get_or_create(endpoint).sheets
+
+    def _get_or_create(self, endpoint: str) -> SheetsBatcher:
+        batcher = self._batchers.get(endpoint)
+        if batcher is None:
+            batcher = self._batchers[endpoint] = SheetsBatcher(SheetsIntegration(api_url=endpoint))
+        return batcher
+
+    async def batcher_for(self, endpoint: Optional[str]) -> SheetsBatcher:
+        """Batcher delivering to an endpoint, started on first use."""
+        if endpoint is None or endpoint == self.default_sheets.api_url:
+            return self.default_batcher
+        batcher = self._get_or_create(endpoint)
+        if self._started and not batcher.running:
+            await batcher.sheets.start()
+            await batcher.start()
+        return batcher
+
+    @property
+    def endpoints(self) -> List[str]:
+        return list(self._batchers)
+
+    def batchers(self) -> List[SheetsBatcher]:
+        """The default batcher followed by every tenant batcher."""
+        return [self.default_batcher] + list(self._batchers.values())
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        """Breaker and rate limiter metrics for the default and every tenant endpoint."""
+        return [self.default_sheets.metrics()] + [batcher.sheets.metrics() for batcher in self._batchers.values()]
+
+    async def start(self) -> None:
+        """Allow tenant batchers to start. Called on application startup."""
+        self._started = True
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Flush and close every tenant endpoint, within ``timeout`` seconds if given.
+        
+        Called on application shutdown.
+        """
+        self._started = False
+        batchers = list(self._batchers.values())
+        await asyncio.gather(*(batcher.stop(timeout) for batcher in batchers))
+        for batcher in batchers:
+            await batcher.sheets.close()
+
+
+# Global instances, built on first use
+_tenant_registry: Optional[TenantRegistry] = None
+_sheets_endpoints: Optional[SheetsEndpoints] = None
+
+
+def get_tenant_registry() -> TenantRegistry:
+    """The registry read from TENANTS_PATH; later calls return the same object."""
+    global _tenant_registry
+    if _tenant_registry is None:
+        _tenant_registry = TenantRegistry()
+    return _tenant_registry
+
+
+def get_sheets_endpoints() -> SheetsEndpoints:
+    """Endpoints around the default integration and batcher; later calls return the same object."""
+    global _sheets_endpoints
+    if _sheets_endpoints is None:
+        _sheets_endpoints = SheetsEndpoints()
+    return _sheets_endpoints
+
+
+def __getattr__(name: str):
+    # Keeps ``from tenants import tenant_registry`` and friends working without reading settings at import
+    if name == 'DEFAULT_TENANT':
+        return get_default_tenant()
+    if name == 'tenant_registry':
+        return get_tenant_registry()
+    if name == 'sheets_endpoints':
+        return get_sheets_endpoints()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental aggregate engine
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models import Expense, Income, Transfer
+from aggregates import AggregateEngine
+from ledger import Ledger
+
+TRANSACTIONS = [
+    Income(amount=1000.00, category="Salary", account="BRI", name="Monthly salary", date="2025-07-01"),
+    Expense(amount=50.25, category="Transportation", account="Cash", name="Bus fare", date="2025-07-02"),
+    Expense(amount=20.00, category="Transportation", account="Gopay", name="Ojek", date="2025-07-05"),
+    Expense(amount=75.00, category="Shopping", account="BRI", name="Shoes", date="2025-07-06"),
+    Transfer(amount=200.00, from_account="BRI", to_account="Cash", description="ATM", date="2025-07-03"),
+    Expense(amount=30.00, category="Snacks", account="BRI", name="Chips", date="2025-08-01"),
+]
+
+
+def test_incremental_report():
+    engine = AggregateEngine()
+    for transaction in TRANSACTIONS:
+        engine.apply(1, transaction)
+
+    report = engine.report(1, '2025-07')
+    assert report['income'] == 100000
+    assert report['expense'] == 5025 + 2000 + 7500
+    assert report['count'] == 5
+    assert report['categories'] == {'Transportation': 7025, 'Shopping': 7500}
+    # The transfer is netted between BRI and Cash, not counted as spending
+    assert report['transfer'] == 20000
+    assert report['accounts'] == {'BRI': 100000 - 7500 - 20000, 'Cash': -5025 + 20000, 'Gopay': -2000}
+
+    # Categories outside the configured list still show up
+    assert engine.report(1, '2025-08')['categories'] == {'Snacks': 3000}
+    assert engine.report(2, '2025-07')['count'] == 0
+
+
+def test_top_categories():
+    engine = AggregateEngine()
+    for transaction in TRANSACTIONS:
+        engine.apply(1, transaction)
+
+    assert engine.top_categories(1, '2025-07') == [('Shopping', 7500), ('Transportation', 7025)]
+    assert engine.top_categories(1, limit=1) == [('Shopping', 7500)]
+
+
+def test_rebuild_matches_incremental():
+    """A cold-start rebuild from the ledger gives the same totals as applying one by one."""
+    incremental = AggregateEngine()
+    for transaction in TRANSACTIONS:
+        incremental.apply(1, transaction)
+
+    async def grouped_rows(path):
+        ledger = Ledger(path=path)
+        await ledger.record_many(1, TRANSACTIONS)
+        rows = await ledger.aggregate_rows()
+        await ledger.close()
+        return rows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = asyncio.run(grouped_rows(os.path.join(tmp, 'ledger.sqlite3')))
+
+    rebuilt = AggregateEngine()
+    rebuilt.rebuild(rows)
+    for month in ('2025-07', '2025-08'):
+        assert rebuilt.report(1, month) == incremental.report(1, month)
+    assert rebuilt.top_categories(1) == incremental.top_categories(1)
+
+
+if __name__ == "__main__":
+    test_incremental_report()
+    test_top_categories()
+    test_rebuild_matches_incremental()
+    print("✅ All aggregate tests passed")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test script for the write-behind Google Sheets batcher
+"""
+
+import sys
+import os
+import asyncio
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmarks.stub_server import StubSheetsServer
+from models import Expense
+from batcher import SheetsBatcher
+from sheets import FAILED, INVALID, SAVED, Delivery, SheetsIntegration
+
+
+class FakeSheets:
+    """Stand-in for SheetsIntegration that records bulk sends."""
+
+    def __init__(self, delay: float = 0.0, succeed: bool = True, invalid: tuple = ()):
+        self.delay = delay
+        self.succeed = succeed
+        self.invalid = invalid  # Descriptions the script refuses row by row
+        self.batches = []
+
+    def prepare_payload(self, transaction):
+        return {'description': transaction.name}
+
+    async def send_payloads_each(self, payloads):
+        await asyncio.sleep(self.delay)
+        self.batches.append(list(payloads))
+        if not self.succeed:
+            return [Delivery(FAILED, 'timeout')] * len(payloads)
+        return [Delivery(INVALID, 'Amount must be a positive number') if p['description'] in self.invalid
+                else Delivery(SAVED) for p in payloads]
+
+
+def make_expense(i: int) -> Expense:
+    return Expense(amount=float(i), category="Other", account="Cash", name=f"Item {i}", date="2025-07-25")
+
+
+async def _submit_all(batcher: SheetsBatcher, count: int) -> list:
+    await batcher.start()
+    try:
+        return await asyncio.gather(*(batcher.submit(make_expense(i)) for i in range(count)))
+    finally:
+        await batcher.stop()
+
+
+def test_batcher_coalesces_by_size():
+    """Many concurrent submissions are sent as a few bulk requests."""
+    sheets = FakeSheets()
+    batcher = SheetsBatcher(sheets, max_items=10, max_delay_ms=1000)
+
+    results = asyncio.run(_submit_all(batcher, 25))
+
+    assert all(results)
+    assert [len(b) for b in sheets.batches] == [10, 10, 5]
+    # Order is preserved across batches
+    sent = [p['description'] for batch in sheets.batches for p in batch]
+    assert sent == [f"Item {i}" for i in range(25)]
+
+
+def test_batcher_flushes_after_delay():
+    """A lone transaction is flushed once the delay expires."""
+    sheets = FakeSheets()
+    batcher = SheetsBatcher(sheets, max_items=100, max_delay_ms=20)
+
+    results = asyncio.run(_submit_all(batcher, 1))
+
+    assert results == [True]
+    assert len(sheets.batches) == 1
+
+
+def test_batcher_reports_failure_to_every_caller():
+    """When the bulk request fails, every transaction in it sees the failure."""
+    sheets = FakeSheets(succeed=False)
+    batcher = SheetsBatcher(sheets, max_items=5, max_delay_ms=50)
+
+    results = asyncio.run(_submit_all(batcher, 5))
+
+    assert results == [False] * 5
+
+
+def test_invalid_payload_does_not_fail_its_batch():
+    """Each caller gets its own payload's outcome, not one shared flag for the batch."""
+    sheets = FakeSheets(invalid=("Item 2",))
+    batcher = SheetsBatcher(sheets, max_items=5, max_delay_ms=50)
+
+    results = asyncio.run(_submit_all(batcher, 5))
+
+    assert len(sheets.batches) == 1
+    assert results == [True, True, False, True, True]
+
+
+def test_rows_refused_by_the_script_are_reported_per_key():
+    """The script's per-row verdicts reach the payloads they belong to."""
+    async def scenario(url):
+        sheets = SheetsIntegration(api_url=url, rate_limit=0)
+        try:
+            payloads = [{'idempotency_key': 'k1'}, {'idempotency_key': 'k2'}, {'idempotency_key': 'k3'}]
+            return await sheets.send_payloads_each(payloads), sheets.breaker.state
+        finally:
+            await sheets.close()
+
+    body = b'{"saved": 2, "invalid": {"k2": "Amount must be a positive number"}}'
+    with StubSheetsServer(body=body) as stub:
+        results, state = asyncio.run(scenario(stub.url))
+
+    assert results == [Delivery(SAVED), Delivery(INVALID, "Amount must be a positive number"), Delivery(SAVED)]
+    assert state == 'closed'
+
+
+def test_batcher_sends_directly_when_not_started():
+    """Without a running worker, submit falls back to a single send."""
+    sheets = FakeSheets()
+    batcher = SheetsBatcher(sheets)
+
+    assert asyncio.run(batcher.submit(make_expense(1)))
+    assert len(sheets.batches) == 1
+
+
+def test_batcher_stop_gives_up_after_timeout():
+    """Payloads not flushed by the shutdown deadline are reported as failed."""
+    async def scenario():
+        sheets = FakeSheets(delay=10)
+        batcher = SheetsBatcher(sheets, max_items=1, max_delay_ms=0)
+        await batcher.start()
+        pending = [asyncio.ensure_future(batcher.submit(make_expense(i))) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await batcher.stop(timeout=0.1)
+        return await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), 1), batcher.running
+
+    results, running = asyncio.run(scenario())
+    assert not running
+    assert results == [False, False, False]
+
+
+if __name__ == "__main__":
+    test_batcher_coalesces_by_size()
+    test_batcher_flushes_after_delay()
+    test_batcher_reports_failure_to_every_caller()
+    test_invalid_payload_does_not_fail_its_batch()
+    test_rows_refused_by_the_script_are_reported_per_key()
+    test_batcher_sends_directly_when_not_started()
+    test_batcher_stop_gives_up_after_timeout()
+    print("✅ All batcher tests passed")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for monthly category budgets and their threshold warnings
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from aggregates import AggregateEngine
+from budgets import BudgetAlert, BudgetBook
+from formatters import format_budget_alerts
+from models import Expense, Income
+
+
+def _expense(amount: str, category: str = "Food", date: str = "2025-07-25") -> Expense:
+    return Expense(amount=amount, category=category, account="Cash", name="x", date=date)
+
+
+def _record(book: BudgetBook, chat_id: int, transaction) -> BudgetAlert:
+    book.aggregates.apply(chat_id, transaction)
+    return book.check(chat_id, transaction)
+
+
+def test_warns_once_at_each_threshold():
+    async def scenario(path):
+        book = BudgetBook(path, aggregates=AggregateEngine())
+        book.aggregates.apply(1, _expense("50", date="2025-06-30"))  # Last month does not count
+        await book.set(1, "Food", 100_00)
+        return [
+            _record(book, 1, _expense("70")),
+            _record(book, 1, _expense("15")),   # 85%: crosses 80
+            _record(book, 1, _expense("5")),    # 90%: already warned
+            _record(book, 1, _expense("10")),   # Exactly 100%
+            _record(book, 1, _expense("1")),
+            _record(book, 1, _expense("500", category="Transportation")),  # No budget
+            _record(book, 1, Income(amount="500", category="Food", account="Cash", name="x", date="2025-07-25")),
+            _record(book, 2, _expense("500")),  # Another chat's budgets are separate
+        ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        alerts = asyncio.run(scenario(os.path.join(tmp, 'budgets.json')))
+    assert alerts == [None, BudgetAlert("Food", "2025-07", 80, 85_00, 100_00), None,
+                      BudgetAlert("Food", "2025-07", 100, 100_00, 100_00), None, None, None, None]
+    assert "Over budget" in format_budget_alerts([alerts[3]]) and "80% of budget" in format_budget_alerts([alerts[1]])
+    assert format_budget_alerts([]) == ""
+
+
+def test_one_expense_past_both_thresholds_warns_once():
+    async def scenario(path):
+        book = BudgetBook(path, aggregates=AggregateEngine())
+        await book.set(1, "Food", 100_00)
+        return _record(book, 1, _expense("150"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        assert asyncio.run(scenario(os.path.join(tmp, 'budgets.json'))) == BudgetAlert("Food", "2025-07", 100, 150_00, 100_00)
+
+
+def test_budgets_are_saved_and_removed():
+    async def scenario(path):
+        book = BudgetBook(path, aggregates=AggregateEngine())
+        await book.set(1, "Food", 100_00)
+        await book.set(1, "Travel", 300_00)
+        await book.set(2, "Food", 50_00)
+        await book.set(1, "Travel", 0)
+        restored = BudgetBook(path, aggregates=AggregateEngine())
+        await restored.start()
+        return restored
+
+    with tempfile.TemporaryDirectory() as tmp:
+        restored = asyncio.run(scenario(os.path.join(tmp, 'budgets.json')))
+    assert restored.budgets_for(1) == {"Food": 100_00}
+    assert restored.budgets_for(2) == {"Food": 50_00}
+    assert restored.count == 2
+
+
+if __name__ == "__main__":
+    test_warns_once_at_each_threshold()
+    test_one_expense_past_both_thresholds_warns_once()
+    test_budgets_are_saved_and_removed()
+    print("✅ All budget tests passed")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for concurrent, per-chat ordered update processing
+"""
+
+import sys
+import os
+import asyncio
+import time
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from telegram import Update
+
+from benchmarks.stub_server import StubSheetsServer
+from models import Expense
+from concurrency import PerChatUpdateProcessor
+from sheets import SheetsIntegration
+
+CHATS = 20
+UPDATES_PER_CHAT = 3
+SHEETS_DELAY = 0.02
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': f"- {update_id} Other Cash Item",
+        },
+    }, None)
+
+
+async def simulate(url: str, max_updates: int, max_sheets: int) -> dict:
+    """Feed updates from many chats through the processor; each saves one row to Sheets."""
+    sheets = SheetsIntegration(api_url=url, max_concurrency=max_sheets, rate_limit=0)
+    processor = PerChatUpdateProcessor(max_updates)
+    handled = {}  # chat_id -> update ids in the order they finished
+    running = set()
+    overlaps = []
+
+    async def handle(update: Update) -> None:
+        chat_id = update.effective_chat.id
+        if chat_id in running:
+            overlaps.append(chat_id)
+        running.add(chat_id)
+        expense = Expense(amount=1.0, category="Other", account="Cash", name="Item", date="2025-07-25")
+        assert await sheets.send_to_sheets(expense)
+        running.discard(chat_id)
+        handled.setdefault(chat_id, []).append(update.update_id)
+
+    updates = [make_update(i, 100 + i % CHATS) for i in range(CHATS * UPDATES_PER_CHAT)]
+    await sheets.start()
+    started = time.perf_counter()
+    try:
+        async with processor:
+            # The Application starts one task per update in arrival order
+            await asyncio.gather(*(
+                asyncio.create_task(processor.process_update(update, handle(update)))
+                for update in updates
+            ))
+    finally:
+        await sheets.close()
+    return {
+        'elapsed': time.perf_counter() - started,
+        'handled': handled,
+        'overlaps': overlaps,
+        'active_chats': processor.active_chats,
+    }
+
+
+def test_throughput_scales_with_limit():
+    """Raising the global limit lets slow Sheets calls from different chats overlap."""
+    with StubSheetsServer(delay=SHEETS_DELAY) as stub:
+        sequential = asyncio.run(simulate(stub.url, max_updates=1, max_sheets=64))
+        concurrent = asyncio.run(simulate(stub.url, max_updates=20, max_sheets=64))
+
+    total = CHATS * UPDATES_PER_CHAT
+    assert sequential['elapsed'] >= total * SHEETS_DELAY
+    assert concurrent['elapsed'] * 3 < sequential['elapsed']
+    print(f"limit=1: {total / sequential['elapsed']:.0f} updates/s, "
+          f"limit=20: {total / concurrent['elapsed']:.0f} updates/s")
+
+
+def test_sheets_semaphore_bounds_outbound_calls():
+    """The Sheets semaphore caps outbound requests even when many updates run at once."""
+    with StubSheetsServer(delay=SHEETS_DELAY) as stub:
+        capped = asyncio.run(simulate(stub.url, max_updates=20, max_sheets=1))
+
+    assert capped['elapsed'] >= CHATS * UPDATES_PER_CHAT * SHEETS_DELAY
+
+
+def test_updates_stay_ordered_per_chat():
+    """Updates from one chat never overlap and finish in arrival order."""
+    with StubSheetsServer(delay=SHEETS_DELAY) as stub:
+        result = asyncio.run(simulate(stub.url, max_updates=20, max_sheets=64))
+
+    assert not result['overlaps']
+    for chat_id, update_ids in result['handled'].items():
+        assert update_ids == sorted(update_ids)
+        assert len(update_ids) == UPDATES_PER_CHAT
+    # Per-chat queues are released once a chat goes idle
+    assert result['active_chats'] == 0
+
+
+def test_busy_chat_does_not_starve_others():
+    """Updates queued behind one busy chat hold no global slot."""
+    async def scenario():
+        processor = PerChatUpdateProcessor(4)
+        finished = {}
+
+        async def handle(update: Update, delay: float) -> None:
+            await asyncio.sleep(delay)
+            finished[update.update_id] = time.perf_counter() - started
+
+        busy = [make_update(i, 1) for i in range(6)]
+        other = make_update(100, 2)
+        started = time.perf_counter()
+        async with processor:
+            tasks = [asyncio.create_task(processor.process_update(update, handle(update, 0.2))) for update in busy]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(processor.process_update(other, handle(other, 0))))
+            await asyncio.gather(*tasks)
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert finished[100] < 0.1
+    assert [finished[i] for i in range(6)] == sorted(finished[i] for i in range(6))
+
+
+if __name__ == "__main__":
+    test_throughput_scales_with_limit()
+    test_sheets_semaphore_bounds_outbound_calls()
+    test_updates_stay_ordered_per_chat()
+    test_busy_chat_does_not_starve_others()
+    print("✅ All concurrency tests passed")
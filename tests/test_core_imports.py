@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test that the core library imports without credentials or the bot stack
+"""
+
+import sys
+import os
+import subprocess
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmarks.bench_import_time import SRC_DIR, clean_env
+
+from config import Settings
+
+
+def run_isolated(code: str, **env) -> subprocess.CompletedProcess:
+    """Run ``code`` in a fresh interpreter with src on the path and no bot credentials."""
+    return subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=SRC_DIR, env={**clean_env(), **env}, capture_output=True, text=True
+    )
+
+
+def test_core_modules_import_without_credentials():
+    """Parser, models and formatters load without BOT_TOKEN, Telegram, httpx or .env parsing."""
+    result = run_isolated(
+        "import sys, config, parser, models, formatters, importer\n"
+        "parser.FinanceParser().parse_bulk('- 50 Transportation Cash Bus')\n"
+        "print(sorted(m for m in ('telegram', 'httpx', 'dotenv') if m in sys.modules), config._settings)"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[] None"
+
+
+def test_settings_are_read_on_first_use():
+    """Module-level names resolve lazily from the environment."""
+    result = run_isolated(
+        "import config\n"
+        "from config import SHEETS_TIMEOUT, OUTBOX_PATH\n"
+        "print(SHEETS_TIMEOUT, OUTBOX_PATH, config.BOT_TOKEN)",
+        SHEETS_TIMEOUT='3', DATA_DIR='/tmp/moneybot'
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['3.0', '/tmp/moneybot/outbox.sqlite3', 'None']
+
+
+def test_sheets_reads_settings_when_the_integration_is_built():
+    """Importing sheets reads no settings; the default integration picks them up on first use."""
+    result = run_isolated(
+        "import os, config, sheets\n"
+        "loaded_at_import = config._settings\n"
+        "os.environ['SHEETS_TIMEOUT'] = '7'\n"
+        "print(loaded_at_import, sheets.sheets_integration.timeout, sheets.sheets_integration is sheets.get_sheets_integration())"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['None', '7.0', 'True']
+
+
+def test_delivery_modules_read_settings_when_their_objects_are_built():
+    """Batcher, outbox, tenants and recurring read no settings and build nothing at import."""
+    result = run_isolated(
+        "import os, config, batcher, outbox, tenants, recurring\n"
+        "loaded_at_import = config._settings\n"
+        "built_at_import = (batcher._sheets_batcher, outbox._outbox, tenants._tenant_registry, recurring._recurring_scheduler)\n"
+        "os.environ['OUTBOX_MAX_ATTEMPTS'] = '4'\n"
+        "print(loaded_at_import, set(built_at_import), outbox.outbox.max_attempts, outbox.outbox.batcher is batcher.sheets_batcher)"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['None', '{None}', '4', 'True']
+
+
+def validation_error(**env) -> str:
+    """The ValueError message for settings read from ``env``, or '' if they are valid."""
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        Settings.from_env().validate()
+        return ''
+    except ValueError as e:
+        return str(e)
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def test_validate_requires_credentials():
+    """The bot refuses to start without a token, a Sheets URL or complete webhook settings."""
+    valid = {'BOT_TOKEN': 'token', 'SHEETS_API': 'http://127.0.0.1/exec', 'BOT_MODE': 'polling'}
+    assert validation_error(**valid) == ''
+    assert 'BOT_TOKEN' in validation_error(**{**valid, 'BOT_TOKEN': ''})
+    assert 'SHEETS_API' in validation_error(**{**valid, 'SHEETS_API': ''})
+    assert 'BOT_MODE' in validation_error(**{**valid, 'BOT_MODE': 'push'})
+    assert 'WEBHOOK_URL' in validation_error(**{**valid, 'BOT_MODE': 'webhook', 'WEBHOOK_URL': ''})
+
+
+if __name__ == "__main__":
+    test_core_modules_import_without_credentials()
+    test_settings_are_read_on_first_use()
+    test_sheets_reads_settings_when_the_integration_is_built()
+    test_delivery_modules_read_settings_when_their_objects_are_built()
+    test_validate_requires_credentials()
+    print("✅ All core import tests passed")
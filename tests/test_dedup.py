@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for duplicate update and transaction suppression
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dedup import DedupCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+LUNCH = "- 25.50 Other Cash Lunch"
+
+
+def test_redelivered_updates_are_suppressed():
+    cache = DedupCache(persist=False, window=60, clock=FakeClock())
+    assert not cache.seen_update(100, chat_id=42, message_id=7)
+    assert cache.seen_update(100, chat_id=42, message_id=7)
+    # The same message under a new update_id (e.g. after a webhook retry) is still a duplicate
+    assert cache.seen_update(101, chat_id=42, message_id=7)
+    assert not cache.seen_update(102, chat_id=42, message_id=8)
+    assert cache.stats()['update'] == 2
+
+
+def test_repeated_messages_are_suppressed_within_the_window():
+    clock = FakeClock()
+    cache = DedupCache(persist=False, window=3600, content_window=30, clock=clock)
+    assert not cache.seen_message(42, 7, LUNCH)
+    assert not cache.seen_message(42, 7, LUNCH)  # Not remembered until it was queued
+    cache.remember_message(42, 7, LUNCH)
+    assert cache.seen_message(42, 7, LUNCH)
+    assert not cache.seen_message(43, 7, LUNCH)  # Other chats are independent
+    assert not cache.seen_message(42, 8, LUNCH)  # The same spend sent again is a new transaction
+    assert not cache.seen_message(42, 7, "- 25.50 Other Cash Dinner")  # Edited text
+
+    clock.now += 31
+    assert not cache.seen_message(42, 7, LUNCH)
+    assert cache.stats()['content'] == 1
+
+    disabled = DedupCache(persist=False, content_window=0, clock=clock)
+    disabled.remember_message(42, 7, LUNCH)
+    assert not disabled.seen_message(42, 7, LUNCH)
+
+
+def test_cache_is_capped_with_lru_eviction():
+    cache = DedupCache(persist=False, max_size=3, window=60, clock=FakeClock())
+    for update_id in range(3):
+        cache.seen_update(update_id)
+    assert cache.seen_update(0)  # Hit: 0 becomes the most recently used
+    cache.seen_update(3)  # Evicts 1, the least recently used
+    assert cache.size == 3
+    assert not cache.seen_update(1)
+    assert cache.seen_update(0)
+
+
+def test_cache_survives_a_restart():
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'state', 'dedup.json')
+
+        async def run():
+            cache = DedupCache(path=path, window=60, clock=clock)
+            await cache.start()
+            cache.seen_update(100, chat_id=42, message_id=7)
+            cache.remember_message(42, 7, LUNCH)
+            await cache.stop()
+
+            restarted = DedupCache(path=path, window=60, clock=clock)
+            await restarted.start()
+            try:
+                assert restarted.seen_update(100)
+                assert restarted.seen_message(42, 7, LUNCH)
+            finally:
+                await restarted.stop()
+
+            clock.now += 61
+            expired = DedupCache(path=path, window=60, clock=clock)
+            await expired.start()
+            try:
+                assert not expired.seen_update(100)
+            finally:
+                await expired.stop()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_redelivered_updates_are_suppressed()
+    test_repeated_messages_are_suppressed_within_the_window()
+    test_cache_is_capped_with_lru_eviction()
+    test_cache_survives_a_restart()
+    print("✅ All dedup tests passed")
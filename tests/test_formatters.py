@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for reply templates and Markdown escaping
+"""
+
+import sys
+import os
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import formatters
+from formatters import (
+    configure_escaping,
+    escape_html,
+    escape_markdown,
+    format_bulk_response,
+    format_transaction_response,
+    get_accounts_message,
+    get_categories_message,
+    warm_static_replies,
+)
+from models import Expense, Transfer
+from parser import FinanceParser
+
+
+def test_transaction_replies():
+    expense = Expense(amount="1234.5", category="Food", account="Cash", name="Lunch", date="2025-07-25")
+    assert format_transaction_response(expense) == (
+        "💸 **Expense Recorded**\n\n"
+        "💰 Amount: Rp1,234.50\n"
+        "📂 Category: Food\n"
+        "🏦 Account: Cash\n"
+        "📝 Description: Lunch\n"
+        "📅 Date: 2025-07-25"
+    )
+    transfer = Transfer(amount=200, from_account="Cash", to_account="BRI", description="", date="2025-07-25")
+    assert format_transaction_response(transfer).endswith("📥 To: BRI\n📅 Date: 2025-07-25")
+    described = Transfer(amount=200, from_account="Cash", to_account="BRI", description="ATM", date="2025-07-25")
+    assert format_transaction_response(described).endswith("\n📝 Description: ATM")
+    assert format_transaction_response(object()) == "❌ Unknown transaction type"
+
+    # Braces in the currency or in a field value are shown as they are
+    render = formatters.compile_template("{currency}{amount:,.2f} {name}", currency="{$}")
+    assert render(amount=1500, name="{x}") == "{$}1,500.00 {x}"
+
+
+def test_user_text_is_escaped():
+    expense = Expense(amount=5, category="Food", account="Cash", name="snack_bar *deal* [1]", date="2025-07-25")
+    assert "📝 Description: snack\\_bar \\*deal\\* \\[1]" in format_transaction_response(expense)
+
+    result = FinanceParser().parse_bulk("- 5 Food Cash ok\n- x`y")
+    assert "`- x'y`" in format_bulk_response(result)
+
+    assert escape_markdown("1.5 (a_b)", version=2) == "1\\.5 \\(a\\_b\\)"
+    assert escape_html("<b>&</b>") == "&lt;b&gt;&amp;&lt;/b&gt;"
+
+    configure_escaping(False)
+    try:
+        assert "📝 Description: snack_bar *deal* [1]" in format_transaction_response(expense)
+    finally:
+        configure_escaping(True)
+
+
+def test_bulk_reply_with_no_valid_line_has_a_failure_header():
+    response = format_bulk_response(FinanceParser().parse_bulk("nonsense\n- x Food Cash"))
+    assert response.startswith("❌ **No Transactions Recorded**")
+    assert "0 Transactions" not in response
+    assert "2 line(s) could not be parsed" in response
+
+
+def test_static_replies_are_cached():
+    accounts = ("Cash", "Bank_A")
+    warm_static_replies([(accounts, ("Food",))])
+    first = get_accounts_message(accounts)
+    assert "• Bank\\_A" in first
+    assert get_accounts_message(list(accounts)) is first
+    assert get_categories_message(("Food",)) is get_categories_message(["Food"])
+    assert formatters.get_help_message() is formatters.get_help_message()
+
+
+if __name__ == "__main__":
+    test_transaction_replies()
+    test_user_text_is_escaped()
+    test_bulk_reply_with_no_valid_line_has_a_failure_header()
+    test_static_replies_are_cached()
+    print("✅ All formatter tests passed")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Test script for the Telegram message handler, using fake Telegram objects
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from types import SimpleNamespace
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import handlers
+from dedup import DedupCache
+from recurring import RecurringScheduler
+from aggregates import AggregateEngine
+from budgets import BudgetBook
+from formatters import BUDGET_USAGE
+
+
+class FakeMessage:
+    """Records replies and edits instead of calling the Telegram API."""
+
+    def __init__(self, text: str = '', log: list = None, message_id: int = 1):
+        self.text = text
+        self.message_id = message_id
+        self.log = log if log is not None else []
+
+    async def reply_text(self, text, **kwargs):
+        self.log.append(('reply', text))
+        return FakeMessage(text, self.log)
+
+    async def edit_text(self, text, **kwargs):
+        self.log.append(('edit', text))
+        self.text = text
+        return self
+
+
+class FakeApplication:
+    """Collects tasks created through context.application.create_task."""
+
+    def __init__(self):
+        self.tasks = []
+
+    def create_task(self, coroutine, update=None, **kwargs):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.append(task)
+        return task
+
+
+class FakeOutbox:
+    def __init__(self, succeed: bool = True):
+        self.succeed = succeed
+        self.submitted = []
+
+    async def put(self, transaction):
+        self.submitted.append(transaction)
+        return f"key-{len(self.submitted)}"
+
+    async def put_many(self, transactions, track=True, endpoint=None):
+        return [await self.put(transaction) for transaction in transactions]
+
+    async def wait_for(self, key):
+        return self.succeed
+
+
+class BrokenOutbox(FakeOutbox):
+    """An outbox whose disk write fails."""
+
+    async def put_many(self, transactions, track=True, endpoint=None):
+        raise OSError("disk full")
+
+
+class FakeLedger:
+    def __init__(self):
+        self.recorded = []
+
+    async def record_many(self, chat_id, transactions, keys=None):
+        self.recorded.extend((chat_id, t) for t in transactions)
+        return len(transactions)
+
+
+async def _handle(text: str, succeed: bool = True, dedup: DedupCache = None, outbox: FakeOutbox = None,
+                  message_id: int = 1):
+    message = FakeMessage(text, message_id=message_id)
+    update = SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=42),
+                             effective_user=SimpleNamespace(id=7))
+    context = SimpleNamespace(application=FakeApplication())
+    outbox = outbox or FakeOutbox(succeed)
+    ledger = FakeLedger()
+
+    originals = handlers.outbox, handlers.ledger, handlers.dedup_cache
+    handlers.outbox, handlers.ledger = outbox, ledger
+    handlers.dedup_cache = dedup or DedupCache(persist=False)
+    try:
+        await handlers.handle_message(update, context)
+        await asyncio.gather(*context.application.tasks)
+    finally:
+        handlers.outbox, handlers.ledger, handlers.dedup_cache = originals
+    return message.log, outbox, ledger
+
+
+def test_background_write_edits_reply_in_place():
+    """One reply is sent immediately and later edited with the saved status."""
+    log, outbox, ledger = asyncio.run(_handle("- 50.00 Transportation Cash Bus fare"))
+
+    assert len(outbox.submitted) == 1
+    assert ledger.recorded == [(42, outbox.submitted[0])]
+    assert [kind for kind, _ in log] == ['reply', 'edit']
+    assert "Saving to spreadsheet" in log[0][1]
+    assert "Data saved to spreadsheet" in log[1][1]
+
+
+def test_background_write_reports_failure():
+    log, _, _ = asyncio.run(_handle("+ 1000.00 Salary BRI Monthly salary", succeed=False))
+
+    assert [kind for kind, _ in log] == ['reply', 'edit']
+    assert "Spreadsheet unavailable" in log[1][1]
+
+
+def test_invalid_message_is_not_saved():
+    log, outbox, _ = asyncio.run(_handle("invalid message"))
+
+    assert outbox.submitted == []
+    assert len(log) == 1 and "Invalid format" in log[0][1]
+
+
+def test_bulk_message_gets_one_consolidated_reply():
+    text = "- 50.00 Transportation Cash Bus fare\n+ 1000.00 Salary BRI Monthly salary\nnonsense"
+    log, outbox, _ = asyncio.run(_handle(text))
+
+    assert len(outbox.submitted) == 2
+    assert [kind for kind, _ in log] == ['reply', 'edit']
+    assert "2 Transactions Recorded" in log[0][1]
+    assert "Line 3" in log[0][1]
+
+
+def test_typed_names_are_corrected():
+    """Misspelled names are saved under their canonical spelling and the reply says so."""
+    log, outbox, _ = asyncio.run(_handle("- 50.00 transport csah Bus fare"))
+
+    assert (outbox.submitted[0].category, outbox.submitted[0].account) == ("Transportation", "Cash")
+    assert "transport → Transportation" in log[0][1]
+    assert "csah → Cash" in log[0][1]
+
+
+def test_unknown_name_is_not_saved():
+    log, outbox, _ = asyncio.run(_handle("- 50.00 Transportation Wallet Bus fare"))
+
+    assert outbox.submitted == []
+    assert len(log) == 1 and "Unknown account" in log[0][1]
+    assert "/accounts" in log[0][1]
+
+
+def test_repeated_message_is_not_saved_or_answered():
+    dedup = DedupCache(persist=False)
+    asyncio.run(_handle("- 50.00 Transportation Cash Bus fare", dedup=dedup, message_id=5))
+    log, outbox, ledger = asyncio.run(_handle("- 50.00 Transportation Cash Bus fare", dedup=dedup, message_id=5))
+
+    assert outbox.submitted == [] and ledger.recorded == [] and log == []
+    assert dedup.stats()['content'] == 1
+
+
+def test_identical_transactions_in_separate_messages_are_both_saved():
+    dedup = DedupCache(persist=False)
+    asyncio.run(_handle("- 50.00 Transportation Cash Bus fare", dedup=dedup, message_id=5))
+    log, outbox, _ = asyncio.run(_handle("- 50.00 Transportation Cash Bus fare", dedup=dedup, message_id=6))
+
+    assert len(outbox.submitted) == 1 and "Expense Recorded" in log[0][1]
+    assert dedup.stats()['content'] == 0
+
+
+def test_message_that_failed_to_queue_can_be_resent():
+    dedup = DedupCache(persist=False)
+    failed, _, _ = asyncio.run(_handle("- 50.00 Transportation Cash Bus fare", dedup=dedup, outbox=BrokenOutbox()))
+    log, outbox, _ = asyncio.run(_handle("- 50.00 Transportation Cash Bus fare", dedup=dedup))
+
+    assert "An error occurred" in failed[-1][1]
+    assert len(outbox.submitted) == 1 and "Expense Recorded" in log[0][1]
+
+
+def test_recurring_add_and_list():
+    async def command(*args):
+        message = FakeMessage('/recurring ' + ' '.join(args))
+        update = SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=42),
+                                 effective_user=SimpleNamespace(id=7))
+        await handlers.recurring_command(update, SimpleNamespace(args=list(args)))
+        return message.log[-1][1]
+
+    async def scenario(path):
+        original = handlers.recurring_scheduler
+        handlers.recurring_scheduler = RecurringScheduler(path)
+        try:
+            added = await command('add', '0', '9', '25', '*', '*', '+', '5000', 'salary', 'BRI', 'Monthly', 'pay')
+            unknown = await command('add', '@monthly', '-', '15', 'Entertainment', 'Wallet', 'Streaming')
+            bad_schedule = await command('add', '0', '25', '*', '*', '*', '-', '15', 'Other', 'Cash', 'x')
+            listed = await command('list')
+            await handlers.recurring_scheduler.stop()
+        finally:
+            handlers.recurring_scheduler = original
+        return added, unknown, bad_schedule, listed
+
+    with tempfile.TemporaryDirectory() as tmp:
+        added, unknown, bad_schedule, listed = asyncio.run(scenario(os.path.join(tmp, 'recurring.sqlite3')))
+    assert "#1 added" in added and "`0 9 25 * *`" in added
+    assert "Unknown account" in unknown
+    assert "invalid schedule" in bad_schedule
+    assert "#1 `0 9 25 * *` `+ 5000 salary BRI Monthly pay`" in listed
+
+
+def test_budget_warning_is_part_of_the_reply():
+    async def command(*args):
+        message = FakeMessage('/budget ' + ' '.join(args))
+        update = SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=42),
+                                 effective_user=SimpleNamespace(id=7))
+        await handlers.budget_command(update, SimpleNamespace(args=list(args)))
+        return message.log[-1][1]
+
+    async def scenario(path):
+        originals = handlers.aggregates, handlers.budget_book
+        handlers.aggregates = AggregateEngine()
+        handlers.budget_book = BudgetBook(path, aggregates=handlers.aggregates)
+        try:
+            # The example in the usage reply works as written
+            example = await command(*BUDGET_USAGE.rsplit('`/budget ', 1)[1].rstrip('`\n').split())
+            set_reply = await command('shop', '100', 'monthly')
+            unknown = await command('Wallet', '100')
+            under, _, _ = await _handle("- 50.00 Shopping Cash Shoes")
+            crossed, _, _ = await _handle("- 40.00 Shopping Cash Socks")
+            listed = await command()
+        finally:
+            handlers.aggregates, handlers.budget_book = originals
+        return set_reply, unknown, example, under, crossed, listed
+
+    with tempfile.TemporaryDirectory() as tmp:
+        set_reply, unknown, example, under, crossed, listed = asyncio.run(scenario(os.path.join(tmp, 'budgets.json')))
+    assert "Budget set:** Shopping" in set_reply
+    assert "Unknown category" in unknown
+    assert "Budget set:**" in example
+    assert "budget" not in under[0][1]
+    assert "80% of budget:** Shopping Rp90.00 of Rp100.00" in crossed[0][1]
+    assert "Shopping: Rp90.00 of Rp100.00 (90%)" in listed
+
+
+if __name__ == "__main__":
+    test_background_write_edits_reply_in_place()
+    test_background_write_reports_failure()
+    test_invalid_message_is_not_saved()
+    test_bulk_message_gets_one_consolidated_reply()
+    test_typed_names_are_corrected()
+    test_unknown_name_is_not_saved()
+    test_repeated_message_is_not_saved_or_answered()
+    test_identical_transactions_in_separate_messages_are_both_saved()
+    test_message_that_failed_to_queue_can_be_resent()
+    test_recurring_add_and_list()
+    test_budget_warning_is_part_of_the_reply()
+    print("✅ All handler tests passed")
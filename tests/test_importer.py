@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for CSV / bank statement imports
+"""
+
+import sys
+import os
+import tempfile
+import tracemalloc
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models import Expense, Income, Transfer
+from importer import ImportFormatError, iter_csv_transactions, chunked
+from resolver import Resolver
+
+
+def write_csv(directory: str, content: str) -> str:
+    path = os.path.join(directory, 'import.csv')
+    with open(path, 'w', encoding='utf-8') as csv_file:
+        csv_file.write(content)
+    return path
+
+
+def test_native_layout():
+    content = (
+        "type,date,amount,category,account,description,from_account,to_account\n"
+        "expense,2025-07-01,50.00,Transportation,Cash,Bus fare,,\n"
+        "income,2025-07-02,\"1,000.00\",Salary,BRI,Monthly salary,,\n"
+        "transfer,2025-07-03,200,,,ATM deposit,Cash,BRI\n"
+        "refund,2025-07-04,10,Other,Cash,Unknown type,,\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = list(iter_csv_transactions(write_csv(tmp, content)))
+
+    assert rows[0] == (2, Expense(50.0, "Transportation", "Cash", "Bus fare", "2025-07-01"), None)
+    assert rows[1] == (3, Income(1000.0, "Salary", "BRI", "Monthly salary", "2025-07-02"), None)
+    assert rows[2] == (4, Transfer(200.0, "Cash", "BRI", "ATM deposit", "2025-07-03"), None)
+    assert rows[3][0] == 5 and rows[3][1] is None and "unknown type" in rows[3][2]
+
+
+def test_bank_statement_layout():
+    content = (
+        "Date,Description,Debit,Credit\n"
+        "01/07/2025,Coffee shop,25000,\n"
+        "02/07/2025,Salary,,5000000\n"
+        "\n"
+        "03/07/2025,Broken row,,\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = list(iter_csv_transactions(write_csv(tmp, content), default_account="BRI"))
+
+    assert rows[0][1] == Expense(25000.0, "Other", "BRI", "Coffee shop", "2025-07-01")
+    assert rows[1][1] == Income(5000000.0, "Other", "BRI", "Salary", "2025-07-02")
+    assert rows[2][0] == 5 and rows[2][1] is None
+
+
+def test_rows_without_amount_or_account_are_reported():
+    content = (
+        "type,date,amount,category,account,description,from_account,to_account\n"
+        "expense,2025-07-01,,Food,Cash,No amount,,\n"
+        "expense,2025-07-01,0,Food,Cash,Zero amount,,\n"
+        "income,2025-07-02,100,Salary,,No account,,\n"
+        "transfer,2025-07-03,200,,,No destination,Cash,\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = list(iter_csv_transactions(write_csv(tmp, content)))
+
+    assert [(row_number, transaction) for row_number, transaction, _ in rows] == [(2, None), (3, None), (4, None), (5, None)]
+    assert [error for _, _, error in rows] == [
+        "missing amount", "amount must be greater than zero", "missing account", "missing to account",
+    ]
+
+
+def test_names_go_through_the_resolver():
+    content = (
+        "type,date,amount,category,account,description\n"
+        "expense,2025-07-01,50,transport,bri,Bus fare\n"
+        "expense,2025-07-01,50,Snacks,Cash,Unknown category\n"
+    )
+    resolver = Resolver(["Transportation", "Other"], ["Cash", "BRI"])
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = list(iter_csv_transactions(write_csv(tmp, content), resolver=resolver))
+
+    assert rows[0] == (2, Expense(50.0, "Transportation", "BRI", "Bus fare", "2025-07-01"), None)
+    assert rows[1][0] == 3 and rows[1][1] is None and "Unknown category 'Snacks'" in rows[1][2]
+
+
+def test_unknown_layout_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_csv(tmp, "foo,bar\n1,2\n")
+        try:
+            list(iter_csv_transactions(path))
+        except ImportFormatError:
+            pass
+        else:
+            raise AssertionError("Expected ImportFormatError")
+
+
+def test_large_file_streams_with_flat_memory():
+    """Streaming a large file in chunks never holds more than one chunk in memory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'import.csv')
+        with open(path, 'w', encoding='utf-8') as csv_file:
+            csv_file.write("type,date,amount,category,account,description\n")
+            for i in range(20_000):
+                csv_file.write(f"expense,2025-07-01,{i}.00,Other,Cash,Row {i}\n")
+
+        tracemalloc.start()
+        total = 0
+        for chunk in chunked(iter_csv_transactions(path), 500):
+            total += len(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    assert total == 20_000
+    assert peak < 2 * 1024 * 1024, f"peak memory {peak} bytes"
+
+
+if __name__ == "__main__":
+    test_native_layout()
+    test_bank_statement_layout()
+    test_rows_without_amount_or_account_are_reported()
+    test_names_go_through_the_resolver()
+    test_unknown_layout_is_rejected()
+    test_large_file_streams_with_flat_memory()
+    print("✅ All importer tests passed")
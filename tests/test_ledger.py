@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test script for the local read-side ledger
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models import Expense, Income, Transfer
+from ledger import Ledger
+
+TRANSACTIONS = [
+    Income(amount=1000.00, category="Salary", account="BRI", name="Monthly salary", date="2025-07-01"),
+    Expense(amount=50.25, category="Transportation", account="Cash", name="Bus fare", date="2025-07-02"),
+    Transfer(amount=200.00, from_account="BRI", to_account="Cash", description="ATM", date="2025-07-03"),
+    Expense(amount=30.00, category="Shopping", account="BRI", name="Groceries", date="2025-08-01"),
+]
+
+
+class FakeSheets:
+    """Serves the export endpoint from in-memory rows, two per page."""
+
+    def __init__(self, rows_by_type):
+        self.rows_by_type = rows_by_type
+
+    async def fetch_export(self, transaction_type, offset, limit):
+        rows = self.rows_by_type.get(transaction_type, [])
+        page = rows[offset:offset + 2]
+        next_offset = offset + 2 if offset + 2 < len(rows) else None
+        return {'rows': page, 'next_offset': next_offset}
+
+
+class FailingSheets(FakeSheets):
+    """Fails on the income sheet, after the expense pages were served."""
+
+    async def fetch_export(self, transaction_type, offset, limit):
+        if transaction_type == 'income':
+            raise TimeoutError("export timed out")
+        return await super().fetch_export(transaction_type, offset, limit)
+
+
+def run_with_ledger(scenario):
+    async def runner(path):
+        ledger = Ledger(path=path)
+        await ledger.start()
+        try:
+            return await scenario(ledger)
+        finally:
+            await ledger.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        return asyncio.run(runner(os.path.join(tmp, 'ledger.sqlite3')))
+
+
+def test_running_balances():
+    async def scenario(ledger):
+        await ledger.record_many(1, TRANSACTIONS, ['a', 'b', 'c', 'd'])
+        # Recording the same keys again is ignored
+        await ledger.record_many(1, TRANSACTIONS, ['a', 'b', 'c', 'd'])
+        return await ledger.balances(1), await ledger.balances(2)
+
+    balances, other_chat = run_with_ledger(scenario)
+    assert balances['BRI'] == 100000 - 20000 - 3000
+    assert balances['Cash'] == -5025 + 20000
+    assert balances['Gopay'] == 0
+    assert all(balance == 0 for balance in other_chat.values())
+
+
+def test_monthly_summary():
+    async def scenario(ledger):
+        await ledger.record_many(1, TRANSACTIONS)
+        return await ledger.summary(1, '2025-07'), await ledger.summary(1, '2025-09')
+
+    july, september = run_with_ledger(scenario)
+    assert july['income'] == 100000
+    assert july['expense'] == 5025
+    assert july['transfer'] == 20000
+    assert july['categories'] == [('Transportation', 5025)]
+    assert july['count'] == 3
+    assert september['count'] == 0
+
+
+def test_resync_pages_through_export():
+    sheets = FakeSheets({
+        'expense': [
+            ['2025-07-02T10:00:00', '2025-07-02', 50.25, 'Transportation', 'Cash', 'Bus fare'],
+            ['2025-07-03T10:00:00', '2025-07-03', 10, 'Other', 'Cash', 'Snack'],
+            ['2025-07-04T10:00:00', '2025-07-04', 5, 'Other', 'Gopay', 'Parking'],
+        ],
+        'income': [['2025-07-01T10:00:00', '2025-07-01', 1000, 'Salary', 'BRI', 'Salary']],
+    })
+
+    async def scenario(ledger):
+        await ledger.record(1, TRANSACTIONS[0], 'stale')
+        loaded = await ledger.resync(1, sheets)
+        return loaded, await ledger.balances(1)
+
+    loaded, balances = run_with_ledger(scenario)
+    assert loaded == 4
+    assert balances['Cash'] == -6025
+    assert balances['Gopay'] == -500
+    assert balances['BRI'] == 100000
+
+
+
+def test_resync_leaves_other_chats_rows_and_keeps_pending_ones():
+    sheets = FakeSheets({
+        'expense': [
+            ['2025-07-02T10:00:00', '2025-07-02', 50.25, 'Transportation', 'Cash', 'Bus fare', 'mine'],
+            ['2025-07-03T10:00:00', '2025-07-03', 10, 'Other', 'Cash', 'Their snack', 'theirs'],
+            ['2025-07-04T10:00:00', '2025-07-04', 5, 'Other', 'Cash', 'Typed by hand', ''],
+        ],
+    })
+
+    async def scenario(ledger):
+        await ledger.record(1, TRANSACTIONS[1], 'mine')
+        await ledger.record(1, TRANSACTIONS[3], 'queued')  # Still in the outbox, not in the sheet
+        await ledger.record(1, TRANSACTIONS[0], 'stale')   # Removed from the sheet by hand
+        await ledger.record(2, Expense(amount=10, category="Other", account="Cash", name="Their snack", date="2025-07-03"), 'theirs')
+        loaded = await ledger.resync(1, sheets, keep_keys={'queued'})
+        return loaded, await ledger.balances(1), await ledger.balances(2)
+
+    loaded, balances, other_chat = run_with_ledger(scenario)
+    assert loaded == 2
+    assert balances['Cash'] == -5025 - 500
+    assert balances['BRI'] == -3000
+    assert other_chat['Cash'] == -1000
+
+
+
+def test_failed_resync_leaves_the_ledger_untouched():
+    sheets = FailingSheets({
+        'expense': [['2025-07-02T10:00:00', '2025-07-02', 5, 'Other', 'Cash', 'Snack', 'new']],
+    })
+
+    async def scenario(ledger):
+        await ledger.record_many(1, TRANSACTIONS, ['a', 'b', 'c', 'd'])
+        before = await ledger.balances(1), await ledger.summary(1, '2025-07')
+        try:
+            await ledger.resync(1, sheets)
+        except TimeoutError:
+            pass
+        else:
+            raise AssertionError("Expected TimeoutError")
+        return before, (await ledger.balances(1), await ledger.summary(1, '2025-07'))
+
+    before, after = run_with_ledger(scenario)
+    assert after == before
+
+
+if __name__ == "__main__":
+    test_running_balances()
+    test_monthly_summary()
+    test_resync_pages_through_export()
+    test_resync_leaves_other_chats_rows_and_keeps_pending_ones()
+    test_failed_resync_leaves_the_ledger_untouched()
+    print("✅ All ledger tests passed")
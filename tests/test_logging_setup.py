@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for structured, queued and redacted logging
+"""
+
+import sys
+import os
+import io
+import json
+import logging
+import threading
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from logging_setup import configure_logging, stop_logging, redact, parse_levels
+
+
+def capture(scenario, **options):
+    """Run a scenario with logging configured to write into a buffer; return the JSON lines."""
+    root = logging.getLogger()
+    saved = list(root.handlers), root.level
+    stream = io.StringIO()
+    try:
+        configure_logging(stream=stream, **options)
+        scenario()
+        stop_logging()  # Flushes the queue
+    finally:
+        root.handlers[:] = saved[0]
+        root.setLevel(saved[1])
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_redact_masks_amounts_and_descriptions():
+    payload = {'type': 'expense', 'amount': 50.0, 'category': 'Transportation', 'description': 'Bus fare'}
+    assert redact(f"Sending {payload}") == (
+        "Sending {'type': 'expense', 'amount': '***', 'category': 'Transportation', 'description': '***'}"
+    )
+    assert redact("Expense(amount=50.0, category='Other', account='Cash', name='Bus fare')") == (
+        "Expense(amount=***, category='Other', account='Cash', name=***)"
+    )
+    assert redact("Received message: - 50.00 Transportation Cash Bus fare") == "Received message: - ***"
+    assert redact("- 50.00 Transportation Cash Bus fare\n+ 10 Salary BRI Pay") == "- ***\n+ ***"
+    assert redact("Flushed batch of 12 payloads") == "Flushed batch of 12 payloads"
+
+
+def test_json_output_with_extras_and_redaction():
+    def scenario():
+        logging.getLogger('handlers').info("Parsed %s", {'amount': 12.5}, extra={'chat_id': 42, 'description': 'Rent'})
+
+    [entry] = capture(scenario, level='INFO', levels='', log_format='json', sample_rate=1, redact_data=True)
+    assert entry['level'] == 'INFO' and entry['logger'] == 'handlers'
+    assert entry['message'] == "Parsed {'amount': '***'}"
+    assert entry['chat_id'] == 42
+    assert entry['description'] == '***'
+
+
+def test_formatting_happens_off_the_calling_thread():
+    threads = []
+
+    class Spy:
+        def __str__(self):
+            threads.append(threading.current_thread())
+            return 'spy'
+
+    def scenario():
+        logging.getLogger('sheets').info("value %s", Spy())
+
+    [entry] = capture(scenario, level='INFO', levels='', log_format='json', sample_rate=1, redact_data=False)
+    assert entry['message'] == 'value spy'
+    assert threads and threading.main_thread() not in threads
+
+
+def test_sampling_and_per_module_levels():
+    def scenario():
+        for _ in range(50):
+            logging.getLogger('handlers').info("noise")
+        logging.getLogger('handlers').warning("kept")
+        logging.getLogger('sheets').info("below the module level")
+        logging.getLogger('sheets').error("sheets error")
+
+    entries = capture(scenario, level='INFO', levels='sheets=WARNING', log_format='json',
+                      sample_rate=0, redact_data=True)
+    assert [e['message'] for e in entries] == ['kept', 'sheets error']
+    assert parse_levels("sheets=warning, httpx=ERROR") == {'sheets': 'WARNING', 'httpx': 'ERROR'}
+
+
+if __name__ == "__main__":
+    test_redact_masks_amounts_and_descriptions()
+    test_json_output_with_extras_and_redaction()
+    test_formatting_happens_off_the_calling_thread()
+    test_sampling_and_per_module_levels()
+    print("✅ All logging tests passed")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus-style metrics registry and /metrics endpoint
+"""
+
+import sys
+import os
+import asyncio
+import time
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import httpx
+
+from metrics import MetricsRegistry
+
+
+def test_counters_and_histograms_render():
+    registry = MetricsRegistry(enabled=True)
+    failures = registry.counter('parse_failures_total', 'Parse failures', ('reason',))
+    stages = registry.histogram('stage_seconds', 'Stage timings', ('stage',), buckets=(0.1, 1.0))
+
+    failures.inc(reason='invalid_format')
+    failures.inc(2, reason='bulk_line')
+    stages.observe(0.05, stage='parse')
+    stages.observe(0.5, stage='parse')
+    stages.observe(5.0, stage='parse')
+    with stages.time(stage='reply'):
+        pass
+
+    text = asyncio.run(registry.render())
+    assert '# TYPE parse_failures_total counter' in text
+    assert 'parse_failures_total{reason="bulk_line"} 2' in text
+    assert 'stage_seconds_bucket{stage="parse",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="parse",le="1.0"} 2' in text
+    assert 'stage_seconds_bucket{stage="parse",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="parse"} 3' in text
+    assert stages.count(stage='reply') == 1
+
+
+def test_disabled_registry_records_nothing_cheaply():
+    registry = MetricsRegistry(enabled=False)
+    counter = registry.counter('c_total', 'Counter')
+    histogram = registry.histogram('h_seconds', 'Histogram')
+
+    started = time.perf_counter()
+    for _ in range(100000):
+        with histogram.time():
+            counter.inc()
+    elapsed = time.perf_counter() - started
+
+    assert counter.value() == 0 and histogram.count() == 0
+    assert elapsed < 0.5  # A few hundred nanoseconds per instrumented block
+
+
+def test_metrics_endpoint_serves_gauges():
+    async def scenario():
+        registry = MetricsRegistry(enabled=True)
+        registry.counter('requests_total', 'Requests', ('outcome',)).inc(outcome='success')
+
+        async def pending():
+            return 7
+        registry.gauge('outbox_pending', 'Pending payloads', pending)
+        registry.gauge('breaker_state', 'Breaker state', lambda: {('a',): 0, ('b',): 2}, labels=('endpoint',))
+
+        await registry.start(host='127.0.0.1', port=0)
+        try:
+            async with httpx.AsyncClient() as client:
+                metrics_response = await client.get(f"http://127.0.0.1:{registry.port}/metrics")
+                missing = await client.get(f"http://127.0.0.1:{registry.port}/other")
+        finally:
+            await registry.stop()
+        return metrics_response, missing
+
+    response, missing = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert 'requests_total{outcome="success"} 1' in response.text
+    assert 'outbox_pending 7.0' in response.text
+    assert 'breaker_state{endpoint="b"} 2.0' in response.text
+    assert missing.status_code == 404
+
+
+if __name__ == "__main__":
+    test_counters_and_histograms_render()
+    test_disabled_registry_records_nothing_cheaply()
+    test_metrics_endpoint_serves_gauges()
+    print("✅ All metrics tests passed")
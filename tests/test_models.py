@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the transaction models and their serializers
+"""
+
+import sys
+import os
+import dataclasses
+import json
+from decimal import Decimal
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models import Expense, Income, Transfer
+from parser import FinanceParser
+from ledger import to_minor
+import codec
+
+TIMESTAMP = "2025-07-25T10:00:00"
+
+
+def test_amounts_are_exact_decimals():
+    expense = Expense(amount=0.1, category="Other", account="Cash", name="Gum", date="2025-07-25")
+    assert expense.amount == Decimal("0.1")
+    assert Income(amount="1000.00", category="Salary", account="BRI", name="Pay", date="2025-07-25").amount == 1000
+    assert FinanceParser().parse_message("- 25.50 Food Cash Lunch").amount == Decimal("25.50")
+
+    # Float sums drift; Decimal sums and minor units do not
+    amounts = [Expense(amount=0.1, category="Other", account="Cash", name="Gum", date="2025-07-25").amount] * 3
+    assert sum(amounts) == Decimal("0.3")
+    assert to_minor(Decimal("0.29")) == 29
+    assert to_minor(Decimal("1234567.89")) == 123456789
+
+
+def test_models_are_frozen_and_slotted():
+    transfer = Transfer(amount=5, from_account="Cash", to_account="BRI", description="", date="2025-07-25")
+    assert not hasattr(transfer, '__dict__')
+    try:
+        transfer.amount = Decimal(6)
+    except dataclasses.FrozenInstanceError:
+        pass
+    else:
+        raise AssertionError("transactions must be immutable")
+    assert dataclasses.replace(transfer, to_account="Gopay").to_account == "Gopay"
+    assert len({transfer, dataclasses.replace(transfer)}) == 1
+
+
+def test_payloads():
+    expense = Expense(amount="50.25", category="Transportation", account="Cash", name="Bus fare", date="2025-07-25")
+    assert codec.to_payload(expense, TIMESTAMP) == {
+        'timestamp': TIMESTAMP, 'date': "2025-07-25", 'amount': 50.25, 'type': 'expense',
+        'category': "Transportation", 'account': "Cash", 'description': "Bus fare",
+    }
+    income = Income(amount=1000, category="Salary", account="BRI", name="Pay", date="2025-07-25")
+    assert codec.to_payload(income, TIMESTAMP)['type'] == 'income'
+    transfer = Transfer(amount=200, from_account="Cash", to_account="BRI", description="ATM", date="2025-07-25")
+    payload = codec.to_payload(transfer, TIMESTAMP)
+    assert (payload['type'], payload['from_account'], payload['to_account']) == ('transfer', "Cash", "BRI")
+
+    try:
+        codec.to_payload(object(), TIMESTAMP)
+    except ValueError as e:
+        assert "Unknown transaction type" in str(e)
+    else:
+        raise AssertionError("unknown types must be rejected")
+
+
+def test_json_round_trip():
+    expense = Expense(amount="19.99", category="Other", account="Cash", name="Kopi ☕", date="2025-07-25")
+    payload = {**codec.to_payload(expense, TIMESTAMP), 'idempotency_key': 'abc'}
+    encoded = codec.dumps(payload)
+    assert isinstance(encoded, bytes)
+    # Readable by the standard library whichever encoder produced it, and vice versa
+    assert json.loads(encoded) == payload
+    assert codec.loads(json.dumps(payload)) == payload
+    assert codec.loads(encoded.decode())['amount'] == 19.99
+
+
+if __name__ == "__main__":
+    test_amounts_are_exact_decimals()
+    test_models_are_frozen_and_slotted()
+    test_payloads()
+    test_json_round_trip()
+    print("✅ All model tests passed")
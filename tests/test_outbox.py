@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Test script for the durable Google Sheets outbox
+"""
+
+import sys
+import os
+import asyncio
+import sqlite3
+import tempfile
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models import Expense
+from outbox import Outbox
+from sheets import FAILED, INVALID, REJECTED, SAVED, Delivery
+
+
+class FakeSheets:
+    def __init__(self):
+        self.counter = 0
+
+    def prepare_payload(self, transaction):
+        self.counter += 1
+        return {'idempotency_key': f"key-{self.counter}", 'description': transaction.name}
+
+
+class FakeBatcher:
+    """Fails the first ``failures`` deliveries, then succeeds."""
+
+    def __init__(self, failures: int = 0):
+        self.sheets = FakeSheets()
+        self.failures = failures
+        self.delivered = []
+        self.retries = []  # Whether each delivery was flagged as a possible redelivery
+        self.attempts = 0
+
+    async def deliver(self, payload):
+        self.attempts += 1
+        self.retries.append(payload.get('retry', False))
+        if self.attempts <= self.failures:
+            return Delivery(FAILED, 'timeout')
+        self.delivered.append(payload['idempotency_key'])
+        return Delivery(SAVED)
+
+
+class RefusingBatcher(FakeBatcher):
+    """The script refuses payloads whose description is listed, with the given outcome."""
+
+    def __init__(self, refused: dict):
+        super().__init__()
+        self.refused = refused  # description -> outcome
+
+    async def deliver(self, payload):
+        self.attempts += 1
+        outcome = self.refused.get(payload['description'])
+        if outcome is not None:
+            return Delivery(outcome, 'Error: refused')
+        self.delivered.append(payload['idempotency_key'])
+        return Delivery(SAVED)
+
+
+class SlowBatcher(FakeBatcher):
+    """Never finishes a delivery until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def deliver(self, payload):
+        self.attempts += 1
+        await self.release.wait()
+        self.delivered.append(payload['idempotency_key'])
+        return Delivery(SAVED)
+
+
+class FakeEndpoints:
+    def __init__(self, batchers):
+        self.batchers = batchers
+
+    async def batcher_for(self, endpoint):
+        return self.batchers[endpoint]
+
+
+def make_expense(i: int) -> Expense:
+    return Expense(amount=float(i), category="Other", account="Cash", name=f"Item {i}", date="2025-07-25")
+
+
+async def _wait_until_empty(outbox: Outbox, timeout: float = 5.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while await outbox.pending() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def test_outbox_delivers_queued_transactions():
+    async def scenario(path):
+        batcher = FakeBatcher()
+        outbox = Outbox(path=path, batcher=batcher)
+        await outbox.start()
+        key = await outbox.put(make_expense(1))
+        assert await outbox.wait_for(key)
+        keys = await outbox.put_many([make_expense(i) for i in range(2, 50)], track=False)
+        await _wait_until_empty(outbox)
+        assert await outbox.pending() == 0
+        await outbox.stop()
+        return batcher, [key] + keys
+
+    with tempfile.TemporaryDirectory() as tmp:
+        batcher, keys = asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+    assert sorted(batcher.delivered) == sorted(keys)
+
+
+def test_outbox_retries_with_backoff():
+    async def scenario(path):
+        batcher = FakeBatcher(failures=2)
+        outbox = Outbox(path=path, batcher=batcher, base_delay=0.01, max_delay=0.05)
+        await outbox.start()
+        key = await outbox.put(make_expense(1))
+        first_attempt = await outbox.wait_for(key)
+        await _wait_until_empty(outbox)
+        await outbox.stop()
+        return batcher, first_attempt
+
+    with tempfile.TemporaryDirectory() as tmp:
+        batcher, first_attempt = asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+    assert first_attempt is False
+    assert batcher.attempts == 3
+    assert batcher.retries == [False, True, True]
+    assert batcher.delivered == ['key-1']
+
+
+def test_refused_payloads_become_dead_letters():
+    """A payload the script always refuses stops being retried; the others are delivered."""
+    async def scenario(path):
+        batcher = RefusingBatcher({"Item 1": INVALID, "Item 2": REJECTED})
+        outbox = Outbox(path=path, batcher=batcher, base_delay=0.01, max_delay=0.02, max_attempts=3)
+        await outbox.start()
+        keys = await outbox.put_many([make_expense(i) for i in range(4)])
+        first = [await outbox.wait_for(key) for key in keys]
+        await _wait_until_empty(outbox)
+        attempts = batcher.attempts
+        await asyncio.sleep(0.1)  # Nothing is retried any more
+        result = (first, attempts, batcher.attempts, await outbox.pending(), await outbox.dead_letters(),
+                  batcher.delivered)
+        await outbox.stop()
+        return result, outbox
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'outbox.sqlite3')
+        (first, attempts, later, pending, dead, delivered), outbox = asyncio.run(scenario(path))
+        with sqlite3.connect(path) as conn:
+            rows = conn.execute("SELECT idempotency_key, attempts, last_error FROM outbox "
+                                "WHERE dead_at IS NOT NULL ORDER BY id").fetchall()
+    assert first == [True, False, False, True]
+    # Invalid: one attempt. Refused request: max_attempts. Delivered: one each
+    assert attempts == later == 1 + 1 + 3 + 1
+    assert pending == 0 and dead == 2
+    assert sorted(delivered) == ['key-1', 'key-4']
+    assert rows == [('key-2', 1, 'Error: refused'), ('key-3', 3, 'Error: refused')]
+    assert outbox._waiters == {}
+
+
+def test_outbox_survives_restart():
+    async def enqueue_only(path):
+        outbox = Outbox(path=path, batcher=FakeBatcher())
+        await outbox.put_many([make_expense(i) for i in range(10)], track=False)
+        await outbox.stop()  # Never started: nothing delivered
+
+    async def restart(path):
+        batcher = FakeBatcher()
+        outbox = Outbox(path=path, batcher=batcher)
+        await outbox.start()
+        await _wait_until_empty(outbox)
+        await outbox.stop()
+        return batcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'outbox.sqlite3')
+        asyncio.run(enqueue_only(path))
+        batcher = asyncio.run(restart(path))
+    assert len(batcher.delivered) == 10
+
+
+def test_slow_endpoint_does_not_starve_others():
+    """A tenant whose endpoint hangs only takes its own share of delivery slots."""
+    async def scenario(path):
+        default, slow, fast = FakeBatcher(), SlowBatcher(), FakeBatcher()
+        outbox = Outbox(path=path, batcher=default, endpoints=FakeEndpoints({'slow': slow, 'fast': fast}),
+                        max_in_flight=10, max_in_flight_per_endpoint=4)
+        await outbox.start()
+        await outbox.put_many([make_expense(i) for i in range(50)], track=False, endpoint='slow')
+        fast_key = await outbox.put(make_expense(100))
+        await outbox.put_many([make_expense(101)], track=False, endpoint='fast')
+        delivered_default = await asyncio.wait_for(outbox.wait_for(fast_key), 5)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 5
+        while not fast.delivered and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        stuck = slow.attempts
+        slow.release.set()
+        await _wait_until_empty(outbox)
+        await outbox.stop()
+        return delivered_default, fast, slow, stuck
+
+    with tempfile.TemporaryDirectory() as tmp:
+        delivered_default, fast, slow, stuck = asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+    assert delivered_default
+    assert len(fast.delivered) == 1
+    assert stuck == 4  # Capped at its per-endpoint share while hanging
+    assert len(slow.delivered) == 50
+
+
+def test_stop_delivers_what_is_due():
+    async def scenario(path):
+        batcher = FakeBatcher()
+        outbox = Outbox(path=path, batcher=batcher, max_in_flight=5)
+        await outbox.start()
+        await outbox.put_many([make_expense(i) for i in range(40)], track=False)
+        await outbox.stop(timeout=5)
+        return batcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        batcher = asyncio.run(scenario(os.path.join(tmp, 'outbox.sqlite3')))
+    assert len(batcher.delivered) == 40
+
+
+def test_stop_deadline_leaves_the_rest_for_the_next_start():
+    """Deliveries cut off by the deadline are sent as soon as the bot starts again."""
+    async def interrupted(path):
+        slow = SlowBatcher()
+        outbox = Outbox(path=path, batcher=slow, lease=60)
+        await outbox.start()
+        await outbox.put_many([make_expense(i) for i in range(3)], track=False)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        while slow.attempts < 3 and loop.time() - started < 5:
+            await asyncio.sleep(0.01)
+        await outbox.stop(timeout=0.1)
+        return loop.time() - started
+
+    async def restart(path):
+        batcher = FakeBatcher()
+        outbox = Outbox(path=path, batcher=batcher, lease=60)
+        await outbox.start()
+        await _wait_until_empty(outbox, timeout=2)
+        await outbox.stop()
+        return batcher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'outbox.sqlite3')
+        elapsed = asyncio.run(interrupted(path))
+        batcher = asyncio.run(restart(path))
+    assert elapsed < 2
+    # Delivered right away rather than after the 60 second claim expired
+    assert sorted(batcher.delivered) == ['key-1', 'key-2', 'key-3']
+    # They may have reached the sheet before the cut-off, so the script checks their keys
+    assert batcher.retries == [True, True, True]
+
+
+if __name__ == "__main__":
+    test_outbox_delivers_queued_transactions()
+    test_outbox_retries_with_backoff()
+    test_refused_payloads_become_dead_letters()
+    test_outbox_survives_restart()
+    test_slow_endpoint_does_not_starve_others()
+    test_stop_delivers_what_is_due()
+    test_stop_deadline_leaves_the_rest_for_the_next_start()
+    print("✅ All outbox tests passed")
@@ -5,6 +5,7 @@ Test script for the Money Tracker Bot parser
 
 import sys
 import os
+from decimal import Decimal
 # Add parent directory and src to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -61,5 +62,46 @@ def test_parser():
         
         print("-" * 50)
 
+def test_parse_bulk():
+    """Test parsing a multi-line message in one pass."""
+    finance_parser = FinanceParser()
+    
+    message = "\n".join([
+        "- 50.00 food cash Lunch at restaurant",
+        "",
+        "+ 1000.00 salary bank Monthly salary @2024-01-20",
+        "t 200.00 cash > bank ATM deposit",
+        "invalid message",
+        "t200.00 cash > bank No space after t",
+    ])
+    result = finance_parser.parse_bulk(message)
+    
+    assert [line for line, _ in result.transactions] == [1, 3, 4]
+    assert [line for line, _, _ in result.errors] == [5, 6]
+    
+    # Every line parses exactly as it would on its own
+    for line_number, transaction in result.transactions:
+        line = message.splitlines()[line_number - 1]
+        assert transaction == finance_parser.parse_message(line)
+
+
+def test_zero_amounts_are_refused():
+    finance_parser = FinanceParser()
+    for text in ("- 0 Other Cash free", "+ 0.00 Salary BRI nothing", "t 00 Cash > BRI"):
+        try:
+            finance_parser.parse_message(text)
+        except ValueError as e:
+            assert "greater than zero" in str(e)
+        else:
+            raise AssertionError(f"accepted {text!r}")
+    assert finance_parser.parse_message("- 0.50 Other Cash gum").amount == Decimal("0.50")
+
+    result = finance_parser.parse_bulk("- 0 Other Cash free\n- 5 Other Cash Lunch")
+    assert [line for line, _ in result.transactions] == [2]
+    assert result.errors[0][0] == 1 and "greater than zero" in result.errors[0][2]
+
+
 if __name__ == "__main__":
     test_parser()
+    test_parse_bulk()
+    test_zero_amounts_are_refused()
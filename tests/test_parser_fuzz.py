@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Fuzz and performance tests for the message tokenizer
+
+Random messages must parse exactly as they did with the original regex
+patterns, and hostile inputs well over 10KB must parse in bounded time.
+"""
+
+import sys
+import os
+import random
+import time
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmarks.bench_parser import LegacyParser
+from parser import FinanceParser, MAX_MESSAGE_LENGTH
+
+# Characters that matter to the grammar, plus a non-ASCII digit and space
+ALPHABET = [' ', ' ', '\t', '\n', '-', '+', 't', '>', '@', '.', '0', '1', '2', '9', 'a', 'b', '٣', ' ']
+TOKENS = ['-', '+', 't', ' ', '  ', '>', ' > ', '@', ' @2024-01-15', '@2024-01-15', '50', '25.50', '1.5',
+          'Cash', 'BRI', 'a>b', '>>', 'Bus fare', '\n', '\t', '2024-01-1', ' @2024-13-45']
+HOSTILE_SIZE = 20000
+TIME_LIMIT = 0.05
+
+
+WORDS = ['Cash', 'BRI', 'a>b', 'x>', '>y', '>', '@2024-01-15', 'Bus', '٣٣', '-', '+']
+SPACES = [' ', '  ', '\t', ' \n ', '\n']
+
+
+def well_formed_message(rng: random.Random) -> str:
+    """A message built from the grammar, with random spacing and awkward words."""
+    space = lambda: rng.choice(SPACES)
+    sign = rng.choice(['- ', '+ ', 't ', '-', 't'])
+    parts = [sign, rng.choice(['50', '25.50', '1.5', '٣', '10.']), space()]
+    if sign.startswith('t'):
+        parts += [rng.choice(WORDS), rng.choice(['>', ' > ', ' >', '> ', '>>']), rng.choice(WORDS)]
+    else:
+        parts += [rng.choice(WORDS), space(), rng.choice(WORDS)]
+    for _ in range(rng.randint(0, 3)):
+        parts += [space(), rng.choice(WORDS)]
+    if rng.random() < 0.5:
+        parts += [space(), rng.choice(['@2024-01-15', '@2024-1-15', '@٢٠٢٤-٠١-١٥'])]
+    return ''.join(parts)
+
+
+def random_message(rng: random.Random) -> str:
+    choice = rng.random()
+    if choice < 0.2:
+        return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 30)))
+    if choice < 0.4:
+        return ''.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 10)))
+    return well_formed_message(rng)
+
+
+def parse_or_error(parse, text: str):
+    """The parse result, or ValueError for the zero amounts the original patterns accepted."""
+    try:
+        return parse(text)
+    except ValueError:
+        return ValueError
+
+
+def expected_result(legacy: LegacyParser, method: str, text: str):
+    expected = getattr(legacy, method)(text)
+    return ValueError if expected is not None and not expected.amount else expected
+
+
+def test_matches_original_patterns():
+    """The tokenizer accepts and splits exactly what the original regexes did, except zero amounts."""
+    rng = random.Random(1234)
+    legacy = LegacyParser()
+    parser = FinanceParser()
+    for _ in range(30000):
+        text = random_message(rng)
+        for method in ('parse_expense', 'parse_income', 'parse_transfer', 'parse_message'):
+            expected = expected_result(legacy, method, text)
+            assert parse_or_error(getattr(parser, method), text) == expected, (method, text)
+
+
+def test_bulk_matches_original_patterns():
+    rng = random.Random(99)
+    legacy = LegacyParser()
+    parser = FinanceParser()
+    for _ in range(2000):
+        text = '\n'.join(random_message(rng).replace('\n', ' ') for _ in range(5))
+        result = parser.parse_bulk(text)
+        lines = text.splitlines()
+        for line_number, transaction in result.transactions:
+            assert transaction == legacy.parse_message(lines[line_number - 1])
+        for line_number, line, _ in result.errors:
+            assert expected_result(legacy, 'parse_message', lines[line_number - 1]) in (None, ValueError)
+
+
+def hostile_inputs(size: int) -> dict:
+    return {
+        'whitespace run': '- 1 Other Cash x' + ' ' * size + 'y',
+        'transfer whitespace run': 't 1 Cash > BRI x' + ' ' * size + 'y',
+        'at signs': '- 1 Other Cash ' + '@ ' * (size // 2),
+        'date fragments': '- 1 Other Cash ' + 'x @2024-01-0 ' * (size // 13),
+        'arrows': 't 1 ' + '>' * size + ' x\ny',
+        'arrow pairs': 't 1 ' + 'a>' * (size // 2) + '\n' + '> ' * (size // 2),
+        'digits': '- ' + '1' * size + 'x',
+        'multi-line description': '- 1 Other Cash x' + ' \n' * (size // 2),
+    }
+
+
+def test_hostile_inputs_parse_in_bounded_time():
+    """Without a length cap, 20KB adversarial messages still parse in linear time."""
+    parser = FinanceParser(max_length=sys.maxsize)
+    for name, text in hostile_inputs(HOSTILE_SIZE).items():
+        assert len(text) > 10000
+        start = time.perf_counter()
+        parser.parse_message(text)
+        parser.parse_bulk(text)
+        elapsed = time.perf_counter() - start
+        assert elapsed < TIME_LIMIT, f"{name}: {elapsed * 1000:.1f} ms"
+
+
+def test_long_messages_are_rejected():
+    parser = FinanceParser()
+    text = '- 1 Other Cash ' + 'x' * MAX_MESSAGE_LENGTH
+    assert parser.parse_message(text) is None
+    assert parser.parse_message(text[:MAX_MESSAGE_LENGTH]) is not None
+
+    result = parser.parse_bulk('- 1 Other Cash Lunch\n' + text)
+    assert [line for line, _ in result.transactions] == [1]
+    assert [line for line, _, _ in result.errors] == [2]
+    assert result.errors[0][2].startswith("Line too long")
+
+
+if __name__ == "__main__":
+    test_matches_original_patterns()
+    test_bulk_matches_original_patterns()
+    test_hostile_inputs_parse_in_bounded_time()
+    test_long_messages_are_rejected()
+    print("✅ All parser fuzz tests passed")
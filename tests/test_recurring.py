@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for recurring transaction schedules and the scheduler
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import datetime
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from aggregates import AggregateEngine
+from ledger import Ledger
+from recurring import CronSchedule, RecurringScheduler
+from tenants import TenantRegistry
+
+
+def test_cron_schedules():
+    after = datetime(2025, 7, 25, 10, 0)
+    assert CronSchedule.parse("0 9 25 * *").next_after(after) == datetime(2025, 8, 25, 9, 0)
+    assert CronSchedule.parse("@monthly").next_after(after) == datetime(2025, 8, 1, 0, 0)
+    assert CronSchedule.parse("*/15 * * * *").next_after(datetime(2025, 7, 25, 10, 7, 30)) == datetime(2025, 7, 25, 10, 15)
+    assert CronSchedule.parse("30 8 * * 1-5").next_after(datetime(2025, 7, 25, 9, 0)) == datetime(2025, 7, 28, 8, 30)  # Fri -> Mon
+    # Day of month and day of week both restricted: either one matches, as in cron
+    assert CronSchedule.parse("0 0 1 * 0").next_after(after) == datetime(2025, 7, 27, 0, 0)
+    assert CronSchedule.parse("0 0 29 2 *").next_after(after) == datetime(2028, 2, 29, 0, 0)
+
+    for invalid in ("61 * * * *", "0 0 30 2 *", "every day", "0 0 * *", "*/0 * * * *"):
+        try:
+            CronSchedule.parse(invalid)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{invalid!r} must be rejected")
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.writes = []
+
+    async def put_payloads(self, payloads, track=True, endpoint=None):
+        self.writes.append((endpoint, payloads))
+        return [payload['idempotency_key'] for payload in payloads]
+
+
+class FakeClock:
+    def __init__(self, moment: datetime):
+        self.now = moment.timestamp()
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_scheduler_catches_up_once_in_one_bulk_write():
+    async def scenario(tmp):
+        clock = FakeClock(datetime(2025, 7, 24, 12, 0))
+        ledger = Ledger(os.path.join(tmp, 'ledger.sqlite3'))
+        outbox, aggregates = FakeOutbox(), AggregateEngine()
+        registry = TenantRegistry(path=os.path.join(tmp, 'tenants.json'))
+        path = os.path.join(tmp, 'recurring.sqlite3')
+        notified = []
+
+        async def notify(chat_id, transactions, alerts):
+            notified.append((chat_id, transactions))
+
+        def scheduler():
+            return RecurringScheduler(path, outbox=outbox, ledger=ledger, aggregates=aggregates,
+                                      registry=registry, clock=clock)
+
+        await ledger.start()
+        first = scheduler()
+        await first.start(notify)
+        await first.add(1, 7, "0 9 * * *", "- 15 Entertainment Gopay Streaming")
+        await first.add(1, 7, "0 9 * * *", "+ 5000 Salary BRI Pay")
+        await first.add(2, 8, "@monthly", "t 100 BRI > Cash Allowance")
+        await first.stop()
+
+        # Down for several days: each rule fires once on start, not once per missed day
+        clock.now = datetime(2025, 8, 3, 12, 0).timestamp()
+        second = scheduler()
+        await second.start(notify)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 5
+        while len(notified) < 2 and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        rules = second.rules_for(1) + second.rules_for(2)
+        await second.stop()
+
+        # Restarting again fires nothing: the rules moved past now
+        third = scheduler()
+        await third.start(notify)
+        await asyncio.sleep(0.05)
+        # A firing repeated after a crash (same rule, same run time) is not recorded twice
+        rule = third.rules_for(1)[0]
+        rule.next_run_at = datetime(2025, 7, 25, 9, 0).timestamp()
+        await third.fire([rule])
+        await third.stop()
+        await ledger.close()
+        return outbox, notified, rules, aggregates
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox, notified, rules, aggregates = asyncio.run(scenario(tmp))
+
+    assert len(outbox.writes) == 2  # The catch-up in one write, plus the repeated firing
+    endpoint, payloads = outbox.writes[0]
+    assert endpoint is None and len(payloads) == 3
+    assert sorted(p['date'] for p in payloads) == ['2025-07-25', '2025-07-25', '2025-08-01']
+    assert outbox.writes[1][1][0]['idempotency_key'] == next(
+        p['idempotency_key'] for p in payloads if p['type'] == 'expense'
+    )
+
+    assert sorted((chat_id, len(transactions)) for chat_id, transactions in notified) == [(1, 2), (2, 1)]
+    assert all(rule.next_run_at > datetime(2025, 8, 3, 12, 0).timestamp() for rule in rules)
+    assert aggregates.report(1, '2025-07')['expense'] == 1500
+    assert aggregates.report(1, '2025-07')['income'] == 500000
+
+
+if __name__ == "__main__":
+    test_cron_schedules()
+    test_scheduler_catches_up_once_in_one_bulk_write()
+    print("✅ All recurring tests passed")
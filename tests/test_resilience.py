@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the Sheets circuit breaker
+"""
+
+import sys
+import os
+import asyncio
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from benchmarks.stub_server import StubSheetsServer
+from models import Expense
+from resilience import CircuitBreaker, CircuitOpenError
+from sheets import SheetsIntegration
+
+EXPENSE = Expense(amount=5.0, category="Other", account="Cash", name="Coffee", date="2025-07-25")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_and_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=10, clock=clock)
+
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    # After the reset timeout exactly one probe is let through
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.metrics() == {'state': 'closed', 'consecutive_failures': 0, 'times_opened': 2, 'rejected': 2}
+
+    # A probe that ends without a verdict (cancelled) frees the slot for the next call
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_open_breaker_fails_fast_then_recovers():
+    """Against a dead endpoint the breaker stops sending; once it is back a probe closes it."""
+    async def scenario(stub_url):
+        # Nothing listens on port 9, so every real attempt fails
+        sheets = SheetsIntegration(api_url='http://127.0.0.1:9/exec', rate_limit=0,
+                                   breaker_failures=3, breaker_reset=0.05)
+        try:
+            results = [await sheets.send_to_sheets(EXPENSE) for _ in range(10)]
+            opened = sheets.metrics()['breaker']
+            try:
+                await sheets.fetch_export('expense', 0, 10)
+                raised = False
+            except CircuitOpenError:
+                raised = True
+
+            # The endpoint recovers: after the reset timeout a probe closes the breaker
+            sheets.api_url = stub_url
+            await asyncio.sleep(0.06)
+            recovered = await sheets.send_to_sheets(EXPENSE)
+            return results, opened, raised, recovered, sheets.breaker.state
+        finally:
+            await sheets.close()
+
+    with StubSheetsServer() as stub:
+        results, opened, raised, recovered, state = asyncio.run(scenario(stub.url))
+        requests = stub.requests
+
+    assert not any(results)
+    assert opened['state'] == 'open'
+    assert opened['rejected'] == 7  # Only the first 3 attempts reached the network
+    assert raised
+    assert recovered and state == 'closed'
+    assert requests == 1
+
+
+def test_rejected_requests_do_not_open_the_breaker():
+    """The script refusing bad data says nothing about the endpoint; other writes keep going."""
+    async def scenario(url):
+        sheets = SheetsIntegration(api_url=url, rate_limit=0, breaker_failures=2, breaker_reset=60)
+        try:
+            results = [await sheets.send_to_sheets(EXPENSE) for _ in range(5)]
+            return results, sheets.breaker.state
+        finally:
+            await sheets.close()
+
+    with StubSheetsServer(body=b'Error: Missing required fields: type, amount, or date') as stub:
+        results, state = asyncio.run(scenario(stub.url))
+        requests = stub.requests
+
+    assert not any(results)
+    assert state == 'closed'
+    assert requests == 5
+
+
+if __name__ == "__main__":
+    test_breaker_opens_and_half_opens()
+    test_open_breaker_fails_fast_then_recovers()
+    test_rejected_requests_do_not_open_the_breaker()
+    print("✅ All resilience tests passed")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for category and account name resolution
+"""
+
+import sys
+import os
+import random
+import string
+import time
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config import AVAILABLE_CATEGORIES, AVAILABLE_ACCOUNTS, NAME_ALIASES
+from models import Expense, Transfer
+from parser import FinanceParser
+from resolver import NameIndex, Resolver, UnknownNameError, edit_distance
+
+RESOLVER = Resolver(AVAILABLE_CATEGORIES, AVAILABLE_ACCOUNTS, tuple(NAME_ALIASES.items()))
+
+
+def test_names_resolve_to_canonical_spelling():
+    categories, accounts = RESOLVER.categories, RESOLVER.accounts
+    # Case, aliases, unambiguous prefixes and small typos
+    assert categories.resolve("TRAVEL").value == "Travel"
+    assert accounts.resolve("gopay").value == "Gopay"
+    assert accounts.resolve("tunai").value == "Cash"
+    assert categories.resolve("transport").value == "Transportation"
+    assert categories.resolve("Entertainmnet").value == "Entertainment"
+    assert accounts.resolve("Csah").value == "Cash"
+    assert accounts.resolve("Mandri").value == "Mandiri"
+    # Exact names are not reported as corrections
+    assert not accounts.resolve("BRI").corrected
+    assert accounts.resolve("bri").corrected
+
+
+def test_ambiguous_or_unknown_names_are_suggested():
+    tr = RESOLVER.categories.resolve("Tra")
+    assert tr.value is None and tr.suggestions == ("Transportation", "Travel")
+    assert RESOLVER.categories.resolve("Qwerty").value is None
+    # Aliases apply only to the list their target is in
+    assert RESOLVER.categories.resolve("tunai").value is None
+
+
+def test_transactions_are_resolved():
+    expense = Expense(amount=5.0, category="shoping", account="ovo", name="Socks", date="2025-07-25")
+    resolved, corrections = RESOLVER.apply(expense)
+    assert (resolved.category, resolved.account) == ("Shopping", "OVO")
+    assert corrections == [("shoping", "Shopping"), ("ovo", "OVO")]
+
+    transfer = Transfer(amount=5.0, from_account="Cash", to_account="Wallet", description="", date="2025-07-25")
+    try:
+        RESOLVER.apply(transfer)
+        assert False, "unknown account accepted"
+    except UnknownNameError as e:
+        assert (e.kind, e.given) == ("account", "Wallet")
+
+
+def test_parser_uses_resolver():
+    parser = FinanceParser(resolver=RESOLVER)
+    transaction, corrections = parser.parse_with_corrections("+ 100 gaji bri March")
+    assert (transaction.category, transaction.account) == ("Salary", "BRI")
+    assert corrections == [("gaji", "Salary"), ("bri", "BRI")]
+    # Without a resolver the parser keeps names as typed
+    assert FinanceParser().parse_with_corrections("+ 100 gaji bri March")[0].category == "gaji"
+
+    result = parser.parse_bulk("- 5 Other Cash Tea\n- 5 transport cash Bus\n- 5 Nope Cash Tea")
+    assert [line for line, _ in result.transactions] == [1, 2]
+    assert result.corrections == [(2, "transport", "Transportation"), (2, "cash", "Cash")]
+    assert result.errors[0][0] == 3 and "Unknown category 'Nope'" in result.errors[0][2]
+
+
+def test_edit_distance():
+    assert edit_distance("Cash", "Cash", 2) == 0
+    assert edit_distance("Csah", "Cash", 2) == 1  # Adjacent swap
+    assert edit_distance("Mandri", "Mandiri", 2) == 1
+    assert edit_distance("Travel", "Salary", 2) == 3  # Capped at limit + 1
+
+
+def test_long_random_name_is_rejected_quickly():
+    """A message-length token must not reach the typo search, whose cost grows with the length."""
+    rng = random.Random(7)
+    token = ''.join(rng.choice(string.ascii_letters) for _ in range(4000))
+    parser = FinanceParser()
+    resolver = Resolver(AVAILABLE_CATEGORIES, AVAILABLE_ACCOUNTS, tuple(NAME_ALIASES.items()))
+
+    start = time.perf_counter()
+    try:
+        parser.parse_with_corrections(f"-50000 {token} cash lunch", resolver)
+    except UnknownNameError as e:
+        assert e.kind == "category" and e.given == token[:40] + '…' and e.suggestions == ()
+    else:
+        raise AssertionError("Expected UnknownNameError")
+    assert time.perf_counter() - start < 0.05
+
+
+def test_lookups_take_microseconds_on_large_lists():
+    """Hundreds of names: typo lookups stay in the tens of microseconds, repeats are a dict hit."""
+    rng = random.Random(7)
+    names = [''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(5, 14))) for _ in range(500)]
+    index = NameIndex(names)
+    typos = []
+    for name in names[:200]:
+        position = rng.randrange(len(name))
+        typos.append(name[:position] + '#' + name[position + 1:])
+
+    start = time.perf_counter()
+    resolved = [index.resolve(typo).value for typo in typos]
+    cold = (time.perf_counter() - start) / len(typos)
+    start = time.perf_counter()
+    for typo in typos:
+        index.resolve(typo)
+    warm = (time.perf_counter() - start) / len(typos)
+
+    assert resolved == names[:200]
+    assert cold < 500e-6 and warm < 10e-6, (cold, warm)
+    print(f"cold {cold * 1e6:.1f} µs, memoised {warm * 1e6:.2f} µs per lookup")
+
+
+if __name__ == "__main__":
+    test_names_resolve_to_canonical_spelling()
+    test_ambiguous_or_unknown_names_are_suggested()
+    test_transactions_are_resolved()
+    test_parser_uses_resolver()
+    test_edit_distance()
+    test_long_random_name_is_rejected_quickly()
+    test_lookups_take_microseconds_on_large_lists()
+    print("✅ All resolver tests passed")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-tenant routing and per-endpoint rate limiting
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+import time
+# Add parent directory and src to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tenants import TenantRegistry, SheetsEndpoints, DEFAULT_TENANT
+from resilience import TokenBucket
+
+REGISTRY = {
+    'tenants': {
+        'finance': {
+            'sheets_api': 'https://example.com/finance/exec',
+            'accounts': ['Cash', 'BCA'],
+            'aliases': {'klikbca': 'BCA'},
+            'chats': [-100],
+            'users': [7],
+        },
+        'ops': {
+            'sheets_api': 'https://example.com/ops/exec',
+            'categories': ['Travel'],
+            'chats': [200],
+        },
+    }
+}
+
+
+def write_registry(path: str, data: dict) -> None:
+    with open(path, 'w', encoding='utf-8') as registry_file:
+        json.dump(data, registry_file)
+    # Make sure the modification time changes even on coarse filesystems
+    stamp = time.time() + len(json.dumps(data))
+    os.utime(path, (stamp, stamp))
+
+
+def test_resolves_by_chat_then_user_then_default():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tenants.json')
+        write_registry(path, REGISTRY)
+        registry = TenantRegistry(path=path)
+
+        finance = registry.resolve(-100)
+        assert finance.tenant_id == 'finance'
+        assert finance.endpoint == 'https://example.com/finance/exec'
+        assert finance.accounts == ('Cash', 'BCA')
+        # Unset lists fall back to the defaults
+        assert finance.categories == DEFAULT_TENANT.categories
+        # Names resolve against the tenant's own lists and aliases
+        assert finance.resolver.accounts.resolve('klikbca').value == 'BCA'
+        assert finance.resolver.accounts.resolve('tunai').value == 'Cash'
+        assert finance.resolver.accounts.resolve('Gopay').value is None
+        assert registry.resolve(200, user_id=7).tenant_id == 'ops'
+        assert registry.resolve(300, user_id=7).tenant_id == 'finance'
+        assert registry.resolve(300, user_id=8) is DEFAULT_TENANT
+        assert DEFAULT_TENANT.endpoint is None
+
+
+def test_missing_registry_serves_default():
+    registry = TenantRegistry(path='/nonexistent/tenants.json')
+    assert registry.resolve(1) is DEFAULT_TENANT
+
+
+def test_cache_is_lazy_bounded_and_expires():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tenants.json')
+        write_registry(path, REGISTRY)
+        registry = TenantRegistry(path=path, max_size=2, ttl=0.05)
+
+        assert registry.loads == 0  # Nothing read until the first lookup
+        for _ in range(100):
+            registry.resolve(-100)
+        assert registry.loads == 1
+
+        registry.resolve(200)
+        registry.resolve(300)
+        assert len(registry._cache) == 2
+
+        # Edits are picked up once the cached entry expires
+        time.sleep(0.06)
+        assert registry.resolve(-100).tenant_id == 'finance'
+        moved = json.loads(json.dumps(REGISTRY))
+        moved['tenants']['ops']['chats'].append(-100)
+        write_registry(path, moved)
+        assert registry.resolve(-100).tenant_id == 'finance'
+        time.sleep(0.06)
+        assert registry.resolve(-100).tenant_id == 'ops'
+
+        # A broken file keeps the last good registry
+        with open(path, 'w', encoding='utf-8') as registry_file:
+            registry_file.write('{not json')
+        registry.invalidate()
+        assert registry.resolve(200).tenant_id == 'ops'
+
+
+def test_each_endpoint_gets_its_own_pool_and_limiter():
+    endpoints = SheetsEndpoints()
+    finance = endpoints.sheets_for('https://example.com/finance/exec')
+    ops = endpoints.sheets_for('https://example.com/ops/exec')
+
+    assert finance is not ops
+    assert finance.rate_limiter is not ops.rate_limiter
+    assert endpoints.sheets_for('https://example.com/finance/exec') is finance
+    assert endpoints.sheets_for(None) is endpoints.default_sheets
+
+
+def test_token_bucket_limits_rate():
+    async def take(bucket, count):
+        started = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # A burst of 5 is free, the next 5 wait for tokens at 100/s
+    elapsed = asyncio.run(take(TokenBucket(rate=100, capacity=5), 10))
+    assert 0.04 <= elapsed < 0.5
+    assert asyncio.run(take(TokenBucket(rate=0, capacity=1), 1000)) < 0.1
+
+
+if __name__ == "__main__":
+    test_resolves_by_chat_then_user_then_default()
+    test_missing_registry_serves_default()
+    test_cache_is_lazy_bounded_and_expires()
+    test_each_endpoint_gets_its_own_pool_and_limiter()
+    test_token_bucket_limits_rate()
+    print("✅ All tenant tests passed")